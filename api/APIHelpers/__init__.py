@@ -12,4 +12,5 @@ class APIResponseStatus(Enum):
     NO_UNCOMMITED_CHANGES = 'no_cached_changes'
     NO_RECORD = 'record_doesnt_exist'
     DEBUG_DISABLED = 'debug_endpoints_disabled'
+    METRICS_DISABLED = 'metrics_disabled'
     NOT_FOUND_404 = '404_NOT_FOUND'
@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import Future
+import numpy
+
+
+class QueryMicroBatcher:
+    def __init__(self, run_batch, window_ms=2, max_batch_size=64):
+        """
+        Combines concurrent single-record queries of the same network into one batched forward pass.
+        The first query to arrive for a network leads the next batch: if no batch of that network is running it is
+        executed right away, otherwise it waits up to `window_ms` (or until the batch is full) for further queries to
+        join. Under low load queries are therefore never delayed, under high load each forward pass serves many queries.
+
+        :param run_batch: function called as run_batch(key, features) with a (records, features) matrix, returning a
+        (records, outputs) matrix, or None if `key` does not exist
+        :param window_ms: maximum number of milliseconds a batch waits for more queries
+        :param max_batch_size: maximum number of queries per batch
+        """
+        self.run_batch = run_batch
+        self.window_ms = window_ms
+        self.max_batch_size = max(1, int(max_batch_size))
+        self._lock = threading.Lock()
+        # batches still accepting queries, and the number of batches being executed, per key
+        self._open_batches = dict()
+        self._running_batches = dict()
+        self._stats = {"queries": 0, "batches": 0, "max_batch_size": 0}
+
+    def query(self, key, features):
+        """
+        Queries the network stored under `key` with a single record, as part of a batch.
+
+        :param key: network key, i.e. the network name
+        :param features: vector of feature values
+        :return: vector of the network outputs for the record, or None if `key` does not exist
+        """
+        future = Future()
+        features = numpy.asarray(features, dtype=float).ravel()
+        with self._lock:
+            self._stats["queries"] += 1
+            batch = self._open_batches.get(key)
+            leader = batch is None
+            if leader:
+                batch = _OpenBatch()
+                self._open_batches[key] = batch
+                busy = self._running_batches.get(key, 0) > 0
+            batch.add(features, future)
+            if len(batch) >= self.max_batch_size:  # full, the leader executes it now
+                self._open_batches.pop(key)
+                batch.full.set()
+        if leader:
+            if busy:
+                batch.full.wait(self.window_ms / 1000.0)
+            self._execute(key, batch)
+        return future.result()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["average_batch_size"] = stats["queries"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _execute(self, key, batch):
+        with self._lock:
+            if self._open_batches.get(key) is batch:  # closes the batch, later queries start a new one
+                self._open_batches.pop(key)
+            self._running_batches[key] = self._running_batches.get(key, 0) + 1
+            self._stats["batches"] += 1
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+        try:
+            # records can only be stacked with records of the same length, mismatched records fail on their own
+            for indices in indices_by_length(batch.rows).values():
+                futures = [batch.futures[index] for index in indices]
+                try:
+                    outputs = self.run_batch(key, numpy.vstack([batch.rows[index] for index in indices]))
+                except Exception as e:
+                    for future in futures:
+                        future.set_exception(e)
+                    continue
+                for row_index, future in enumerate(futures):
+                    future.set_result(None if outputs is None else outputs[row_index])
+        finally:
+            with self._lock:
+                self._running_batches[key] -= 1
+                if not self._running_batches[key]:
+                    self._running_batches.pop(key)
+
+
+class _OpenBatch:
+    def __init__(self):
+        self.rows = list()
+        self.futures = list()
+        self.full = threading.Event()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, features, future):
+        self.rows.append(features)
+        self.futures.append(future)
+
+
+def indices_by_length(rows):
+    """
+    Groups records by their number of values, as only records of the same length can be stacked into one matrix.
+
+    :param rows: list of feature vectors
+    :return: dictionary of {length: list of the indices of the rows of that length}, in order
+    """
+    indices = dict()
+    for index, row in enumerate(rows):
+        indices.setdefault(row.shape[0], list()).append(index)
+    return indices
@@ -0,0 +1,83 @@
+import json
+import os
+import platform
+import statistics
+import time
+import numpy
+
+
+def measure(function, repeat=5, number=1, warmup=1):
+    """
+    Times a function call, keeping the per-call duration of every repetition so that results are not skewed by a single
+    slow (i.e. preempted or cold) run.
+
+    :param function: callable taking no arguments
+    :param repeat: number of timed repetitions
+    :param number: number of calls per repetition, for functions too fast to time with a single call
+    :param warmup: number of untimed calls made first (i.e. to fill caches and trigger lazy loading)
+    :return: dictionary of timing statistics in seconds per call ("median", "min", "mean", "stdev") plus the call counts
+    """
+    for _ in range(warmup):
+        function()
+    durations = list()
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            function()
+        durations.append((time.perf_counter() - start_time) / number)
+    return {"median": statistics.median(durations),
+            "min": min(durations),
+            "mean": statistics.mean(durations),
+            "stdev": statistics.stdev(durations) if len(durations) > 1 else 0.0,
+            "repeat": repeat,
+            "number": number}
+
+
+def environment_info():
+    # describes the machine the results were measured on, timings are only comparable on the same hardware
+    return {"python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count()}
+
+
+def save_results(results, outputfile):
+    with open(outputfile, 'w') as output_file:
+        json.dump(results, output_file, indent=2, sort_keys=True)
+
+
+def load_results(inputfile):
+    """
+    :param inputfile: location of a JSON file written by `save_results`
+    :return: dictionary of benchmark results, or None if the file does not exist
+    """
+    if not os.path.isfile(inputfile):
+        return None
+    with open(inputfile, 'r') as input_file:
+        return json.load(input_file)
+
+
+def compare_results(results, baseline, tolerance=0.25):
+    """
+    Compares the fastest time of every benchmark against a baseline run, which is less affected by background load on
+    the machine than the median or mean.
+
+    :param results: dictionary of benchmark results, as {"benchmarks": {name: timing statistics}}
+    :param baseline: dictionary of baseline results in the same format
+    :param tolerance: relative slowdown allowed before a benchmark counts as a regression, i.e. 0.25 for 25%
+    :return: list of dictionaries, one per benchmark present in both runs, with the "name", "baseline" and "current"
+    fastest times, their "ratio" and whether it is a "regression"
+    """
+    comparisons = list()
+    for name, timing in sorted(results["benchmarks"].items()):
+        baseline_timing = baseline["benchmarks"].get(name)
+        if baseline_timing is None or not baseline_timing["min"]:
+            continue
+        ratio = timing["min"] / baseline_timing["min"]
+        comparisons.append({"name": name,
+                            "baseline": baseline_timing["min"],
+                            "current": timing["min"],
+                            "ratio": ratio,
+                            "regression": ratio > 1 + tolerance})
+    return comparisons
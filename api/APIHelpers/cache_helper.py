@@ -1,62 +1,273 @@
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
 from APIHelpers.io_helper import save_pretrained_network
 
 
 class GlobalCacheHelper:
-    def __init__(self, max_size=50):
-        self.global_cache = dict()
+    def __init__(self, max_size=50, save_function=None, metrics=None):
+        # Cache is organized as an ordered mapping of {'key': 'value'}, from least to most recently accessed, so that
+        # reads, writes and evictions only ever touch the ends of the ordering
+        self.global_cache = OrderedDict()
         self.max_size = max_size
-        self.access_counter = SequentialIDGenerator()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # function called as save_function(network, path) to persist removed (network, path) entries, defaults to
+        # writing them synchronously with `save_pretrained_network`
+        self.save_function = save_function
+        # (optional) MetricsRegistry timing `checkout` lookups (including waits for the key lock) as the "cache" phase
+        self.metrics = metrics
+        # `_lock` guards the cache structure and counters only, it is never held while a value is in use or persisted.
+        # Each key additionally has its own reader/writer lock, which lives for as long as anyone is holding it.
+        self._lock = threading.RLock()
+        self._key_locks = weakref.WeakValueDictionary()
+        # entries which were removed from the cache but are still waiting to be written to disk
+        self._evicting = dict()
 
     def keys(self):
-        return self.global_cache.keys()
+        with self._lock:
+            return list(self.global_cache.keys())
 
     def get_stack(self):
-        # Cache is organized in the format of {'key': ('value', last_access_time)}
-        return sorted(self.global_cache.items(), key=lambda item: item[1][1])  # sort based on last access
+        # Stack is returned in the format of [('key', ('value', access_order)), ...], sorted by last access
+        with self._lock:
+            return [(key, (val, order)) for order, (key, val) in enumerate(self.global_cache.items())]
+
+    def get_stats(self):
+        with self._lock:
+            return {"size": len(self.global_cache),
+                    "max_size": self.max_size,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions}
 
     def read(self, key):
-        if key in self.global_cache.keys():
-            val = self.global_cache[key][0]
-            self.global_cache[key] = (val, self.access_counter.next())  # Update last access
-            return val
+        with self._lock:
+            if key in self.global_cache:
+                self.hits += 1
+                self.global_cache.move_to_end(key)  # Update last access
+                return self.global_cache[key]
+            self.misses += 1
+
+    def peek(self, key):
+        """
+        Returns the value cached under `key` without updating its access order or the hit/miss counters, i.e. for
+        background tasks which should not keep an entry cached.
+
+        :param key: cache key
+        :return: the cached value, or None
+        """
+        with self._lock:
+            return self.global_cache.get(key)
 
     def add(self, key, val):
-        self.global_cache[key] = (val, self.access_counter.next())
-        # Remove overflows from cache and store to disk
-        while len(self.global_cache.keys()) > self.max_size:
-            sorted_cache = sorted(self.global_cache.items(), key=lambda item: item[1][1])
-            removal_key = sorted_cache[0][0]  # sorted by access time
-            removed_entry = self.global_cache.pop(removal_key)
-            if isinstance(removed_entry[0], tuple):
-                save_pretrained_network(removed_entry[0][0], removed_entry[0][1])
+        with self._lock:
+            evicted_entries = self._insert(key, val)
+        self._persist(evicted_entries)
 
     def pop(self, key):
-        if key in self.global_cache.keys():
-            removed_entry = self.global_cache.pop(key)[0]
-            if isinstance(removed_entry, tuple):
-                save_pretrained_network(removed_entry[0], removed_entry[1])
-            return removed_entry
+        with self._lock:
+            if key not in self.global_cache:
+                return None
+            removed_entry = self.global_cache.pop(key)
+            eviction = (key, removed_entry, object())
+            self._evicting[key] = eviction
+        self._persist([eviction])
+        return removed_entry
+
+    def replace(self, key, val):
+        """
+        Swaps the value cached under `key` without changing its access order or triggering evictions, i.e. to upgrade
+        a shared read-only value to a private writable one. The caller must hold the key's write lock.
+
+        :param key: cache key
+        :param val: new value for `key`
+        :return: True if `key` was cached and its value replaced
+        """
+        with self._lock:
+            if key not in self.global_cache:
+                return False
+            self.global_cache[key] = val
+            return True
 
     def flush(self):
-        gckeys = list(self.global_cache.keys())
+        gckeys = self.keys()
         for key in gckeys:
             self.pop(key)
-        self.access_counter.reset()
 
+    def key_lock(self, key):
+        """
+        Returns the reader/writer lock guarding the value stored under `key`, creating it if required.
+
+        :param key: cache key
+        :return: ReadWriteLock shared by every caller currently referencing the same key
+        """
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = ReadWriteLock()
+                self._key_locks[key] = lock
+            return lock
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the value cached under `key`. On a miss, `loader()` is called (once, even under concurrent misses for
+        the same key) and its result is added to the cache, unless it is None.
+        Must not be called while holding a key lock.
+
+        :param key: cache key
+        :param loader: callable returning the value to cache for `key`, or None if no such value exists
+        :return: the cached value, or None
+        """
+        val = self.read(key)
+        if val is not None:
+            return val
+        evicted_entries = list()
+        with self.key_lock(key).write_locked():
+            with self._lock:
+                if key in self.global_cache:  # loaded by another thread while waiting for the key lock
+                    self.global_cache.move_to_end(key)
+                    return self.global_cache[key]
+                if key in self._evicting:  # still being written to disk, reuse the in-memory value
+                    val = self._evicting[key][1]
+            if val is None:
+                val = loader()
+            if val is not None:
+                with self._lock:
+                    evicted_entries = self._insert(key, val)
+        self._persist(evicted_entries)
+        return val
+
+    @contextmanager
+    def checkout(self, key, loader, write=False):
+        """
+        Context manager which yields the value cached under `key` (loading it on a miss) while holding that key's
+        read lock, or its write lock when `write` is True. The yielded value is guaranteed to still be the cached
+        instance, so changes made to it while holding the write lock are never lost to a concurrent eviction.
+
+        :param key: cache key
+        :param loader: callable returning the value to cache for `key`, or None if no such value exists
+        :param write: if True, the caller has exclusive access to the value
+        :return:
+        """
+        while True:
+            with self._phase("cache"):
+                val = self.get_or_load(key, loader)
+                if val is not None:
+                    lock = self.key_lock(key)
+                    lock.acquire_write() if write else lock.acquire_read()
+            if val is None:
+                yield None
+                return
+            try:
+                with self._lock:
+                    still_cached = self.global_cache.get(key) is val
+                if still_cached:
+                    yield val
+                    return
+            finally:
+                lock.release_write() if write else lock.release_read()
+
+    @contextmanager
+    def reading(self, key):
+        with self.key_lock(key).read_locked():
+            yield
+
+    @contextmanager
+    def writing(self, key):
+        with self.key_lock(key).write_locked():
+            yield
+
+    def _phase(self, name):
+        return self.metrics.phase(name) if self.metrics is not None else nullcontext()
+
+    def _insert(self, key, val):
+        # Caller must hold `_lock`. Returns the entries pushed out of the cache, which still need to be persisted.
+        self.global_cache[key] = val
+        self.global_cache.move_to_end(key)
+        self._evicting.pop(key, None)
+        evicted_entries = list()
+        while len(self.global_cache) > self.max_size:
+            removed_key, removed_entry = self.global_cache.popitem(last=False)  # least recently accessed entry
+            self.evictions += 1
+            # each eviction is tagged with a unique token, as the same entry may be re-adopted and evicted again
+            eviction = (removed_key, removed_entry, object())
+            self._evicting[removed_key] = eviction
+            evicted_entries.append(eviction)
+        return evicted_entries
+
+    def _persist(self, removed_entries):
+        # Store removed entries to disk, waiting for any in-flight writer on the same key to finish. An eviction is only
+        # written while it is still the latest one for its key; once superseded (the entry was re-adopted by the cache
+        # or evicted again) the newer owner is responsible for saving it, and writing here could overwrite newer data.
+        for eviction in removed_entries:
+            key, removed_entry = eviction[0], eviction[1]
+            with self.key_lock(key).read_locked():
+                with self._lock:
+                    if self._evicting.get(key) is not eviction:
+                        continue
+                try:
+                    # read-only (shared) networks are unchanged since they were loaded, so there is nothing to save
+                    if isinstance(removed_entry, tuple) and not getattr(removed_entry[0], "read_only", False):
+                        (self.save_function or save_pretrained_network)(removed_entry[0], removed_entry[1])
+                finally:
+                    with self._lock:
+                        self._evicting.pop(key)
+
+
+class ReadWriteLock:
+    def __init__(self):
+        """
+        Lock allowing any number of concurrent readers or a single writer. Waiting writers take priority over new
+        readers, so a steady stream of queries cannot starve a training request.
+        """
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
 
-class SequentialIDGenerator:
-    def __init__(self, start_id=0):
-        self.curr = int(start_id) - 1
-        self.nxt = self.curr
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
 
-    def next(self):
-        self._inc()
-        return self.nxt
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
 
-    def reset(self, start_id=0):
-        self.curr = int(start_id) - 1
-        self.nxt = self.curr
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
 
-    def _inc(self):
-        self.curr += 1
-        self.nxt += 1
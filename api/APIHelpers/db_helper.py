@@ -1,40 +1,346 @@
+import functools
+import logging
+import re
+import threading
+import time
+from collections import defaultdict, deque
 import pymongo
+from pymongo import IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Indexes declared for each collection, created at startup by `DBConnection.ensure_indexes`
+METADATA_INDEXES = [IndexModel([("network_id", pymongo.ASCENDING)], unique=True)]
+# sparse, so documents without the field (i.e. debug writes) are not constrained by the unique index
+RECORD_INDEXES = [IndexModel([("record_id", pymongo.ASCENDING)], unique=True, sparse=True),
+                  IndexModel([("training_record", pymongo.ASCENDING), ("record_id", pymongo.ASCENDING)])]
+
+
+def profiled(operation, filtered=True):
+    """
+    Decorates a DBConnection method to time each call, reporting calls slower than the connection's `slow_query_ms`
+    (see `DBConnection.get_slow_queries`) and every call to the connection's metrics registry, if any.
+
+    :param operation: name of the db operation
+    :param filtered: if True, the first argument of the method is the filter of the operation
+    :return:
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                if self.metrics is None:
+                    return method(self, *args, **kwargs)
+                with self.metrics.phase("db"):
+                    return method(self, *args, **kwargs)
+            finally:
+                self._record_query(operation, args[0] if filtered and args else None,
+                                   time.perf_counter() - start_time)
+        return wrapper
+    return decorator
+
+
+def prefix_match(prefix):
+    """
+    Builds a condition matching string values which start with `prefix`. Unlike an unanchored regex, an anchored
+    prefix is resolved by a range scan of the field's index.
+
+    :param prefix: literal string prefix
+    :return: db condition, i.e. {"record_id": prefix_match("BC_Sample_Train_")}
+    """
+    return {"$regex": "^" + re.escape(prefix)}
 
 
 class DBConnection:
-    def __init__(self, host, port, database, collection):
+    # Write listeners are organized as {(host, port, 'database.collection'): [listener, ...]}, so that every connection
+    # to the same collection notifies them, see `add_write_listener`
+    _write_listeners = defaultdict(list)
+    _write_listeners_lock = threading.Lock()
+
+    def __init__(self, host, port, database, collection, indexes=None, slow_query_ms=None, slow_query_log_size=100,
+                 metrics=None):
+        """
+        :param host: db host
+        :param port: db port
+        :param database: database name
+        :param collection: collection name
+        :param indexes: (optional) list of pymongo IndexModel declaring the indexes of the collection
+        :param slow_query_ms: (optional) operations taking at least this many milliseconds are logged as slow queries
+        :param slow_query_log_size: maximum number of slow queries kept, oldest first
+        :param metrics: (optional) MetricsRegistry counting and timing the operations, as the "db" phase of requests
+        """
         self.host = host
         self.port = port
         self.client = pymongo.MongoClient(self.host, self.port)
         self.db = self.client[database]
         self.collection = self.db[collection]
+        self.namespace = (self.host, self.port, "{0}.{1}".format(database, collection))
+        self.indexes = list(indexes or ())
+        self.slow_query_ms = slow_query_ms
+        self.slow_queries = deque(maxlen=slow_query_log_size)
+        self._slow_queries_lock = threading.Lock()
+        self.metrics = metrics
 
+    def add_write_listener(self, listener):
+        """
+        Registers a function which is called as listener(documents, match) with the list of documents inserted, removed
+        or modified through any DBConnection to this collection, i.e. to invalidate data derived from the collection.
+        Modified documents are passed both as they were before and after the update. documents is None when the written
+        documents are not known, in which case match is the filter of the removed documents (bulk removals, which are
+        not read back from the db), or None (bulk updates).
+
+        :param listener: callable accepting a list of documents (or None) and a db filter (or None)
+        :return:
+        """
+        with self._write_listeners_lock:
+            self._write_listeners[self.namespace].append(listener)
+
+    def remove_write_listener(self, listener):
+        with self._write_listeners_lock:
+            if listener in self._write_listeners[self.namespace]:
+                self._write_listeners[self.namespace].remove(listener)
+
+    @profiled("count")
     def record_count(self, document):
         return self.collection.count_documents(document)
 
     def record_exists(self, document):
         return bool(self.record_count(document))
 
+    @profiled("insert", filtered=False)
     def write_document(self, document):
-        return self.collection.insert_one(document).inserted_id
+        inserted_id = self.collection.insert_one(document).inserted_id
+        self._notify([document])
+        return inserted_id
 
+    @profiled("insert", filtered=False)
     def write_documents(self, documents):
-        return self.collection.insert_many(documents).inserted_ids
+        inserted_ids = self.collection.insert_many(documents).inserted_ids
+        self._notify(documents)
+        return inserted_ids
 
+    @profiled("find_one")
     def read_document(self, match):
         return self.collection.find_one(match)
 
-    def read_documents(self, match):
-        return self.collection.find(match)
+    def read_documents(self, match, projection=None, limit=0, sort=None):
+        # not profiled, as the returned cursor only queries the db once it is iterated
+        if self.metrics is not None:
+            self.metrics.increment("db_operations_total", collection=self.namespace[2], operation="find")
+        cursor = self.collection.find(match, projection)
+        if sort is not None:
+            cursor = cursor.sort(sort)
+        return cursor.limit(limit) if limit else cursor
 
+    @profiled("sample")
+    def sample_documents(self, match, size, projection=None):
+        # random sampling is performed by the db, so only `size` documents are ever transferred
+        pipeline = [{"$match": match}, {"$sample": {"size": int(size)}}]
+        if projection:
+            pipeline.append({"$project": projection})
+        return self.collection.aggregate(pipeline)
+
+    @profiled("delete")
     def remove_document(self, match):
-        return self.collection.delete_one(match).deleted_count
+        if not self._listeners():
+            return self.collection.delete_one(match).deleted_count
+        removed_document = self.collection.find_one_and_delete(match)
+        self._notify([removed_document] if removed_document is not None else list())
+        return int(removed_document is not None)
 
+    @profiled("delete")
     def remove_documents(self, match):
-        return self.collection.delete_many(match).deleted_count
+        # the removed documents are not fetched, listeners are passed the filter of the removal instead
+        deleted_count = self.collection.delete_many(match).deleted_count
+        if deleted_count:
+            self._notify(None, match)
+        return deleted_count
 
+    @profiled("update")
     def update_document(self, match, update):
-        return self.collection.update_one(match, {"$set": update}).modified_count
+        if not self._listeners():
+            return self.collection.update_one(match, {"$set": update}).modified_count
+        previous_document = self.collection.find_one_and_update(match, {"$set": update})
+        if previous_document is None:
+            return 0
+        # the updated document is derived from the previous one, instead of being read back from the db
+        updated_document = dict(previous_document)
+        updated_document.update(update)
+        if updated_document == previous_document:  # matched, but the update did not change any values
+            return 0
+        self._notify([previous_document, updated_document])
+        return 1
+
+    @profiled("find_one_and_update")
+    def read_and_update_document(self, match, update):
+        """
+        Updates the first matching document and returns it as it was before the update, in a single round-trip.
+
+        :param match: db filter
+        :param update: dictionary of the field values to set
+        :return: the document before the update, or None if no document matched
+        """
+        previous_document = self.collection.find_one_and_update(match, {"$set": update},
+                                                                return_document=ReturnDocument.BEFORE)
+        if previous_document is not None:
+            updated_document = dict(previous_document)
+            updated_document.update(update)
+            self._notify([previous_document, updated_document])
+        return previous_document
+
+    @profiled("find_one_and_delete")
+    def read_and_remove_document(self, match):
+        """
+        Removes the first matching document and returns it, in a single round-trip.
+
+        :param match: db filter
+        :return: the removed document, or None if no document matched
+        """
+        removed_document = self.collection.find_one_and_delete(match)
+        if removed_document is not None:
+            self._notify([removed_document])
+        return removed_document
 
     def replace_document(self, match):
         return self.collection.find_one_and_replace(match)
+
+    @profiled("upsert", filtered=False)
+    def upsert_documents(self, documents, key):
+        """
+        Inserts documents in a single bulk operation, skipping any document whose `key` value already exists in the
+        collection (existing documents are left untouched).
+
+        :param documents: list of documents, each containing `key`
+        :param key: field uniquely identifying a document, i.e. "record_id"
+        :return: number of newly inserted documents
+        """
+        if not documents:
+            return 0
+        operations = [UpdateOne({key: document[key]}, {"$setOnInsert": document}, upsert=True)
+                      for document in documents]
+        result = self.collection.bulk_write(operations, ordered=False)
+        # only the newly inserted documents (by operation index) are reported, existing documents did not change
+        self._notify([documents[index] for index in result.upserted_ids])
+        return result.upserted_count
+
+    @profiled("bulk_update", filtered=False)
+    def bulk_update(self, operations):
+        """
+        Applies a list of update operations (i.e. pymongo UpdateOne) in a single unordered bulk operation.
+
+        :param operations: list of pymongo write operations
+        :return: number of modified documents
+        """
+        if not operations:
+            return 0
+        modified_count = self.collection.bulk_write(operations, ordered=False).modified_count
+        if modified_count:
+            self._notify(None)
+        return modified_count
+
+    def ensure_indexes(self):
+        """
+        Creates the declared indexes of the collection (existing indexes are left unchanged). An index which cannot be
+        created, i.e. a unique index over existing duplicate values, is reported and skipped.
+
+        :return: list of the names of the created (or already existing) indexes
+        """
+        created_indexes = list()
+        for index in self.indexes:
+            try:
+                created_indexes += self.collection.create_indexes([index])
+            except OperationFailure as e:
+                logger.warning("[DB] Failed to create index %s on %s: %s", index.document["name"], self.namespace[2], e)
+        return created_indexes
+
+    def index_information(self):
+        # indexes are reported as {'name': [[field, direction], ...]}
+        return {name: [list(key) for key in info["key"]] for name, info in self.collection.index_information().items()}
+
+    def explain(self, match, limit=0):
+        """
+        Summarizes the plan the db uses for a query, i.e. to verify that a filter is resolved by an index scan instead
+        of a full collection scan.
+
+        :param match: db filter
+        :param limit: (optional) maximum number of returned documents
+        :return: dictionary with the plan stages, used indexes and examined/returned counts, or None if the db does not
+        support explaining queries
+        """
+        try:
+            cursor = self.collection.find(match)
+            explain_output = (cursor.limit(limit) if limit else cursor).explain()
+        except (AttributeError, NotImplementedError, OperationFailure):  # i.e. in-memory stand-ins for the db
+            return None
+        return summarize_plan(explain_output)
+
+    def get_slow_queries(self):
+        with self._slow_queries_lock:
+            return list(self.slow_queries)
+
+    def _listeners(self):
+        with self._write_listeners_lock:
+            return list(self._write_listeners.get(self.namespace, ()))
+
+    def _notify(self, documents, match=None):
+        if documents is not None and not documents:
+            return
+        for listener in self._listeners():
+            listener(documents, match)
+
+    def _record_query(self, operation, match, elapsed):
+        if self.metrics is not None:
+            self.metrics.increment("db_operations_total", collection=self.namespace[2], operation=operation)
+            self.metrics.observe("db_operation_duration_seconds", elapsed, collection=self.namespace[2],
+                                 operation=operation)
+        if self.slow_query_ms is None or elapsed * 1000 < self.slow_query_ms:
+            return
+        with self._slow_queries_lock:
+            self.slow_queries.append({"operation": operation,
+                                      "collection": self.namespace[2],
+                                      "filter": query_shape(match) if match is not None else None,
+                                      "milliseconds": round(elapsed * 1000, 3),
+                                      "timestamp": time.time()})
+
+
+def query_shape(match):
+    """
+    Replaces the values of a filter with "?", so queries which only differ in their values are reported alike and no
+    record values are logged.
+
+    :param match: db filter
+    :return: filter of the same structure, without values
+    """
+    if isinstance(match, dict):
+        return {key: query_shape(value) for key, value in match.items()}
+    if isinstance(match, (list, tuple)):
+        return [query_shape(value) for value in match]
+    return "?"
+
+
+def summarize_plan(explain_output):
+    """
+    :param explain_output: output of a query's explain command
+    :return: dictionary with the stages of the winning plan (outermost first), the indexes it uses, whether it scans
+    the full collection, and the execution statistics (if included in the output)
+    """
+    stages, index_names = list(), list()
+    plan = explain_output.get("queryPlanner", {}).get("winningPlan", {})
+    while plan:
+        plan = plan.get("queryPlan", plan)  # slot based execution engine wraps the plan
+        stages.append(plan.get("stage"))
+        if plan.get("indexName"):
+            index_names.append(plan["indexName"])
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    summary = {"stages": stages,
+               "indexes": index_names,
+               "collection_scan": "COLLSCAN" in stages}
+    execution_stats = explain_output.get("executionStats")
+    if execution_stats:
+        summary.update({"returned": execution_stats.get("nReturned"),
+                        "keys_examined": execution_stats.get("totalKeysExamined"),
+                        "documents_examined": execution_stats.get("totalDocsExamined"),
+                        "milliseconds": execution_stats.get("executionTimeMillis")})
+    return summary
@@ -1,4 +1,5 @@
 from APIHelpers import APIResponseStatus
+from APIHelpers.schema_helper import coerce_filter, normalize_document, to_api_record
 
 
 def api_db_check(records_db, args):
@@ -23,11 +24,11 @@ def api_db_check(records_db, args):
 
 
 def mongo_db_read_documents(records_db, perceptron_db, args):
-    resp = records_db.read_documents(args)
+    resp = records_db.read_documents(coerce_filter(args))
     records = []
     for record in resp:
         record["_id"] = str(record["_id"])
-        records.append(record)
+        records.append(to_api_record(record))
     resp = perceptron_db.read_documents(args)
     recordsai = []
     for record in resp:
@@ -38,7 +39,7 @@ def mongo_db_read_documents(records_db, perceptron_db, args):
 
 
 def mongo_db_write_document(records_db, args):
-    document = dict(args)
+    document = normalize_document(args)
     document_db_id = records_db.write_document(document)
     resp = {
         "document_id": str(document_db_id),
@@ -48,7 +49,7 @@ def mongo_db_write_document(records_db, args):
 
 
 def mongo_db_delete_document(records_db, perceptron_db, args):
-    delete_count = records_db.remove_documents(dict(args))
+    delete_count = records_db.remove_documents(coerce_filter(args))
     delete_count_ai = perceptron_db.remove_documents(dict(args))
     resp = {
         "deleted_count": delete_count,
@@ -56,3 +57,18 @@ def mongo_db_delete_document(records_db, perceptron_db, args):
         "status": APIResponseStatus.OK.value
     }
     return resp
+
+
+def mongo_db_query_report(records_db, perceptron_db, args):
+    # index, slow query and query plan report of both collections; the plans of the hot metadata and record lookups
+    # are always included, plus the plan of the filter given in the request arguments (if any)
+    record_filter = coerce_filter({key: value for key, value in args.items() if key != "network_id"})
+    plans = {"metadata_by_network_id": perceptron_db.explain({"network_id": args.get("network_id", "")}, limit=1),
+             "records_by_usage": records_db.explain({"training_record": True})}
+    if record_filter:
+        plans["records_by_request_filter"] = records_db.explain(record_filter)
+    return {"indexes": {"records": records_db.index_information(),
+                        "metadata": perceptron_db.index_information()},
+            "slow_queries": records_db.get_slow_queries() + perceptron_db.get_slow_queries(),
+            "plans": plans,
+            "status": APIResponseStatus.OK.value}
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+import numpy
+from APIHelpers import records_helper
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureMatrixCache:
+    def __init__(self, directory, max_size=16, enabled=True):
+        """
+        Materializes the records matching a filter as a float32 feature matrix and a vector of target classes, saved
+        as .npy files and memory-mapped read-only, so repeated training/testing runs over the same records skip the db
+        and the parsing of every feature value. Entries are dropped as soon as a record which may match their filter
+        is written, removed or updated through a watched DBConnection (see `watch`).
+        Processes sharing `directory` also invalidate each other: every write appends to a stamp file of its collection,
+        and a read which finds the stamp grown by another process drops every matrix of that collection.
+
+        :param directory: directory the .npy files are stored in
+        :param max_size: maximum number of record filters kept materialized at once
+        :param enabled: if False, every read goes to the db and nothing is stored
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = enabled
+        # Cache is organized as {'key': (namespace, record filter, (features, target classes))}, from least to most
+        # recently accessed
+        self.cached_matrices = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        # invalidations are counted per namespace, so a matrix read from the db while a write was in progress is
+        # never stored
+        self._generations = dict()
+        self._watched_namespaces = set()
+        # size of each namespace's stamp file as last seen by this process, see `_read_stamp`
+        self._stamps = dict()
+
+    def watch(self, records_db):
+        """
+        Invalidates cached matrices whenever records are written, removed or updated through any DBConnection to the
+        same collection as `records_db`.
+
+        :param records_db: DBConnection to a records collection
+        :return:
+        """
+        namespace = records_db.namespace
+        with self._lock:
+            if namespace in self._watched_namespaces:  # listeners are shared by every connection to the collection
+                return
+            self._watched_namespaces.add(namespace)
+        records_db.add_write_listener(lambda documents, match=None: self.invalidate(namespace, documents, match))
+
+    def read(self, records_db, match, input_nodes):
+        """
+        Returns the feature matrix and target classes of the records matching `match`, see
+        `records_helper.read_feature_matrix`, from the cache if possible.
+
+        :param records_db: DBConnection to the records collection
+        :param match: db filter selecting the records
+        :param input_nodes: number of feature values per record
+        :return: tuple of (read-only float32 matrix of shape (records, input nodes), read-only int vector of target
+        classes)
+        """
+        if not self.enabled:
+            features, target_classes = records_helper.read_feature_matrix(records_db, match, input_nodes)
+            return features.astype(numpy.float32), target_classes
+        key = self._cache_key(records_db.namespace, match, input_nodes)
+        stamp = self._read_stamp(records_db.namespace)
+        with self._lock:
+            stale_keys = self._sync_stamp(records_db.namespace, stamp)
+            cached_matrices = self.cached_matrices.get(key)
+            if cached_matrices is not None:
+                self.hits += 1
+                self.cached_matrices.move_to_end(key)
+            else:
+                self.misses += 1
+                generation = self._generations.get(records_db.namespace, 0)
+        for stale_key in stale_keys:
+            self._remove_files(stale_key)
+        if cached_matrices is not None:
+            return cached_matrices[2]
+        features, target_classes = records_helper.read_feature_matrix(records_db, match, input_nodes)
+        matrices = self._store(key, features.astype(numpy.float32), target_classes)
+        evicted_keys = list()
+        records_unchanged = self._read_stamp(records_db.namespace) == stamp  # i.e. not written by another process
+        with self._lock:
+            if records_unchanged and self._generations.get(records_db.namespace, 0) == generation:
+                self.cached_matrices[key] = (records_db.namespace, dict(match), matrices)
+                self.cached_matrices.move_to_end(key)
+                while len(self.cached_matrices) > self.max_size:
+                    evicted_keys.append(self.cached_matrices.popitem(last=False)[0])
+            else:  # records changed while reading, the matrix may already be out of date
+                evicted_keys.append(key)
+        for evicted_key in evicted_keys:
+            self._remove_files(evicted_key)
+        return matrices
+
+    def invalidate(self, namespace, documents=None, match=None):
+        """
+        Drops every cached matrix of `namespace` whose filter may match any of `documents`, or, if only the filter of
+        the removed documents is known, whose filter may overlap `match`.
+
+        :param namespace: namespace of the DBConnection the documents were written through
+        :param documents: list of written/removed documents, or None to drop every matrix of the namespace (which may
+        overlap `match`)
+        :param match: (optional) db filter of the removed documents, used when `documents` is None
+        :return: number of dropped matrices
+        """
+        stamp = self._append_stamp(namespace) if self.enabled else None
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            if stamp is not None:
+                if stamp - 1 > self._stamps.get(namespace, 0):  # another process wrote since the stamp was last seen
+                    documents, match = None, None
+                self._stamps[namespace] = max(stamp, self._stamps.get(namespace, 0))
+            invalid_keys = [key for key, (entry_namespace, entry_match, _) in self.cached_matrices.items()
+                            if entry_namespace == namespace and
+                            (any(filter_may_match(entry_match, doc) for doc in documents) if documents is not None
+                             else match is None or filters_may_overlap(entry_match, match))]
+            for key in invalid_keys:
+                self.cached_matrices.pop(key)
+            self.invalidations += len(invalid_keys)
+        for key in invalid_keys:
+            self._remove_files(key)
+        return len(invalid_keys)
+
+    def clear(self):
+        with self._lock:
+            keys = list(self.cached_matrices.keys())
+            self.cached_matrices.clear()
+        for key in keys:
+            self._remove_files(key)
+
+    def get_stats(self):
+        with self._lock:
+            return {"size": len(self.cached_matrices),
+                    "max_size": self.max_size,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "invalidations": self.invalidations}
+
+    def _sync_stamp(self, namespace, stamp):
+        # Caller must hold `_lock`. Drops every matrix of `namespace` if its stamp file grew since this process last
+        # saw it, returning the keys whose files still need to be removed.
+        if stamp <= self._stamps.get(namespace, 0):
+            return list()
+        self._stamps[namespace] = stamp
+        stale_keys = [key for key, (entry_namespace, _, _) in self.cached_matrices.items()
+                      if entry_namespace == namespace]
+        for key in stale_keys:
+            self.cached_matrices.pop(key)
+        self.invalidations += len(stale_keys)
+        return stale_keys
+
+    def _read_stamp(self, namespace):
+        # The stamp file of a namespace only ever grows, by one byte per write to its records (from any process)
+        if not self.enabled:
+            return 0
+        try:
+            return os.stat(self._stamp_path(namespace)).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _append_stamp(self, namespace):
+        # Appends are atomic, so the file offset after this append tells whether another process appended since the
+        # stamp was last seen. Returns the new stamp, or None if the stamp file can not be written.
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp_fd = os.open(self._stamp_path(namespace), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(stamp_fd, b"\n")
+                return os.lseek(stamp_fd, 0, os.SEEK_CUR)
+            finally:
+                os.close(stamp_fd)
+        except OSError as e:
+            logger.warning("[Feature Cache] Failed to update the invalidation stamp in %s: %s", self.directory, e)
+            return None
+
+    def _stamp_path(self, namespace):
+        digest = hashlib.sha1(json.dumps(namespace, default=str).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "{0}.stamp".format(digest))
+
+    def _store(self, key, features, target_classes):
+        # each array is written to a temporary file and mapped back read-only, then renamed into place (mappings stay
+        # valid when another process removes or replaces the file with the same name)
+        os.makedirs(self.directory, exist_ok=True)
+        matrices = list()
+        for path, array in zip(self._file_paths(key), (features, target_classes)):
+            temp_file = "{0}.{1}.tmp.npy".format(path[:-len(".npy")], uuid.uuid4().hex)
+            try:
+                numpy.save(temp_file, numpy.ascontiguousarray(array))
+                # empty arrays cannot be memory-mapped
+                matrix = numpy.load(temp_file, mmap_mode="r") if array.size else array
+                os.replace(temp_file, path)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+            matrix.flags.writeable = False
+            matrices.append(matrix)
+        return tuple(matrices)
+
+    def _remove_files(self, key):
+        # open mappings of the files stay valid after they are removed
+        for path in self._file_paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _file_paths(self, key):
+        return (os.path.join(self.directory, "{0}.features.npy".format(key)),
+                os.path.join(self.directory, "{0}.targets.npy".format(key)))
+
+    @staticmethod
+    def _cache_key(namespace, match, input_nodes):
+        description = json.dumps([namespace, match, input_nodes], sort_keys=True, default=str)
+        return hashlib.sha1(description.encode("utf-8")).hexdigest()
+
+
+def filter_may_match(match, document):
+    """
+    Conservatively tests a document against a db filter: equality, $eq, $ne, $in, $nin, $exists and $regex conditions
+    (combined at the top level or with $and) are evaluated, any other condition is assumed to match.
+
+    :param match: db filter, i.e. the filter of a cached feature matrix
+    :param document: a record document
+    :return: False if the document can not match the filter, otherwise True
+    """
+    for field, condition in match.items():
+        if field == "$and":
+            if not all(filter_may_match(sub_match, document) for sub_match in condition):
+                return False
+        elif field.startswith("$") or "." in field:
+            continue
+        elif not _condition_may_match(condition, field in document, document.get(field)):
+            return False
+    return True
+
+
+def filters_may_overlap(match, other_match):
+    """
+    Conservatively tests whether two db filters may match a common document: a top-level condition of either filter
+    which requires a single field value is evaluated against the condition of the other filter on the same field (see
+    `filter_may_match`), any other pair of conditions is assumed to overlap.
+
+    :param match: db filter, i.e. the filter of a cached feature matrix
+    :param other_match: db filter, i.e. the filter of removed records
+    :return: False if no document can match both filters, otherwise True
+    """
+    for field in set(match).intersection(other_match):
+        if field.startswith("$") or "." in field:
+            continue
+        for condition, value in ((match[field], other_match[field]), (other_match[field], match[field])):
+            if isinstance(value, (str, int, float)) and not _condition_may_match(condition, True, value):
+                return False
+    return True
+
+
+def _condition_may_match(condition, exists, value):
+    if isinstance(value, (list, dict)):  # conditions on arrays and embedded documents are not evaluated
+        return True
+    if not isinstance(condition, dict):
+        if condition is not None and not isinstance(condition, (str, int, float)):  # i.e. a compiled regex
+            return True
+        return value == condition if exists else condition is None
+    if not all(operator.startswith("$") for operator in condition):
+        return exists and value == condition
+    for operator, operand in condition.items():
+        if operator == "$eq" and not (exists and value == operand):
+            return False
+        if operator == "$ne" and exists and value == operand:
+            return False
+        if operator == "$in" and not (exists and value in operand):
+            return False
+        if operator == "$nin" and exists and value in operand:
+            return False
+        if operator == "$exists" and exists != bool(operand):
+            return False
+        if operator == "$regex" and isinstance(operand, str) and "$options" not in condition and \
+                not (isinstance(value, str) and re.search(operand, value)):
+            return False
+    return True
@@ -1,8 +1,18 @@
+import gzip
 import json
+import logging
+import os
+import struct
+import uuid
 import dill
 import csv
+import numpy
+import activations
+import optimizers
 from neural_network import NeuralNetwork
 
+logger = logging.getLogger(__name__)
+
 
 def load_config_data(config_file='config.json'):
     """
@@ -15,35 +25,224 @@ def load_config_data(config_file='config.json'):
         return json.load(config_file)
 
 
-def save_pretrained_network(neural_network_obj, outputfile):
+# Binary network format: a fixed little-endian header, followed by a JSON metadata block (i.e. the name of the
+# activation function, older files without it use the sigmoid activation) and the raw weight arrays of every layer
+# (input-hidden, ..., hidden-output, C order), which start at a 64-byte aligned offset so that they can be mapped
+# straight from the file without copying. The state arrays of the optimizer (i.e. the Adam moments) follow the weights,
+# in the order listed by the "optimizer" entry of the metadata block; older versions ignore them.
+# Networks with a single hidden layer are written as version 1 files, which older versions can still read. Deep networks
+# are written as version 2 files holding every layer size in the metadata block ("layers"), the header then holds the
+# size of the first hidden layer. Networks with biases are written as version 3 files (otherwise laid out like version
+# 2 files), whose biases follow the weights, so that older versions refuse them rather than ignoring the biases.
+NETWORK_FILE_MAGIC = b"PCPN"
+NETWORK_FILE_VERSION = 3
+NETWORK_FILE_HEADER = struct.Struct("<4sHHIIIdI")  # magic, version, dtype, inodes, hnodes, onodes, lr, metadata size
+NETWORK_FILE_ALIGNMENT = 64
+NETWORK_FILE_DTYPES = {0: numpy.dtype("<f8"), 1: numpy.dtype("<f4")}
+
+
+def save_pretrained_network(neural_network_obj, outputfile, fsync=False, atomic=True):
     """
     Take a NeuralNetwork class object and serialize it to a file for later use.
 
     :param neural_network_obj: NeuralNetwork class object for serialization to file.
     :param outputfile: location of file to save the serialized object to.
+    :param fsync: if True, the data is flushed to the storage device before returning.
+    :param atomic: if True, the file is replaced atomically, see `write_network_file`.
     :return: boolean representing if the operation was successful.
     """
     if isinstance(neural_network_obj, NeuralNetwork):
-        with open(outputfile, "wb") as fh:
-            dill.dump(neural_network_obj, fh)
-            return True
+        write_network_file(serialize_network(neural_network_obj), outputfile, fsync=fsync, atomic=atomic)
+        return True
     else:  # object passed for serialization was not a `NeuralNetwork` class object
         return False
 
 
-def load_pretrained_network(inputfile):
+def write_network_file(network_data, outputfile, fsync=False, atomic=True):
+    """
+    Writes a serialized network to disk.
+    When `atomic` is set, the file is written to a temporary location first and then renamed over `outputfile`, so
+    readers (including any process which currently has the previous file memory-mapped) never observe a partially
+    written network.
+
+    :param network_data: bytes of a serialized network, see `serialize_network`
+    :param outputfile: location of file to save the serialized network to
+    :param fsync: if True, the file (and for atomic writes, the rename) is flushed to the storage device
+    :param atomic: if True, the file is replaced atomically, otherwise it is overwritten in place
+    :return:
+    """
+    temp_file = "{0}.{1}.tmp".format(outputfile, uuid.uuid4().hex) if atomic else outputfile
+    try:
+        with open(temp_file, "wb") as fh:
+            fh.write(network_data)
+            if fsync:
+                fh.flush()
+                os.fsync(fh.fileno())
+        if atomic:
+            os.replace(temp_file, outputfile)
+            if fsync and hasattr(os, "O_DIRECTORY"):  # persist the rename itself (not supported on all platforms)
+                directory_fd = os.open(os.path.dirname(os.path.abspath(outputfile)), os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(directory_fd)
+                finally:
+                    os.close(directory_fd)
+    finally:
+        if atomic and os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def load_pretrained_network(inputfile, mmap_mode="c"):
     """
     Load a serialized NeuralNetwork class object from file into memory.
+    Networks in the binary format are memory-mapped, so loading costs a header read regardless of the network size.
+    Files written by older versions (dill pickles) are refused, as unpickling a file can run arbitrary code. They have
+    to be converted once with `migrate_pretrained_networks` (see migrate_network_files.py).
 
     :param inputfile: location of file containing serialized NeuralNetwork object
-    :return: NeuralNetwork object, returns None if the loaded object type is incorrect.
+    :param mmap_mode: "c" maps the weights copy-on-write (training changes stay in memory until saved), "r" maps them
+    read-only, and None reads them into regular in-memory arrays.
+    :return: NeuralNetwork object, returns None if the file is not in the binary network format.
+    """
+    if not is_binary_network_file(inputfile):
+        logger.warning("[Network Loader] Refusing to load %s, which is not a binary network file (legacy network files "
+                       "can be converted with migrate_network_files.py)", inputfile)
+        return None
+    if mmap_mode is None:
+        with open(inputfile, 'rb') as fh:
+            return deserialize_network(bytearray(fh.read()))
+    return deserialize_network(numpy.memmap(inputfile, dtype=numpy.uint8, mode=mmap_mode))
+
+
+def is_binary_network_file(inputfile):
+    """
+    :param inputfile: location of a serialized network
+    :return: True if the file starts with the header of the binary network format
     """
+    with open(inputfile, 'rb') as fh:
+        return fh.read(len(NETWORK_FILE_MAGIC)) == NETWORK_FILE_MAGIC
+
+
+def _load_legacy_network(inputfile):
+    # Unpickles a network file written by older versions. Only used to convert trusted files, see
+    # `migrate_pretrained_networks`.
     with open(inputfile, 'rb') as fh:
         loaded_obj = dill.load(fh)
-        if isinstance(loaded_obj, NeuralNetwork):
-            return loaded_obj
-        else:  # object loaded from file was not a `NeuralNetwork` class object
-            return None
+    return loaded_obj if isinstance(loaded_obj, NeuralNetwork) else None
+
+
+def serialize_network(neural_network_obj, metadata=None):
+    """
+    Serializes a NeuralNetwork class object into the binary network format.
+
+    :param neural_network_obj: NeuralNetwork class object
+    :param metadata: (optional) dictionary of additional JSON-serializable values stored with the network
+    :return: bytes of the serialized network
+    """
+    dtype_code = 1 if neural_network_obj.dtype == numpy.float32 else 0
+    dtype = NETWORK_FILE_DTYPES[dtype_code]
+    layers = neural_network_obj.layers
+    optimizer = neural_network_obj.optimizer
+    optimizer_state = [(name, optimizer.state[name]) for name in optimizer.state_names if name in optimizer.state]
+    metadata = dict(metadata or dict(), activation=neural_network_obj.activation,
+                    output_activation=neural_network_obj.output_activation,
+                    optimizer=dict(optimizer.config(), state=[name for name, _ in optimizer_state]))
+    if neural_network_obj.bias:
+        metadata["bias"] = True
+    if len(layers) > 3 or neural_network_obj.bias:
+        metadata["layers"] = list(layers)
+    metadata_block = json.dumps(metadata).encode("utf-8")
+    version = 3 if neural_network_obj.bias else 1 if len(layers) == 3 else 2
+    header = NETWORK_FILE_HEADER.pack(NETWORK_FILE_MAGIC, version, dtype_code,
+                                      layers[0], layers[1], layers[-1], float(neural_network_obj.lr),
+                                      len(metadata_block))
+    padding = -(len(header) + len(metadata_block)) % NETWORK_FILE_ALIGNMENT
+    return b"".join([header, metadata_block, bytes(padding),
+                     numpy.ascontiguousarray(neural_network_obj.parameters, dtype=dtype).tobytes()] +
+                    [numpy.ascontiguousarray(state, dtype=dtype).tobytes() for _, state in optimizer_state])
+
+
+def deserialize_network(buffer):
+    """
+    Constructs a NeuralNetwork class object from a buffer holding the binary network format. The network parameters
+    and optimizer state are views into the buffer (no data is copied), so they are writable only if the buffer is.
+
+    :param buffer: bytes, bytearray or uint8 array (i.e. a numpy.memmap) containing a serialized network
+    :return: NeuralNetwork object
+    """
+    buffer = numpy.frombuffer(buffer, dtype=numpy.uint8) if not isinstance(buffer, numpy.ndarray) else buffer
+    if buffer.size < NETWORK_FILE_HEADER.size:
+        raise ValueError("buffer is too small to contain a serialized network")
+    magic, version, dtype_code, inodes, hnodes, onodes, learning_rate, metadata_size = \
+        NETWORK_FILE_HEADER.unpack_from(buffer)
+    if magic != NETWORK_FILE_MAGIC or version > NETWORK_FILE_VERSION or dtype_code not in NETWORK_FILE_DTYPES:
+        raise ValueError("unsupported network file (version {0})".format(version))
+    dtype = NETWORK_FILE_DTYPES[dtype_code]
+    metadata = read_network_metadata(buffer)
+    layers = metadata.get("layers", ()) if version >= 2 else (inodes, hnodes, onodes)
+    if len(layers) < 3 or (layers[0], layers[1], layers[-1]) != (inodes, hnodes, onodes):
+        raise ValueError("layer sizes of the serialized network do not match its header")
+    offset = NETWORK_FILE_HEADER.size + metadata_size
+    offset += -offset % NETWORK_FILE_ALIGNMENT
+    optimizer_config = dict(metadata.get("optimizer", {"name": optimizers.DEFAULT_OPTIMIZER}))
+    bias = bool(metadata.get("bias", False))
+    # the weights (and biases) and each optimizer state array hold one value per parameter
+    arrays = list()
+    nbytes = sum(inputs * outputs for inputs, outputs in zip(layers[:-1], layers[1:])) * dtype.itemsize
+    if bias:
+        nbytes += sum(layers[1:]) * dtype.itemsize
+    for _ in range(1 + len(optimizer_config.get("state", ()))):
+        if offset + nbytes > buffer.size:
+            raise ValueError("serialized network is truncated")
+        arrays.append(buffer[offset:offset + nbytes].view(dtype))
+        offset += nbytes
+    optimizer_config["state"] = dict(zip(optimizer_config.pop("state", ()), arrays[1:]))
+    return NeuralNetwork(layers[0], layers[1:-1], layers[-1], learning_rate, parameters=arrays[0],
+                         activation=metadata.get("activation", activations.DEFAULT_ACTIVATION),
+                         output_activation=metadata.get("output_activation"), bias=bias,
+                         optimizer=optimizers.create_optimizer(**optimizer_config))
+
+
+def read_network_metadata(buffer):
+    """
+    :param buffer: bytes, bytearray or uint8 array containing a serialized network, see `deserialize_network`
+    :return: dictionary of the metadata block of the serialized network
+    """
+    buffer = numpy.frombuffer(buffer, dtype=numpy.uint8) if not isinstance(buffer, numpy.ndarray) else buffer
+    metadata_size = NETWORK_FILE_HEADER.unpack_from(buffer)[-1]
+    if NETWORK_FILE_HEADER.size + metadata_size > buffer.size:
+        raise ValueError("serialized network is truncated")
+    if not metadata_size:
+        return dict()
+    return json.loads(buffer[NETWORK_FILE_HEADER.size:NETWORK_FILE_HEADER.size + metadata_size].tobytes()
+                      .decode("utf-8"))
+
+
+def migrate_pretrained_networks(directory):
+    """
+    Converts every legacy (dill pickled) network file in `directory` into the binary network format, in place.
+    The legacy files are unpickled, so this must only be run on trusted files.
+
+    :param directory: directory containing serialized networks, i.e. the configured `trained_networks_directory`
+    :return: tuple of (converted file count, skipped file count), where skipped files were already converted or do not
+    contain a NeuralNetwork object
+    """
+    converted, skipped = 0, 0
+    for file_name in sorted(os.listdir(directory)):
+        file_path = os.path.join(directory, file_name)
+        if not os.path.isfile(file_path) or file_name.endswith(".tmp"):
+            continue
+        if is_binary_network_file(file_path):
+            skipped += 1
+            continue
+        try:
+            legacy_network = _load_legacy_network(file_path)
+        except Exception:  # not a pickle, or a pickle which cannot be loaded by this version
+            legacy_network = None
+        if legacy_network is not None and save_pretrained_network(legacy_network, file_path):
+            converted += 1
+        else:
+            skipped += 1
+    return converted, skipped
 
 
 def read_data_csv(csvfile):
@@ -59,3 +258,52 @@ def read_data_csv(csvfile):
         for row in csv.reader(csvfh):
             segmented_data.append((row[:-1], row[-1]))
         return segmented_data
+
+
+def iter_data_csv(csvfile, chunk_size=5000):
+    """
+    Streams a CSV file of feature/target values in chunks of rows, so files of any size can be processed without
+    loading them fully into memory. Files ending in ".gz" are decompressed on the fly.
+
+    :param csvfile: path to a (optionally gzip compressed) csv file containing feature/target values
+    :param chunk_size: maximum number of rows per chunk
+    :return: generator of lists of tuples of the format ([features], target)
+    """
+    open_csv = gzip.open if csvfile.endswith(".gz") else open
+    with open_csv(csvfile, 'rt', newline='') as csvfh:
+        chunk = list()
+        for row in csv.reader(csvfh):
+            if not row:
+                continue
+            chunk.append((row[:-1], row[-1]))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = list()
+        if chunk:
+            yield chunk
+
+
+def read_feature_rows(rows):
+    """
+    Converts feature rows into a float matrix, one record per row. Each row may either be a list of values or a
+    comma-separated string of values; a single string holding several lines of CSV text is also accepted.
+
+    :param rows: a list of feature rows, or a string of newline-separated CSV rows
+    :return: a float matrix of shape (records, features)
+    """
+    if isinstance(rows, str):
+        rows = rows.splitlines()
+    parsed_rows = list()
+    for row in rows:
+        if isinstance(row, str):
+            row = row.strip().strip(",")
+            if not row:
+                continue
+            row = next(csv.reader([row]))
+        parsed_rows.append(row)
+    if not parsed_rows:
+        raise ValueError("no feature rows were provided")
+    matrix = numpy.array(parsed_rows, dtype=float, ndmin=2)
+    if matrix.ndim != 2:
+        raise ValueError("feature rows must all contain the same number of values")
+    return matrix
@@ -0,0 +1,132 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TrainingJobManager:
+    def __init__(self, workers=2, max_finished_jobs=1000):
+        """
+        Runs long training jobs on a pool of background worker threads, tracking the progress of each job so it can be
+        polled by id while it runs.
+
+        :param workers: number of jobs run at once, further jobs wait in the queue
+        :param max_finished_jobs: number of completed/failed jobs kept for status requests, oldest are dropped first
+        """
+        self.max_finished_jobs = max_finished_jobs
+        # Jobs are organized as {'job_id': TrainingJob}, in submission order
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="training-job")
+
+    def submit(self, function, description=None):
+        """
+        Schedules `function(job)` to run on a worker thread, where `job` is the TrainingJob used to report progress.
+        The value returned by the function is stored as the job result, an exception marks the job as failed.
+
+        :param function: callable accepting the TrainingJob
+        :param description: (optional) dictionary describing the job, included in its status
+        :return: id of the new job
+        """
+        job = TrainingJob(uuid.uuid4().hex, description)
+        with self._lock:
+            self.jobs[job.job_id] = job
+        self._executor.submit(self._run, job, function)
+        return job.job_id
+
+    def get(self, job_id):
+        """
+        :param job_id: id of a job returned by `submit`
+        :return: dictionary of the job status, or None if the job does not exist (or was dropped)
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+        return job.status() if job is not None else None
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, function):
+        job.start()
+        try:
+            job.finish(result=function(job))
+        except Exception as e:
+            job.finish(error="{0}: {1}".format(type(e).__name__, e))
+        with self._lock:  # drop the oldest finished jobs, queued and running jobs are always kept
+            finished_jobs = [job_id for job_id, tracked_job in self.jobs.items() if tracked_job.finished]
+            for job_id in finished_jobs[:max(0, len(finished_jobs) - self.max_finished_jobs)]:
+                self.jobs.pop(job_id)
+
+
+class TrainingJob:
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __init__(self, job_id, description=None):
+        self.job_id = job_id
+        self.description = description or dict()
+        self.state = self.QUEUED
+        self.total_records = 0
+        self.processed_records = 0
+        self.loss = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.state in (self.COMPLETED, self.FAILED)
+
+    def start(self):
+        with self._lock:
+            self.state = self.RUNNING
+            self.started_at = time.time()
+
+    def set_total(self, total_records):
+        with self._lock:
+            self.total_records = int(total_records)
+
+    def update(self, processed_records, loss=None):
+        """
+        Reports the progress of the job, i.e. as the callback of `NeuralNetwork.train_batch`.
+
+        :param processed_records: number of records processed so far
+        :param loss: (optional) latest training loss
+        :return:
+        """
+        with self._lock:
+            self.processed_records = int(processed_records)
+            if loss is not None:
+                self.loss = loss
+
+    def finish(self, result=None, error=None):
+        with self._lock:
+            self.state = self.FAILED if error is not None else self.COMPLETED
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+
+    def status(self):
+        with self._lock:
+            elapsed = None
+            if self.started_at is not None:
+                elapsed = (self.finished_at or time.time()) - self.started_at
+            return {"job_id": self.job_id,
+                    "state": self.state,
+                    "description": self.description,
+                    "processed_records": self.processed_records,
+                    "total_records": self.total_records,
+                    "progress": self.processed_records / self.total_records if self.total_records else 0.0,
+                    "records_per_second": self.processed_records / elapsed if elapsed else 0.0,
+                    "loss": self.loss,
+                    "result": self.result,
+                    "error": self.error,
+                    "submitted_at": self.submitted_at,
+                    "started_at": self.started_at,
+                    "finished_at": self.finished_at}
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from pymongo.errors import DuplicateKeyError
+
+
+class NetworkMetadataRepository:
+    def __init__(self, metadata_db, ttl_seconds=30, max_size=10000):
+        """
+        Reads and writes the metadata entries mapping network names to their serialized files with a single db
+        operation each, keeping recently read entries (including the absence of an entry) in memory for `ttl_seconds`.
+        Entries are invalidated as soon as the metadata is written through any DBConnection to the same collection in
+        this process; changes made by other processes are picked up once the entry expires.
+
+        :param metadata_db: DBConnection to the metadata collection
+        :param ttl_seconds: number of seconds an entry is served from memory, 0 disables caching
+        :param max_size: maximum number of entries kept in memory
+        """
+        self.metadata_db = metadata_db
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        # Cache is organized as {'network_id': (expiry time, metadata document or None)}, from least to most recently
+        # read
+        self.cached_entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # incremented by every write, so an entry read from the db while a write was in progress is never stored
+        self._generation = 0
+        metadata_db.add_write_listener(self._invalidate_documents)
+
+    def get(self, network_id):
+        """
+        :param network_id: name of the network
+        :return: metadata document of the network (i.e. {"network_id": ..., "saved_data": ...}), or None if the network
+        does not exist
+        """
+        with self._lock:
+            cached_entry = self.cached_entries.get(network_id)
+            if cached_entry is not None and cached_entry[0] > time.monotonic():
+                self.hits += 1
+                self.cached_entries.move_to_end(network_id)
+                return cached_entry[1]
+            self.misses += 1
+            generation = self._generation
+        metadata_document = self.metadata_db.read_document({"network_id": network_id})
+        self._store(network_id, metadata_document, generation)
+        return metadata_document
+
+    def exists(self, network_id):
+        return self.get(network_id) is not None
+
+    def create(self, network_id, saved_data):
+        """
+        Adds the metadata entry of a new network.
+
+        :param network_id: name of the network
+        :param saved_data: location of the serialized network
+        :return: `_id` of the new entry, or None if an entry for `network_id` already exists
+        """
+        metadata_document = {"network_id": network_id, "saved_data": saved_data}
+        try:
+            inserted_id = self.metadata_db.write_document(metadata_document)
+        except DuplicateKeyError:  # created concurrently, network_id is a unique index
+            return None
+        with self._lock:
+            generation = self._generation
+        self._store(network_id, metadata_document, generation)
+        return inserted_id
+
+    def update(self, network_id, saved_data):
+        """
+        Points an existing metadata entry to a new serialized file.
+
+        :param network_id: name of the network
+        :param saved_data: location of the new serialized network
+        :return: the metadata document as it was before the update (i.e. to remove the previous file), or None if no
+        entry exists for `network_id`
+        """
+        return self.metadata_db.read_and_update_document({"network_id": network_id}, {"saved_data": saved_data})
+
+    def delete(self, network_id):
+        """
+        :param network_id: name of the network
+        :return: the removed metadata document, or None if no entry exists for `network_id`
+        """
+        return self.metadata_db.read_and_remove_document({"network_id": network_id})
+
+    def invalidate(self, network_id=None):
+        # drops the cached entry of `network_id`, or every cached entry
+        with self._lock:
+            self._generation += 1
+            if network_id is None:
+                self.cached_entries.clear()
+            else:
+                self.cached_entries.pop(network_id, None)
+
+    def get_stats(self):
+        with self._lock:
+            return {"size": len(self.cached_entries),
+                    "max_size": self.max_size,
+                    "hits": self.hits,
+                    "misses": self.misses}
+
+    def _store(self, network_id, metadata_document, generation):
+        if not self.ttl_seconds:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.cached_entries[network_id] = (time.monotonic() + self.ttl_seconds, metadata_document)
+            self.cached_entries.move_to_end(network_id)
+            while len(self.cached_entries) > self.max_size:
+                self.cached_entries.popitem(last=False)
+
+    def _invalidate_documents(self, documents, match=None):
+        if documents is None:
+            # bulk removals only report their filter, which names the removed network if it selects a single one
+            network_id = match.get("network_id") if match is not None else None
+            self.invalidate(network_id if isinstance(network_id, str) else None)
+            return
+        for network_id in set(document.get("network_id") for document in documents):
+            self.invalidate(network_id)
@@ -0,0 +1,191 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+# Upper bounds (in seconds) of the latency histogram buckets, from 100us (a cached forward pass) to 10s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+# Route label of phases timed outside of a request, i.e. by background training jobs
+BACKGROUND_ROUTE = "background"
+METRIC_DESCRIPTIONS = {"requests_total": "Requests handled, per route and status code.",
+                       "request_duration_seconds": "Latency of the requests, per route.",
+                       "request_phase_seconds": "Time spent per phase of a request (cache lookup, db, disk, network "
+                                                "forward/training pass), per route.",
+                       "db_operations_total": "DBConnection calls, per collection and operation.",
+                       "db_operation_duration_seconds": "Latency of the DBConnection calls, per collection and "
+                                                        "operation."}
+_DISABLED_PHASE = nullcontext()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=True, prefix="perceptron", buckets=DEFAULT_BUCKETS):
+        """
+        Collects request latencies, counters and component statistics, rendered in the Prometheus text format.
+
+        Requests are timed as a whole and split into phases (i.e. "cache", "db", "disk", "forward"): each phase records
+        its exclusive time, so the time of a db query made while loading a network on a cache miss counts towards "db"
+        only, not also towards "cache". When disabled, every call returns immediately without taking a lock.
+
+        :param enabled: if False, nothing is recorded
+        :param prefix: prefix of every metric name
+        :param buckets: upper bounds of the histogram buckets, in seconds
+        """
+        self.enabled = enabled
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+        # Metrics are organized as {'name': {(('label', 'value'), ...): value}}, histogram values hold the count of
+        # every bucket followed by the sum and count of the observations
+        self.counters = defaultdict(dict)
+        self.histograms = defaultdict(dict)
+        self.descriptions = dict(METRIC_DESCRIPTIONS)
+        self.collectors = list()
+        self._lock = threading.Lock()
+        # the request (and stack of open phases) being timed on the current thread
+        self._local = threading.local()
+
+    def describe(self, name, description):
+        self.descriptions[name] = description
+
+    def increment(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        label_key = tuple(sorted(labels.items()))
+        with self._lock:
+            metric = self.counters[name]
+            metric[label_key] = metric.get(label_key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        label_key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self.histograms[name].get(label_key)
+            if histogram is None:
+                histogram = [0] * (len(self.buckets) + 3)
+                self.histograms[name][label_key] = histogram
+            histogram[bisect.bisect_left(self.buckets, seconds)] += 1  # the last bucket counts values above all bounds
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def register_collector(self, name, function):
+        """
+        Registers a function returning a dictionary of numeric statistics (i.e. `GlobalCacheHelper.get_stats`), which
+        is called when the metrics are rendered and reported as gauges named "<prefix>_<name>_<statistic>".
+
+        :param name: name of the component
+        :param function: callable returning a dictionary of statistics, non-numeric values are skipped
+        :return:
+        """
+        self.collectors.append((name, function))
+
+    def start_request(self, route):
+        if not self.enabled:
+            return
+        self._local.request = (route, time.perf_counter(), defaultdict(float))
+        self._local.phases = list()
+
+    def end_request(self, status_code):
+        """
+        Records the latency and phase times of the request started on this thread by `start_request`.
+
+        :param status_code: HTTP status code of the response
+        :return:
+        """
+        request = getattr(self._local, "request", None)
+        if request is None:
+            return
+        self._local.request = None
+        route, start_time, phase_times = request
+        self.observe("request_duration_seconds", time.perf_counter() - start_time, route=route)
+        self.increment("requests_total", route=route, status=str(status_code))
+        for phase_name, seconds in phase_times.items():
+            self.observe("request_phase_seconds", seconds, route=route, phase=phase_name)
+
+    def phase(self, name):
+        """
+        :param name: name of the phase, i.e. "db"
+        :return: context manager timing the enclosed block as part of the request on this thread (or as a background
+        phase if no request is being timed)
+        """
+        if not self.enabled:
+            return _DISABLED_PHASE
+        return _Phase(self, name)
+
+    def render(self):
+        """
+        :return: every metric in the Prometheus text exposition format
+        """
+        lines = list()
+        with self._lock:
+            counters = {name: dict(values) for name, values in self.counters.items()}
+            histograms = {name: {labels: list(values) for labels, values in metric.items()}
+                          for name, metric in self.histograms.items()}
+        for name, values in sorted(counters.items()):
+            self._render_header(lines, name, "counter")
+            for labels, value in sorted(values.items()):
+                lines.append("{0}{1} {2}".format(self._full_name(name), _format_labels(labels), value))
+        for name, values in sorted(histograms.items()):
+            self._render_header(lines, name, "histogram")
+            full_name = self._full_name(name)
+            for labels, histogram in sorted(values.items()):
+                cumulative_count = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), histogram[:-2]):
+                    cumulative_count += bucket_count
+                    lines.append("{0}_bucket{1} {2}".format(full_name, _format_labels(
+                        labels + (("le", "+Inf" if bound == float("inf") else repr(bound)),)), cumulative_count))
+                lines.append("{0}_sum{1} {2!r}".format(full_name, _format_labels(labels), histogram[-2]))
+                lines.append("{0}_count{1} {2}".format(full_name, _format_labels(labels), histogram[-1]))
+        for collector_name, function in self.collectors:
+            for statistic, value in sorted(function().items()):
+                if isinstance(value, (int, float)):
+                    name = "{0}_{1}".format(collector_name, statistic)
+                    self._render_header(lines, name, "gauge")
+                    lines.append("{0} {1!r}".format(self._full_name(name), float(value)))
+        return "\n".join(lines) + "\n"
+
+    def _full_name(self, name):
+        return "{0}_{1}".format(self.prefix, name) if self.prefix else name
+
+    def _render_header(self, lines, name, metric_type):
+        if name in self.descriptions:
+            lines.append("# HELP {0} {1}".format(self._full_name(name), self.descriptions[name]))
+        lines.append("# TYPE {0} {1}".format(self._full_name(name), metric_type))
+
+
+class _Phase:
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.start_time = None
+        self.child_time = 0.0
+
+    def __enter__(self):
+        phases = getattr(self.registry._local, "phases", None)
+        if phases is None:
+            phases = self.registry._local.phases = list()
+        phases.append(self)
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start_time
+        phases = self.registry._local.phases
+        phases.pop()
+        if phases:  # the enclosing phase only counts the time spent outside of this one
+            phases[-1].child_time += elapsed
+        request = getattr(self.registry._local, "request", None)
+        if request is not None:
+            request[2][self.name] += elapsed - self.child_time
+        else:
+            self.registry.observe("request_phase_seconds", elapsed - self.child_time, route=BACKGROUND_ROUTE,
+                                  phase=self.name)
+        return False
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{0}="{1}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"')
+                                             .replace("\n", "\\n")) for key, value in labels) + "}"
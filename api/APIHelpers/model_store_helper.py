@@ -0,0 +1,70 @@
+import os
+import threading
+from collections import OrderedDict
+from APIHelpers.io_helper import load_pretrained_network
+
+
+class SharedModelStore:
+    def __init__(self, max_size=1000):
+        """
+        Keeps committed networks memory-mapped read-only from their saved files, so every worker process serving the
+        same network shares a single copy of its weights through the OS page cache, and a network which drops out of
+        the (per-process) global cache can be served again without reading it from disk.
+
+        :param max_size: maximum number of files kept mapped at once
+        """
+        # Store is organized as {'path': (file_signature, NeuralNetwork)}, from least to most recently opened
+        self.mapped_networks = OrderedDict()
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def open(self, path):
+        """
+        Returns the read-only network saved at `path`, reusing the existing mapping if the file has not been replaced
+        since it was mapped.
+
+        :param path: location of a serialized NeuralNetwork
+        :return: read-only NeuralNetwork object, or None if the file is not a binary network file
+        """
+        signature = self._file_signature(path)
+        with self._lock:
+            mapped_network = self.mapped_networks.get(path)
+            if mapped_network is not None and mapped_network[0] == signature:
+                self.mapped_networks.move_to_end(path)
+                return mapped_network[1]
+        network = load_pretrained_network(path, mmap_mode="r")
+        if network is None:
+            return None
+        for weights in [network.parameters] + network.weights + [bias for bias in network.biases if bias is not None]:
+            weights.flags.writeable = False
+        with self._lock:
+            self.mapped_networks[path] = (signature, network)
+            self.mapped_networks.move_to_end(path)
+            while len(self.mapped_networks) > self.max_size:
+                self.mapped_networks.popitem(last=False)
+        return network
+
+    @staticmethod
+    def checkout(path):
+        """
+        Returns a trainable network for the file at `path`. The weights are mapped copy-on-write, so only the pages
+        which training actually changes stop being shared with other processes.
+
+        :param path: location of a serialized NeuralNetwork
+        :return: writable NeuralNetwork object, or None if the file is not a binary network file
+        """
+        return load_pretrained_network(path, mmap_mode="c")
+
+    def invalidate(self, path):
+        with self._lock:
+            self.mapped_networks.pop(path, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self.mapped_networks.keys())
+
+    @staticmethod
+    def _file_signature(path):
+        # Saving a network renames a new file into place, which changes the inode even if size and mtime match
+        file_stat = os.stat(path)
+        return file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns
@@ -0,0 +1,271 @@
+import logging
+import threading
+import time
+import numpy
+from APIHelpers.batching_helper import indices_by_length
+
+logger = logging.getLogger(__name__)
+
+
+class OnlineTrainer:
+    def __init__(self, apply_batch, checkpoint=None, batch_size=32, max_delay_ms=50, max_pending=10000,
+                 checkpoint_samples=1000, checkpoint_interval_seconds=30.0, checkpoint_retry_seconds=1.0):
+        """
+        Accumulates single-record training samples per network and applies them in batches from a background thread,
+        so training requests only pay for queueing a sample. Each batch is applied as a single weight update, with the
+        adjustments of its samples averaged (gradient accumulation). Networks are checkpointed after a number of
+        applied samples or seconds, which bounds the training lost if the process stops unexpectedly.
+
+        :param apply_batch: function called as apply_batch(key, features, target_classes) with a (samples, features)
+        matrix and a vector of target classes, returning False if `key` does not exist (the samples are dropped)
+        :param checkpoint: (optional) function called as checkpoint(key) to save the network stored under `key`
+        :param batch_size: maximum number of samples per weight update
+        :param max_delay_ms: maximum number of milliseconds a sample waits for its batch to fill, after which the
+        samples accumulated so far are applied as a partial batch
+        :param max_pending: maximum number of samples waiting per key, `submit` blocks while the key is full
+        :param checkpoint_samples: number of applied samples after which a network is checkpointed, 0 to disable
+        :param checkpoint_interval_seconds: maximum number of seconds an applied sample waits to be checkpointed, 0 to
+        disable
+        :param checkpoint_retry_seconds: number of seconds to wait before retrying a failed checkpoint
+        """
+        self.apply_batch = apply_batch
+        self.checkpoint = checkpoint
+        self.batch_size = max(1, int(batch_size))
+        self.max_delay_ms = max_delay_ms
+        self.max_pending = max(self.batch_size, int(max_pending))
+        self.checkpoint_samples = int(checkpoint_samples)
+        self.checkpoint_interval_seconds = checkpoint_interval_seconds
+        self.checkpoint_retry_seconds = checkpoint_retry_seconds
+        # Samples are organized as {'key': _Samples}, for keys with samples which are pending, being applied, or
+        # applied but not checkpointed yet
+        self._samples = dict()
+        # number of `flush` calls waiting on each key, whose samples are applied without waiting for a full batch
+        self._flushing = dict()
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = {"submitted": 0, "applied": 0, "batches": 0, "failed": 0, "discarded": 0, "checkpoints": 0,
+                       "checkpoint_failures": 0, "apply_seconds_total": 0.0, "checkpoint_seconds_total": 0.0}
+        self._closed = False
+        self._worker_thread = threading.Thread(target=self._worker, name="online-trainer", daemon=True)
+        self._worker_thread.start()
+
+    def submit(self, key, features, target_class):
+        """
+        Queues a training sample for the network stored under `key`.
+
+        :param key: network key, i.e. the network name
+        :param features: vector of feature values
+        :param target_class: the class index which is being represented by the feature values
+        :return: the number of samples of `key` waiting to be applied, including this one
+        """
+        features = numpy.asarray(features, dtype=float).ravel()
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("online trainer has been shut down")
+                samples = self._samples.get(key)
+                if samples is None:
+                    samples = self._samples[key] = _Samples()
+                if len(samples) < self.max_pending:
+                    break
+                self._cond.wait()
+            samples.add(features, int(target_class), time.monotonic())
+            self._stats["submitted"] += 1
+            if len(samples) == 1 or len(samples) == self.batch_size:  # the worker has a new deadline or a full batch
+                self._cond.notify_all()
+            return len(samples)
+
+    def pending(self, key):
+        """
+        :param key: network key
+        :return: the number of samples of `key` waiting to be applied
+        """
+        with self._cond:
+            samples = self._samples.get(key)
+            return len(samples) if samples is not None else 0
+
+    def flush(self, key=None, timeout=None):
+        """
+        Blocks until every sample of `key` (or of every key) submitted so far has been applied.
+
+        :param key: (optional) network key, by default every key is flushed
+        :param timeout: (optional) maximum number of seconds to wait
+        :return: True if all samples were applied, False on timeout
+        """
+        with self._cond:
+            keys = [key] if key is not None else list(self._samples)
+            for flushed_key in keys:
+                self._flushing[flushed_key] = self._flushing.get(flushed_key, 0) + 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: not any(self._is_pending(flushed_key) for flushed_key in keys),
+                                           timeout)
+            finally:
+                for flushed_key in keys:
+                    self._flushing[flushed_key] -= 1
+                    if not self._flushing[flushed_key]:
+                        self._flushing.pop(flushed_key)
+
+    def discard(self, key):
+        """
+        Drops the pending samples of `key` and any outstanding checkpoint of it, waiting for a batch (or checkpoint) of
+        `key` which is in progress to finish, i.e. before the network is committed or deleted.
+
+        :param key: network key
+        :return: the number of samples dropped
+        """
+        with self._cond:
+            while key in self._samples and self._samples[key].busy:
+                self._cond.wait()
+            samples = self._samples.pop(key, None)
+            discarded_count = len(samples) if samples is not None else 0
+            self._stats["discarded"] += discarded_count
+            self._cond.notify_all()  # submissions blocked on the discarded samples may continue
+            return discarded_count
+
+    def shutdown(self, timeout=None):
+        """
+        Applies every pending sample, checkpoints every network with unsaved samples and stops the worker thread.
+        Registered to run when the API process exits.
+
+        :param timeout: (optional) maximum number of seconds to wait for the worker thread
+        :return:
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker_thread.join(timeout)
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({"pending": sum(len(samples) for samples in self._samples.values()),
+                          "unsaved": sum(samples.unsaved for samples in self._samples.values())})
+        stats["average_batch_size"] = stats["applied"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _is_pending(self, key):
+        samples = self._samples.get(key)
+        return samples is not None and (len(samples) > 0 or samples.busy)
+
+    def _next_task(self, now):
+        # Caller must hold `_cond`. Returns (key, samples, task) of the next batch or checkpoint which is due, or
+        # (None, None, seconds until the next deadline) if nothing is due yet.
+        timeout = None
+        for key, samples in self._samples.items():
+            if samples.busy:
+                continue
+            if len(samples):
+                apply_at = samples.first_time + self.max_delay_ms / 1000.0
+                if len(samples) >= self.batch_size or now >= apply_at or self._closed or key in self._flushing:
+                    return key, samples, self._apply
+                timeout = apply_at - now if timeout is None else min(timeout, apply_at - now)
+            if samples.unsaved and self.checkpoint is not None and now >= samples.retry_time:
+                checkpoint_at = samples.unsaved_time + self.checkpoint_interval_seconds if \
+                    self.checkpoint_interval_seconds else None
+                if self._closed or (0 < self.checkpoint_samples <= samples.unsaved) or \
+                        (checkpoint_at is not None and now >= checkpoint_at):
+                    return key, samples, self._checkpoint
+                if checkpoint_at is not None:
+                    timeout = checkpoint_at - now if timeout is None else min(timeout, checkpoint_at - now)
+            elif samples.unsaved and self.checkpoint is not None:
+                timeout = samples.retry_time - now if timeout is None else min(timeout, samples.retry_time - now)
+        return None, None, timeout
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    key, samples, task = self._next_task(time.monotonic())
+                    if key is not None:
+                        break
+                    if self._closed:
+                        return
+                    self._cond.wait(task)
+                samples.busy = True
+            try:
+                task(key, samples)
+            finally:
+                with self._cond:
+                    samples.busy = False
+                    if not len(samples) and not samples.unsaved and self._samples.get(key) is samples:
+                        self._samples.pop(key)
+                    self._cond.notify_all()
+
+    def _apply(self, key, samples):
+        with self._cond:
+            rows, target_classes = samples.take(self.batch_size)
+        start_time = time.perf_counter()
+        applied_count, failed_count = 0, 0
+        # samples can only be stacked with samples of the same length, mismatched samples fail on their own
+        for indices in indices_by_length(rows).values():
+            try:
+                applied = self.apply_batch(key, numpy.vstack([rows[index] for index in indices]),
+                                           numpy.array([target_classes[index] for index in indices]))
+            except Exception:
+                logger.exception("[Online Training] Failed to apply %d samples to %s", len(indices), key)
+                applied = False
+            if applied is False:
+                failed_count += len(indices)
+            else:
+                applied_count += len(indices)
+        elapsed = time.perf_counter() - start_time
+        with self._cond:
+            self._stats["applied"] += applied_count
+            self._stats["failed"] += failed_count
+            self._stats["batches"] += 1
+            self._stats["apply_seconds_total"] += elapsed
+            if applied_count and self.checkpoint is not None and self._samples.get(key) is samples:
+                # counted towards the next checkpoint, unless the samples were discarded while being applied
+                if not samples.unsaved:
+                    samples.unsaved_time = time.monotonic()
+                samples.unsaved += applied_count
+
+    def _checkpoint(self, key, samples):
+        with self._cond:
+            unsaved, unsaved_time = samples.unsaved, samples.unsaved_time
+            samples.unsaved = 0
+        start_time = time.perf_counter()
+        try:
+            self.checkpoint(key)
+            failed = False
+        except Exception:
+            logger.exception("[Online Training] Failed to checkpoint %s", key)
+            failed = True
+        elapsed = time.perf_counter() - start_time
+        with self._cond:
+            self._stats["checkpoint_failures" if failed else "checkpoints"] += 1
+            self._stats["checkpoint_seconds_total"] += elapsed
+            if failed and self._samples.get(key) is samples and not self._closed:
+                # the samples remain unsaved, and are checkpointed again after a delay
+                if not samples.unsaved:
+                    samples.unsaved_time = unsaved_time
+                samples.unsaved += unsaved
+                samples.retry_time = time.monotonic() + self.checkpoint_retry_seconds
+
+
+class _Samples:
+    def __init__(self):
+        self.rows = list()
+        self.target_classes = list()
+        # time the oldest pending sample was submitted at
+        self.first_time = 0.0
+        # number of applied samples which are not checkpointed yet, and the time the first of them was applied at
+        self.unsaved = 0
+        self.unsaved_time = 0.0
+        self.retry_time = 0.0
+        # True while a batch or checkpoint of these samples is in progress
+        self.busy = False
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, features, target_class, submit_time):
+        if not self.rows:
+            self.first_time = submit_time
+        self.rows.append(features)
+        self.target_classes.append(target_class)
+
+    def take(self, count):
+        rows, target_classes = self.rows[:count], self.target_classes[:count]
+        del self.rows[:count], self.target_classes[:count]
+        return rows, target_classes
@@ -0,0 +1,154 @@
+import logging
+import queue
+import threading
+import time
+from APIHelpers.io_helper import serialize_network, write_network_file
+from neural_network import NeuralNetwork
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    def __init__(self, max_pending=1000, workers=2, fsync=False, atomic=True):
+        """
+        Saves NeuralNetwork objects to disk from a pool of background writer threads, so request handlers only pay for
+        an in-memory snapshot of the weights. Repeated saves of the same file which are still waiting to be written
+        are coalesced into a single write of the latest snapshot.
+
+        :param max_pending: maximum number of files waiting to be written, `submit` blocks while the queue is full
+        :param workers: number of writer threads
+        :param fsync: if True, every write is flushed to the storage device
+        :param atomic: if True, files are replaced atomically (write to a temporary file, then rename)
+        """
+        self.fsync = fsync
+        self.atomic = atomic
+        # Snapshots are organized as {'path': serialized network}, for files waiting to be written and being written
+        self._pending = dict()
+        self._writing = dict()
+        self._cond = threading.Condition(threading.Lock())
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stats = {"submitted": 0, "coalesced": 0, "written": 0, "failed": 0, "discarded": 0,
+                       "write_seconds_total": 0.0, "write_seconds_max": 0.0}
+        self._closed = False
+        self._workers = [threading.Thread(target=self._worker, name="network-writer-{0}".format(i), daemon=True)
+                         for i in range(max(1, int(workers)))]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, neural_network_obj, outputfile):
+        """
+        Schedules a snapshot of the network to be written to `outputfile`. Has the same signature and return value as
+        `save_pretrained_network`, so it can be used in its place.
+
+        :param neural_network_obj: NeuralNetwork class object for serialization to file
+        :param outputfile: location of file to save the serialized object to
+        :return: boolean representing if the network was scheduled to be written
+        """
+        if not isinstance(neural_network_obj, NeuralNetwork):
+            return False
+        network_data = serialize_network(neural_network_obj)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("write-behind queue has been shut down")
+            self._stats["submitted"] += 1
+            already_scheduled = outputfile in self._pending or outputfile in self._writing
+            self._pending[outputfile] = network_data
+            if already_scheduled:  # the scheduled (or in-progress) write picks up the latest snapshot
+                self._stats["coalesced"] += 1
+                return True
+        self._queue.put(outputfile)
+        return True
+
+    def latest(self, path):
+        """
+        Returns the most recent snapshot scheduled for `path` which has not finished being written yet, i.e. to load a
+        network whose file on disk is still out of date.
+
+        :param path: location of a serialized network
+        :return: bytes of the serialized network, or None if no write is outstanding for `path`
+        """
+        with self._cond:
+            return self._pending.get(path, self._writing.get(path))
+
+    def discard(self, path):
+        """
+        Cancels any outstanding write for `path` and waits for an in-progress write to finish, so the file can safely
+        be removed afterwards.
+
+        :param path: location of a serialized network
+        :return:
+        """
+        with self._cond:
+            if self._pending.pop(path, None) is not None:
+                self._stats["discarded"] += 1
+            while path in self._writing:
+                self._cond.wait()
+
+    def flush(self, timeout=None):
+        """
+        Blocks until every scheduled write has completed.
+
+        :param timeout: (optional) maximum number of seconds to wait
+        :return: True if all writes completed, False on timeout
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def shutdown(self, timeout=None):
+        """
+        Flushes all scheduled writes and stops the writer threads. Registered to run when the API process exits.
+
+        :param timeout: (optional) maximum number of seconds to wait for outstanding writes
+        :return:
+        """
+        with self._cond:
+            if self._closed:
+                return
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({"queue_depth": len(self._pending), "writes_in_progress": len(self._writing)})
+        stats["write_seconds_avg"] = stats["write_seconds_total"] / stats["written"] if stats["written"] else 0.0
+        return stats
+
+    def _worker(self):
+        while True:
+            path = self._queue.get()
+            if path is None:
+                return
+            with self._cond:
+                network_data = self._pending.pop(path, None)
+                if network_data is None:  # discarded before it was written
+                    continue
+                self._writing[path] = network_data
+            try:
+                while network_data is not None:
+                    start_time = time.perf_counter()
+                    try:
+                        write_network_file(network_data, path, fsync=self.fsync, atomic=self.atomic)
+                        failed = False
+                    except Exception:
+                        logger.exception("[Write-Behind] Failed to write network file %s", path)
+                        failed = True
+                    elapsed = time.perf_counter() - start_time
+                    with self._cond:
+                        self._stats["failed" if failed else "written"] += 1
+                        self._stats["write_seconds_total"] += elapsed
+                        self._stats["write_seconds_max"] = max(self._stats["write_seconds_max"], elapsed)
+                        # snapshots submitted while writing were coalesced into this path, write the latest one next
+                        network_data = self._pending.pop(path, None)
+                        if network_data is not None:
+                            self._writing[path] = network_data
+            finally:
+                # the path is released even if the writer fails unexpectedly, so `flush` and `discard` never wait on it
+                with self._cond:
+                    self._writing.pop(path, None)
+                    self._cond.notify_all()
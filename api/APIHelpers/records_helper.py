@@ -0,0 +1,80 @@
+import numpy
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import OperationFailure
+from APIHelpers.schema_helper import FEATURES_FIELD, stored_field
+
+# request arguments of the /records endpoints which control the response, rather than filter the records
+RECORD_QUERY_OPTIONS = ("max", "limit", "after", "fields", "format")
+
+
+def read_feature_matrix(records_db, match, input_nodes):
+    """
+    Reads every matching record from the db into a feature matrix and a vector of target classes, only transferring
+    the numeric "features" array and "target_class" of each record.
+
+    :param records_db: DBConnection to the records collection
+    :param match: db filter selecting the records
+    :param input_nodes: number of feature values per record
+    :return: tuple of (float matrix of shape (records, input nodes), int vector of target classes)
+    """
+    features, target_classes = list(), list()
+    try:
+        for record in records_db.read_documents(match, {FEATURES_FIELD: 1, "target_class": 1}):
+            if len(record[FEATURES_FIELD]) < input_nodes:
+                raise ValueError("record {0} has fewer than {1} feature values".format(record["_id"], input_nodes))
+            features.append(record[FEATURES_FIELD][:input_nodes])
+            target_classes.append(record['target_class'])
+    except KeyError as e:  # a matching record has no feature values, or no target class
+        raise ValueError("record is missing field {0}".format(e))
+    except OperationFailure as e:  # the filter was rejected by the db
+        raise ValueError("invalid record filter: {0}".format(e))
+    return (numpy.array(features, dtype=float).reshape(len(features), input_nodes),
+            numpy.array(target_classes, dtype=int))
+
+
+def split_record_query(request_values):
+    """
+    Separates the response options of a /records request (see `RECORD_QUERY_OPTIONS`) from the record filter.
+
+    :param request_values: dictionary of request arguments
+    :return: tuple of (record filter, dictionary of response options)
+    """
+    record_filter = dict(request_values)
+    options = {option: record_filter.pop(option) for option in RECORD_QUERY_OPTIONS if option in record_filter}
+    return record_filter, options
+
+
+def build_projection(fields):
+    """
+    Builds a db projection which only returns the requested fields (and the `_id` used for pagination). Requesting any
+    single feature value ("0", "1", ...) returns the full features array.
+
+    :param fields: list of field names, or a comma-separated string of field names
+    :return: projection dictionary, or None if no fields were requested
+    """
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",")]
+    fields = [field for field in (fields or list()) if field]
+    if not fields:
+        return None
+    projection = {stored_field(field): 1 for field in fields}
+    projection["_id"] = 1
+    return projection
+
+
+def page_filter(record_filter, after):
+    """
+    Restricts a record filter to the records following the `after` record, in `_id` order (cursor-based pagination).
+
+    :param record_filter: db filter selecting the records
+    :param after: `_id` (string) of the last record of the previous page, or None for the first page
+    :return: the record filter for the requested page
+    """
+    if not after:
+        return record_filter
+    try:
+        after_filter = {"_id": {"$gt": ObjectId(str(after))}}
+    except InvalidId:
+        raise ValueError("invalid record cursor: {0}".format(after))
+    return {"$and": [record_filter, after_filter]} if record_filter else after_filter
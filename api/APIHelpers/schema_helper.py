@@ -0,0 +1,166 @@
+from pymongo import UpdateOne
+
+# Records are stored with their feature values in a single numeric array, and typed class/usage fields:
+# {"record_id": str, "features": [float, ...], "target_class": int, "training_record": bool}
+FEATURES_FIELD = "features"
+FIELD_TYPES = {"target_class": int, "training_record": bool}
+# operators whose operands are not record values, and so are never coerced
+UNTYPED_OPERATORS = ("$regex", "$options", "$exists", "$type", "$size")
+# version of the stored schema, recorded per records collection once its records are converted (see `migrate_records`)
+SCHEMA_VERSION = 1
+
+
+def record_document(features, target_class, training_record, **fields):
+    """
+    Builds a record document in the stored schema.
+
+    :param features: list of feature values
+    :param target_class: expected class index of the record
+    :param training_record: whether the record is used for training (True) or testing (False)
+    :param fields: any additional fields, i.e. "record_id"
+    :return: record document
+    """
+    document = dict(fields)
+    document.update({FEATURES_FIELD: [float(value) for value in features],
+                     "target_class": int(float(target_class)),
+                     "training_record": to_bool(training_record)})
+    return document
+
+
+def normalize_document(document):
+    """
+    Converts a record document in any layout (i.e. the legacy layout, which stores every feature value under its own
+    key "0", "1", ... "n-1" and every value as a string) to the stored schema. Fields which are not part of the schema
+    are kept unchanged.
+
+    :param document: record document
+    :return: a new record document in the stored schema
+    """
+    document = dict(document)
+    feature_keys = sorted((key for key in document if key.isdigit()), key=int)
+    if feature_keys:
+        document[FEATURES_FIELD] = [document.pop(key) for key in feature_keys]
+    if FEATURES_FIELD in document:
+        document[FEATURES_FIELD] = [float(value) for value in document[FEATURES_FIELD]]
+    if "target_class" in document:
+        document["target_class"] = int(float(document["target_class"]))
+    if "training_record" in document:
+        document["training_record"] = to_bool(document["training_record"])
+    return document
+
+
+def coerce_filter(record_filter):
+    """
+    Converts the values of a record filter to the stored types, so filters built from request arguments (i.e.
+    {"training_record": "False"}) match the stored records. Conditions on a single feature value "i" are rewritten to
+    the array element "features.i".
+
+    :param record_filter: db filter selecting records
+    :return: a new filter with typed values
+    """
+    coerced_filter = dict()
+    for field, condition in record_filter.items():
+        if field in ("$and", "$or", "$nor"):
+            coerced_filter[field] = [coerce_filter(sub_filter) for sub_filter in condition]
+        elif field.isdigit():
+            coerced_filter["{0}.{1}".format(FEATURES_FIELD, field)] = _coerce_condition(condition, float)
+        elif field in FIELD_TYPES:
+            coerced_filter[field] = _coerce_condition(condition, FIELD_TYPES[field])
+        else:
+            coerced_filter[field] = condition
+    return coerced_filter
+
+
+def stored_field(field):
+    # the stored field holding a requested record field, i.e. feature "3" is stored in "features"
+    return FEATURES_FIELD if field.isdigit() else field
+
+
+def to_api_record(document):
+    """
+    Converts a stored record to the layout returned by the API, with each feature value under its own key "0", "1",
+    ... "n-1".
+
+    :param document: stored record document
+    :return: the record document in the API layout
+    """
+    document = dict(document)
+    for index, value in enumerate(document.pop(FEATURES_FIELD, ())):
+        document[str(index)] = value
+    return document
+
+
+def migrate_records(records_db, chunk_size=5000, schema_db=None):
+    """
+    Converts every record stored in the legacy layout to the stored schema, see `normalize_document`. Records which
+    are already converted are skipped, so the migration can safely be run more than once.
+    Finding the legacy records scans the whole collection, so when `schema_db` is provided the conversion is recorded
+    there and later calls return after a single lookup of that marker document.
+
+    :param records_db: DBConnection to the records collection
+    :param chunk_size: number of records converted per bulk operation
+    :param schema_db: (optional) DBConnection to the collection of schema version markers
+    :return: number of converted records
+    """
+    schema_marker = {"_id": records_db.namespace[2]}
+    if schema_db is not None and \
+            schema_db.record_exists(dict(schema_marker, schema_version={"$gte": SCHEMA_VERSION})):
+        return 0
+    legacy_filter = {"$or": [{"0": {"$exists": True}},
+                             {"target_class": {"$type": "string"}},
+                             {"training_record": {"$type": "string"}}]}
+    converted_count = 0
+    operations = list()
+    for document in records_db.read_documents(legacy_filter):
+        normalized_document = normalize_document(document)
+        update = {"$set": {key: value for key, value in normalized_document.items() if key != "_id"}}
+        removed_keys = [key for key in document if key not in normalized_document]
+        if removed_keys:
+            update["$unset"] = {key: "" for key in removed_keys}
+        operations.append(UpdateOne({"_id": document["_id"]}, update))
+        if len(operations) >= chunk_size:
+            converted_count += records_db.bulk_update(operations)
+            operations = list()
+    if operations:
+        converted_count += records_db.bulk_update(operations)
+    if schema_db is not None:
+        schema_db.bulk_update([UpdateOne(schema_marker, {"$set": {"schema_version": SCHEMA_VERSION}}, upsert=True)])
+    return converted_count
+
+
+def to_bool(value):
+    """
+    :param value: boolean, number or string ("True"/"False", in any case, or "1"/"0")
+    :return: the boolean value
+    """
+    if isinstance(value, str):
+        if value.strip().lower() in ("true", "1"):
+            return True
+        if value.strip().lower() in ("false", "0"):
+            return False
+        raise ValueError("invalid boolean value: {0}".format(value))
+    return bool(value)
+
+
+def _coerce_condition(condition, value_type):
+    if not isinstance(condition, dict):
+        return _convert(condition, value_type)
+    coerced_condition = dict()
+    for operator, operand in condition.items():
+        if operator in UNTYPED_OPERATORS:
+            coerced_condition[operator] = operand
+        elif operator == "$not":
+            coerced_condition[operator] = _coerce_condition(operand, value_type)
+        elif isinstance(operand, (list, tuple)):
+            coerced_condition[operator] = [_convert(value, value_type) for value in operand]
+        else:
+            coerced_condition[operator] = _convert(operand, value_type)
+    return coerced_condition
+
+
+def _convert(value, value_type):
+    if value is None:  # matches records without the field
+        return None
+    if value_type is bool:
+        return to_bool(value)
+    return int(float(value)) if value_type is int else value_type(value)
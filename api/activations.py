@@ -0,0 +1,118 @@
+import numpy
+from scipy import special
+
+
+class Activation:
+    def __init__(self, name, function, derivative, unit_interval=True):
+        """
+        Activation function of the network nodes, referenced by name so that networks can be stored without code.
+
+        :param name: name of the activation, as stored with serialized networks
+        :param function: computes the activation of an array, called as function(x, out=...) to compute it in place
+        :param derivative: computes the derivative of the activation from its outputs `y` (not its inputs), called as
+        derivative(y, out=...), as the backward pass only keeps the outputs of each layer
+        :param unit_interval: True if the outputs lie within (0, 1), which is required of the output layer as it is
+        trained towards 0.01/0.99 targets and read as class confidences
+        """
+        self.name = name
+        self.function = function
+        self.derivative = derivative
+        self.unit_interval = unit_interval
+
+    def __repr__(self):
+        return "Activation({0})".format(self.name)
+
+
+def _sigmoid_derivative(y, out=None):
+    out = numpy.subtract(1.0, y, out=out)
+    out *= y
+    return out
+
+
+def _tanh_derivative(y, out=None):
+    out = numpy.multiply(y, y, out=out)
+    return numpy.subtract(1.0, out, out=out)
+
+
+def _relu(x, out=None):
+    return numpy.maximum(x, 0.0, out=out)
+
+
+def _relu_derivative(y, out=None):
+    return numpy.greater(y, 0.0, out=out) if out is not None else numpy.greater(y, 0.0).astype(y.dtype)
+
+
+def _fast_sigmoid(x, out=None):
+    # 0.5 * x / (1 + |x|) + 0.5, a sigmoid shaped curve without exponentials which approaches 0/1 more slowly
+    denominator = numpy.abs(x)
+    denominator += 1.0
+    out = numpy.divide(x, denominator, out=out)
+    out *= 0.5
+    out += 0.5
+    return out
+
+
+def _fast_sigmoid_derivative(y, out=None):
+    # with s = 2y - 1 = x / (1 + |x|), the derivative 0.5 / (1 + |x|)^2 equals 0.5 * (1 - |s|)^2
+    out = numpy.multiply(y, 2.0, out=out)
+    out -= 1.0
+    numpy.abs(out, out=out)
+    numpy.subtract(1.0, out, out=out)
+    out *= out
+    out *= 0.5
+    return out
+
+
+# The lookup table sigmoid reads the nearest of LUT_SIZE precomputed values between -LUT_RANGE and LUT_RANGE, beyond
+# which the sigmoid is within 0.0004 of 0/1. The largest error against the exact sigmoid is about 0.001.
+LUT_RANGE = 8.0
+LUT_SIZE = 4096
+_LUT_SCALE = (LUT_SIZE - 1) / (2 * LUT_RANGE)
+_LUT_TABLES = {dtype: special.expit(numpy.linspace(-LUT_RANGE, LUT_RANGE, LUT_SIZE)).astype(dtype)
+               for dtype in (numpy.dtype(numpy.float32), numpy.dtype(numpy.float64))}
+
+
+def _lut_sigmoid(x, out=None):
+    indices = numpy.clip(x, -LUT_RANGE, LUT_RANGE)
+    indices += LUT_RANGE
+    indices *= _LUT_SCALE
+    indices += 0.5  # rounds to the nearest table entry when truncated
+    table = _LUT_TABLES.get(numpy.dtype(x.dtype), _LUT_TABLES[numpy.dtype(numpy.float64)])
+    return numpy.take(table, indices.astype(numpy.intp), out=out)
+
+
+# Activations are organized as {'name': Activation}
+ACTIVATIONS = {activation.name: activation for activation in (
+    Activation("sigmoid", special.expit, _sigmoid_derivative),
+    Activation("tanh", numpy.tanh, _tanh_derivative, unit_interval=False),
+    Activation("relu", _relu, _relu_derivative, unit_interval=False),
+    Activation("fast_sigmoid", _fast_sigmoid, _fast_sigmoid_derivative),
+    Activation("lut_sigmoid", _lut_sigmoid, _sigmoid_derivative))}
+DEFAULT_ACTIVATION = "sigmoid"
+
+
+def get_activation(name):
+    """
+    :param name: name of a registered activation, see ACTIVATIONS
+    :return: the Activation registered under `name`
+    """
+    activation = ACTIVATIONS.get(name)
+    if activation is None:
+        raise ValueError("unknown activation {0}, expected one of {1}".format(name, ", ".join(sorted(ACTIVATIONS))))
+    return activation
+
+
+def get_output_activation(name=None, activation=DEFAULT_ACTIVATION):
+    """
+    :param name: (optional) name of a registered activation for the output layer
+    :param activation: name of the activation of the hidden layers, used for the output layer as well unless `name` is
+    given or its outputs are not within (0, 1), in which case the output layer is a sigmoid
+    :return: the Activation of the output layer
+    """
+    if name is None:
+        hidden_activation = get_activation(activation)
+        return hidden_activation if hidden_activation.unit_interval else get_activation(DEFAULT_ACTIVATION)
+    output_activation = get_activation(name)
+    if not output_activation.unit_interval:
+        raise ValueError("{0} cannot activate the output layer, its outputs are not within (0, 1)".format(name))
+    return output_activation
@@ -0,0 +1,14 @@
+from APIHelpers import io_helper
+
+config_data = io_helper.load_config_data()
+
+
+def main():
+    # Convert networks saved by older API versions (dill pickles) into the binary network format, in place
+    converted, skipped = io_helper.migrate_pretrained_networks(config_data['trained_networks_directory'])
+    print("[Network Migration] Converted {0} network file(s) in '{1}' ({2} skipped)...".format(
+        converted, config_data['trained_networks_directory'], skipped))
+
+
+if __name__ == '__main__':
+    main()
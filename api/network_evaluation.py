@@ -0,0 +1,114 @@
+import numpy
+
+
+def evaluate_network(neural_network, features, target_classes, include_roc_curve=False):
+    """
+    Scores a network against a full matrix of test records in a single batched forward pass.
+
+    :param neural_network: NeuralNetwork object to evaluate
+    :param features: float matrix of shape (records, input nodes) holding one record of feature values per row
+    :param target_classes: vector of the expected class index for each record
+    :param include_roc_curve: if True, the (false positive rate, true positive rate) points of each ROC curve are
+    included in the results
+    :return: dictionary of evaluation metrics, see `evaluate_outputs`
+    """
+    return evaluate_outputs(neural_network.query_batch(features), target_classes, include_roc_curve)
+
+
+def evaluate_outputs(network_outputs, target_classes, include_roc_curve=False):
+    """
+    Computes classification metrics from raw network outputs, where the identified class of each record is the output
+    node with the highest activation. ROC curves are computed one-vs-rest, using each output node's raw activation as
+    the score for its class.
+
+    :param network_outputs: float matrix of shape (records, output nodes)
+    :param target_classes: vector of the expected class index for each record
+    :param include_roc_curve: if True, the (false positive rate, true positive rate) points of each ROC curve are
+    included in the results
+    :return: dictionary with the record count, accuracy, confusion matrix (rows are expected classes, columns are
+    identified classes), per-class precision/recall and per-class ROC AUC (None where a class has no positive or no
+    negative records)
+    """
+    network_outputs = numpy.array(network_outputs, dtype=float, ndmin=2)
+    target_classes = numpy.asarray(target_classes).astype(int).ravel()
+    record_count, class_count = network_outputs.shape
+    if record_count != target_classes.shape[0]:
+        raise ValueError("network outputs and target classes must contain the same number of records")
+    if record_count and (target_classes.min() < 0 or target_classes.max() >= class_count):
+        raise ValueError("target classes must be valid output node indices")
+    identified_classes = numpy.argmax(network_outputs, axis=1)
+
+    confusion_matrix = numpy.bincount(target_classes * class_count + identified_classes,
+                                      minlength=class_count * class_count).reshape(class_count, class_count)
+    true_positives = numpy.diag(confusion_matrix)
+    predicted_counts = confusion_matrix.sum(axis=0)
+    expected_counts = confusion_matrix.sum(axis=1)
+
+    results = {"record_count": int(record_count),
+               "accuracy": float(true_positives.sum()) / record_count if record_count else 0.0,
+               "confusion_matrix": confusion_matrix.tolist(),
+               "precision": _safe_ratio(true_positives, predicted_counts),
+               "recall": _safe_ratio(true_positives, expected_counts),
+               "roc_auc": list()}
+    if include_roc_curve:
+        results["roc_curve"] = list()
+    for class_index in range(class_count):
+        false_positive_rate, true_positive_rate = roc_curve(network_outputs[:, class_index],
+                                                            target_classes == class_index)
+        if false_positive_rate is None:
+            results["roc_auc"].append(None)
+        else:  # area under the curve, using the trapezoidal rule
+            results["roc_auc"].append(float(numpy.sum(numpy.diff(false_positive_rate) *
+                                                      (true_positive_rate[1:] + true_positive_rate[:-1]) / 2)))
+        if include_roc_curve:
+            results["roc_curve"].append(None if false_positive_rate is None else
+                                        {"fpr": false_positive_rate.tolist(), "tpr": true_positive_rate.tolist()})
+    return results
+
+
+def split_validation_records(training_data, validation_split, seed=None):
+    """
+    Randomly splits a fraction of the records off as a validation set.
+
+    :param training_data: tuple of (feature matrix, target classes)
+    :param validation_split: fraction of the records held out for validation, 0 keeps every record for training
+    :param seed: (optional) seed of the random split
+    :return: tuple of (training records, validation records or None), each as a tuple of (features, target classes)
+    """
+    features, target_classes = training_data
+    validation_count = int(len(target_classes) * validation_split)
+    if validation_count < 1:
+        return training_data, None
+    order = numpy.random.RandomState(seed).permutation(len(target_classes))
+    validation_rows, training_rows = order[:validation_count], order[validation_count:]
+    return (features[training_rows], target_classes[training_rows]), \
+        (features[validation_rows], target_classes[validation_rows])
+
+
+def roc_curve(scores, labels):
+    """
+    Computes the points of a ROC curve, one per distinct score threshold.
+
+    :param scores: vector of scores, where higher values indicate the positive class
+    :param labels: boolean vector marking the positive records
+    :return: tuple of (false positive rates, true positive rates), starting at (0, 0), or (None, None) if there are no
+    positive or no negative records
+    """
+    labels = numpy.asarray(labels, dtype=bool)
+    positives = labels.sum()
+    negatives = labels.shape[0] - positives
+    if not positives or not negatives:
+        return None, None
+    order = numpy.argsort(scores, kind="mergesort")[::-1]
+    sorted_scores, sorted_labels = numpy.asarray(scores)[order], labels[order]
+    # only the last record of each run of equal scores is a threshold on the curve
+    threshold_indices = numpy.r_[numpy.flatnonzero(numpy.diff(sorted_scores)), sorted_labels.shape[0] - 1]
+    true_positives = numpy.cumsum(sorted_labels)[threshold_indices]
+    false_positives = (threshold_indices + 1) - true_positives
+    return (numpy.r_[0.0, false_positives / float(negatives)],
+            numpy.r_[0.0, true_positives / float(positives)])
+
+
+def _safe_ratio(numerators, denominators):
+    # per-class ratio, 0.0 where the denominator is 0 (i.e. a class which was never identified)
+    return [float(n) / d if d else 0.0 for n, d in zip(numerators, denominators)]
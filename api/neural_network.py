@@ -1,26 +1,110 @@
+import threading
 import numpy
-from scipy import special
+import activations
+import network_evaluation
+import optimizers
+
+# Floating point precisions the network weights and computations can use, by name
+NETWORK_DTYPES = {"float32": numpy.dtype(numpy.float32), "float64": numpy.dtype(numpy.float64)}
 
 
 class NeuralNetwork:
-    def __init__(self, input_nodes, hidden_nodes, output_nodes, learning_rate):
+    def __init__(self, input_nodes, hidden_nodes, output_nodes, learning_rate, weights=None, seed=None, dtype=None,
+                 activation=activations.DEFAULT_ACTIVATION, parameters=None, optimizer=None, output_activation=None,
+                 bias=False):
         """
-        Constructs a shallow perceptron network with randomized weights using the provided parameters.
+        Constructs a perceptron network with randomized weights using the provided parameters.
+        The weights of every layer are views into a single contiguous parameter buffer (`parameters`), so the network
+        is updated, copied and serialized as one array regardless of its depth.
 
         :param input_nodes: Number of input nodes in the network.
-        :param hidden_nodes: Number of hidden nodes in the network.
+        :param hidden_nodes: Number of hidden nodes in the network, or a list with the number of nodes of each hidden
+        layer (i.e. [16, 8]) for a deep network.
         :param output_nodes: Number of output nodes in the network.
         :param learning_rate: The factor applied to the activation function when new network weights are learned.
+        :param weights: (optional) list of existing weight arrays, one per layer (i.e. (input-hidden, hidden-output)),
+        to use instead of randomized weights. The arrays are copied into the parameter buffer.
+        :param seed: (optional) seed for the randomized weights, so that the same seed always creates the same network
+        :param dtype: (optional) precision of the weights and computations, "float32" or "float64". Defaults to float64
+        for new networks, and to the precision of the provided `weights`/`parameters` (which are converted if it
+        differs)
+        :param activation: name of the activation function of the network nodes, see `activations.ACTIVATIONS`
+        :param parameters: (optional) flat array holding the weights of every layer in order (C order), i.e. when
+        loading a pretrained network. The array is used as-is, without copying.
+        :param optimizer: (optional) name of the optimizer applying the weight updates ("sgd", "momentum", "adam"), or
+        an `optimizers.Optimizer` object. Defaults to plain stochastic gradient descent with a constant learning rate
+        :param output_activation: (optional) name of the activation function of the output nodes, whose outputs must be
+        within (0, 1). Defaults to `activation`, or to a sigmoid if the outputs of `activation` are not within (0, 1)
+        (i.e. relu)
+        :param bias: if True, every layer after the input layer has a bias (one value per node, initialized to 0) which
+        is added to its inputs and trained with the weights. The biases follow the weights in the parameter buffer.
         """
-        self.inodes = input_nodes
-        self.hnodes = hidden_nodes
-        self.onodes = output_nodes
-        # Initialize weights and learning-rate between input-hidden and hidden-output layer interfaces
-        self.wih = numpy.random.normal(0.0, pow(self.hnodes, -0.5), (self.hnodes, self.inodes))
-        self.who = numpy.random.normal(0.0, pow(self.onodes, -0.5), (self.onodes, self.hnodes))
+        hidden_layers = (hidden_nodes,) if numpy.ndim(hidden_nodes) == 0 else tuple(hidden_nodes)
+        self.layers = tuple(int(nodes) for nodes in (input_nodes,) + hidden_layers + (output_nodes,))
+        if len(self.layers) < 3 or min(self.layers) < 1:
+            raise ValueError("a network requires at least one hidden layer, and at least one node per layer")
+        self.inodes = self.layers[0]
+        self.hnodes = self.layers[1] if len(self.layers) == 3 else self.layers[1:-1]
+        self.onodes = self.layers[-1]
+        dtype = _network_dtype(dtype) if dtype is not None else None
+        self.bias = bool(bias)
+        parameter_count = _parameter_count(self.layers, self.bias)
+        if parameters is not None:
+            if parameters.shape != (parameter_count,):
+                raise ValueError("parameter count does not match the provided node counts")
+            self.parameters = parameters if dtype is None or dtype == parameters.dtype else parameters.astype(dtype)
+        else:
+            if weights is not None:
+                weights = list(weights)
+                dtype = dtype or _network_dtype(weights[0].dtype)
+            self.parameters = numpy.empty(parameter_count, dtype=dtype or NETWORK_DTYPES["float64"])
+        self.weights = _layer_views(self.parameters, self.layers)
+        self.biases = _bias_views(self.parameters, self.layers, self.bias)
+        if parameters is None and self.bias:
+            for layer_bias in self.biases:
+                layer_bias.fill(0.0)
+        if parameters is None and weights is None:
+            # Initialize weights between each pair of layers, scaled by the number of nodes they connect to
+            rng = numpy.random if seed is None else numpy.random.RandomState(seed)
+            for layer_weights in self.weights:
+                layer_weights[...] = rng.normal(0.0, pow(layer_weights.shape[0], -0.5), layer_weights.shape)
+        elif parameters is None:
+            if [layer_weights.shape for layer_weights in weights] != [view.shape for view in self.weights]:
+                raise ValueError("weight shapes do not match the provided node counts")
+            for view, layer_weights in zip(self.weights, weights):
+                view[...] = layer_weights
         self.lr = learning_rate
-        # activation function is the sigmoid function
-        self.activation_function = lambda x: special.expit(x)
+        self.optimizer = optimizer if isinstance(optimizer, optimizers.Optimizer) else \
+            optimizers.create_optimizer(optimizer or optimizers.DEFAULT_OPTIMIZER)
+        self._set_activation(activation, output_activation)
+        # buffers of the single record forward/backward pass, one set per thread as networks are queried concurrently
+        self._workspaces = threading.local()
+
+    @property
+    def dtype(self):
+        return self.parameters.dtype
+
+    @property
+    def wih(self):
+        """
+        Weights between the input layer and the first hidden layer, a view into the parameter buffer.
+        """
+        return self.weights[0]
+
+    @wih.setter
+    def wih(self, weights):
+        self.weights[0][...] = weights
+
+    @property
+    def who(self):
+        """
+        Weights between the last hidden layer and the output layer, a view into the parameter buffer.
+        """
+        return self.weights[-1]
+
+    @who.setter
+    def who(self, weights):
+        self.weights[-1][...] = weights
 
     def train(self, input_features, target_class):
         """
@@ -31,10 +115,10 @@ class NeuralNetwork:
         :param target_class: the class index which is being represented by the feature values
         :return:
         """
-        inputs = numpy.asfarray(input_features)
-        targets = numpy.zeros(self.onodes) + 0.01
-        targets[int(target_class)] = 0.99
-        self._train(inputs, targets)
+        targets = self._workspace().targets
+        targets.fill(0.01)
+        targets[0, int(target_class)] = 0.99
+        self._train(input_features, targets)
 
     def _train(self, inputs_list, targets_list):
         """
@@ -49,6 +133,156 @@ class NeuralNetwork:
         # query network using the current weights, then adjust weights based on output error vs actual targets list
         return self.query(inputs_list, targets_list)
 
+    def train_batch(self, features, target_classes, batch_size=1, epochs=1, shuffle=False, callback=None,
+                    validation_data=None, patience=None, min_delta=0.0, validation_callback=None, seed=None):
+        """
+        Trains the network on a full matrix of records, updating the weights once per mini-batch using matrix-matrix
+        products instead of one column vector per record.
+        With `batch_size=1` and `shuffle=False` the weight updates are identical (in order and value) to calling
+        train(..) once per record.
+        When `validation_data` is provided, the network is scored against it after every epoch and the weights of the
+        epoch with the lowest validation loss are kept, along with the optimizer state of that epoch (i.e. the Adam
+        moments); training stops early once the loss has not improved for `patience` epochs.
+
+        :param features: float matrix of shape (records, input nodes) holding one record of feature values per row
+        :param target_classes: vector of class indices (one per record) which the network is trained towards
+        :param batch_size: number of records whose averaged weight adjustments are applied in a single update
+        :param epochs: number of full passes over the provided records
+        :param shuffle: if True, the record order is randomly permuted at the start of every epoch
+        :param callback: (optional) function called after every mini-batch as callback(records processed, batch loss),
+        where the loss is the mean squared error of the batch outputs prior to its weight update
+        :param validation_data: (optional) tuple of (feature matrix, target classes) of records held out from training
+        :param patience: (optional) number of epochs without an improvement of the validation loss after which training
+        stops, by default every epoch is trained
+        :param min_delta: minimum decrease of the validation loss which counts as an improvement
+        :param validation_callback: (optional) function called after every epoch as callback(epoch, validation loss)
+        :param seed: (optional) seed of the record shuffling, so that the same seed always shuffles in the same order
+        :return: the number of records processed across all epochs
+        """
+        inputs = numpy.atleast_2d(numpy.asarray(features, dtype=self.dtype))
+        targets = self._targets_matrix(target_classes)
+        if inputs.shape[0] != targets.shape[0]:
+            raise ValueError("features and target_classes must contain the same number of records")
+        batch_size = max(1, int(batch_size))
+        record_count = inputs.shape[0]
+        # buffers are allocated once per call and reused by every mini-batch, records are shuffled into copies of the
+        # matrices so that each mini-batch is a contiguous slice
+        workspace = _Workspace(self.layers, self.dtype, rows=min(batch_size, record_count), bias=self.bias)
+        shuffled_inputs, shuffled_targets = (numpy.empty_like(inputs), numpy.empty_like(targets)) if shuffle else \
+            (inputs, targets)
+        rng = numpy.random if seed is None else numpy.random.RandomState(seed)
+        processed_records = 0
+        if validation_data is not None:
+            validation_inputs = numpy.atleast_2d(numpy.asarray(validation_data[0], dtype=self.dtype))
+            validation_targets = self._targets_matrix(validation_data[1])
+            best_parameters, best_optimizer = numpy.empty_like(self.parameters), None
+            best_loss, stale_epochs = numpy.inf, 0
+        for epoch in range(int(epochs)):
+            if shuffle:
+                order = rng.permutation(record_count)
+                numpy.take(inputs, order, axis=0, out=shuffled_inputs)
+                numpy.take(targets, order, axis=0, out=shuffled_targets)
+            for start in range(0, record_count, batch_size):
+                output_errors = self._train_rows(shuffled_inputs[start:start + batch_size],
+                                                 shuffled_targets[start:start + batch_size], workspace)
+                processed_records += output_errors.shape[0]
+                if callback is not None:
+                    callback(processed_records, float(numpy.vdot(output_errors, output_errors)) / output_errors.size)
+            if validation_data is not None:
+                validation_loss = self._loss(validation_inputs, validation_targets)
+                if validation_callback is not None:
+                    validation_callback(epoch + 1, validation_loss)
+                if validation_loss < best_loss - min_delta:
+                    numpy.copyto(best_parameters, self.parameters)
+                    if best_optimizer is None:
+                        best_optimizer = self.optimizer.copy()
+                    else:
+                        best_optimizer.restore(self.optimizer)
+                    best_loss, stale_epochs = validation_loss, 0
+                else:
+                    stale_epochs += 1
+                    if patience is not None and stale_epochs >= patience:
+                        break
+        if validation_data is not None and best_loss < numpy.inf:
+            numpy.copyto(self.parameters, best_parameters)
+            self.optimizer.restore(best_optimizer)
+        return processed_records
+
+    def _loss(self, inputs, targets):
+        # mean squared error of the network outputs for a batch of records, against a matrix of training targets
+        errors = targets - self.query_batch(inputs)
+        return float(numpy.vdot(errors, errors)) / errors.size
+
+    def _targets_matrix(self, target_classes):
+        """
+        Expands a vector of class indices into a (records, output nodes) matrix of 0.01/0.99 training targets, matching
+        the targets built by train(..) for a single record.
+
+        :param target_classes: vector of class indices
+        :return: float matrix of training targets
+        """
+        target_classes = numpy.asarray(target_classes, dtype=float).astype(int).ravel()
+        targets = numpy.full((target_classes.shape[0], self.onodes), 0.01, dtype=self.dtype)
+        targets[numpy.arange(target_classes.shape[0]), target_classes] = 0.99
+        return targets
+
+    def _forward(self, inputs, outputs):
+        """
+        Forward pass of a batch of records stored row-wise through every layer, in place in `outputs`.
+
+        :param inputs: float matrix of shape (batch, input nodes)
+        :param outputs: list of float matrices of shape (batch, layer nodes), one per layer after the input layer
+        :return: the outputs of the output layer
+        """
+        signals = inputs
+        for layer_weights, layer_bias, layer_outputs, activation_function in zip(self.weights, self.biases, outputs,
+                                                                                 self._layer_functions()):
+            numpy.dot(signals, layer_weights.T, out=layer_outputs)
+            if layer_bias is not None:
+                layer_outputs += layer_bias
+            signals = activation_function(layer_outputs, out=layer_outputs)
+        return signals
+
+    def _train_rows(self, inputs, targets, workspace):
+        """
+        Applies a single (averaged) weight update for a batch of records stored row-wise, computing every intermediate
+        result in place in the buffers of `workspace`.
+
+        :param inputs: float matrix of shape (batch, input nodes)
+        :param targets: float matrix of shape (batch, output nodes)
+        :param workspace: _Workspace holding at least `batch` rows
+        :return: the output errors (targets - outputs) of the batch prior to the weight update, shape (batch, output
+        nodes), a view into `workspace` which is overwritten by the next batch
+        """
+        rows = inputs.shape[0]
+        outputs, errors, deltas = workspace.outputs, workspace.errors, workspace.deltas
+        if rows != workspace.rows:  # i.e. the last, partial mini-batch of an epoch
+            outputs = [layer_outputs[:rows] for layer_outputs in outputs]
+            errors = [layer_errors[:rows] for layer_errors in errors]
+            deltas = [layer_deltas[:rows] for layer_deltas in deltas]
+
+        # forward pass for the whole batch, one record per row
+        self._forward(inputs, outputs)
+
+        # the errors of every layer are propagated back through the current weights, before any of them is updated
+        numpy.subtract(targets, outputs[-1], out=errors[-1])
+        for layer in range(len(self.weights) - 1, 0, -1):
+            numpy.dot(errors[layer], self.weights[layer], out=errors[layer - 1])
+
+        # summed adjustments are scaled by the batch size, so a batch of one matches a single record update
+        scale = 1.0 / rows
+        for layer_inputs, layer_outputs, layer_errors, layer_deltas, layer_step, bias_step, derivative in zip(
+                [inputs] + outputs[:-1], outputs, errors, deltas, workspace.layer_steps, workspace.bias_steps,
+                self._layer_derivatives()):
+            self._scaled_deltas(layer_errors, layer_outputs, scale, derivative, out=layer_deltas)
+            numpy.dot(layer_deltas.T, layer_inputs, out=layer_step)
+            if self.bias:
+                numpy.sum(layer_deltas, axis=0, out=bias_step)
+        # the steps of every layer share one buffer laid out like the parameters, which the optimizer scales by the
+        # learning rate and applies in a single pass
+        self.optimizer.apply(self.parameters, workspace.parameter_steps, self.lr)
+        return errors[-1]
+
     def query(self, inputs_list, targets_list=None):
         """
         Accepts a float array of feature values, returning the network output array as a distribution of confidences for
@@ -59,49 +293,184 @@ class NeuralNetwork:
         :param targets_list: (optional) if provided, the network is trained towards these targets for future queries
         :return:
         """
-        # convert inputs list to 2d array
-        inputs = numpy.array(inputs_list, ndmin=2).T
+        # every intermediate result is computed in place in this thread's buffers (a batch of one row), see `_Workspace`
+        workspace = self._workspace()
+        inputs_list = numpy.ravel(inputs_list)
+        if inputs_list.shape[0] != self.inodes:
+            raise ValueError("expected {0} input values, received {1}".format(self.inodes, inputs_list.shape[0]))
+        workspace.inputs[0] = inputs_list
+
+        if targets_list is not None:  # when given a targets list, the network trains towards those targets
+            workspace.targets[0] = numpy.ravel(targets_list)
+            self._train_rows(workspace.inputs, workspace.targets, workspace)
+        else:
+            self._forward(workspace.inputs, workspace.outputs)
+
+        # the outputs are returned as a column, copied out of the buffers which are reused by the next query
+        return workspace.outputs[-1].reshape(-1, 1).copy()
+
+    def query_batch(self, features):
+        """
+        Queries the network with a full matrix of records in a single forward pass.
 
-        # calculate signals into hidden layer
-        hidden_inputs = numpy.dot(self.wih, inputs)
-        # calculate the signals emerging from hidden layer
-        hidden_outputs = self.activation_function(hidden_inputs)
+        :param features: float matrix of shape (records, input nodes) holding one record of feature values per row
+        :return: float matrix of shape (records, output nodes) with the network outputs for each record
+        """
+        signals = numpy.atleast_2d(numpy.asarray(features, dtype=self.dtype))
+        for layer_weights, layer_bias, activation_function in zip(self.weights, self.biases, self._layer_functions()):
+            signals = numpy.dot(signals, layer_weights.T)
+            if layer_bias is not None:
+                signals += layer_bias
+            activation_function(signals, out=signals)
+        return signals
 
-        # calculate signals into final output layer
-        final_inputs = numpy.dot(self.who, hidden_outputs)
-        # calculate the signals emerging from final output layer
-        final_outputs = self.activation_function(final_inputs)
+    def copy(self):
+        """
+        :return: a new NeuralNetwork with the same parameters and a private, writable copy of the weights
+        """
+        return NeuralNetwork(self.inodes, self.hnodes, self.onodes, self.lr, parameters=numpy.array(self.parameters),
+                             activation=self.activation, optimizer=self.optimizer.copy(),
+                             output_activation=self.output_activation, bias=self.bias)
 
-        if targets_list is not None:  # when given a targets list, the network trains towards those targets
-            targets = numpy.array(targets_list, ndmin=2).T
-            # output layer error is the (target - actual)
-            output_errors = targets - final_outputs
-            # hidden layer error is the output_errors, split by weights, recombined at hidden nodes
-            hidden_errors = numpy.dot(self.who.T, output_errors)
+    def _set_activation(self, name, output_name=None):
+        # the activations are stored by name, their functions and derivatives are looked up in the registry
+        activation = activations.get_activation(name)
+        output_activation = activations.get_output_activation(output_name, activation.name)
+        self.activation = activation.name
+        self.activation_function = activation.function
+        self.activation_derivative = activation.derivative
+        self.output_activation = output_activation.name
+        self.output_function = output_activation.function
+        self.output_derivative = output_activation.derivative
 
-            # update the weights for the links between the hidden and output layers
-            self.who += self.lr * numpy.dot((output_errors * final_outputs * (1.0 - final_outputs)),
-                                            numpy.transpose(hidden_outputs))
+    def _layer_functions(self):
+        # the activation function of each layer after the input layer, the last of which is the output layer
+        return [self.activation_function] * (len(self.weights) - 1) + [self.output_function]
 
-            # update the weights for the links between the input and hidden layers
-            self.wih += self.lr * numpy.dot((hidden_errors * hidden_outputs * (1.0 - hidden_outputs)),
-                                            numpy.transpose(inputs))
+    def _layer_derivatives(self):
+        return [self.activation_derivative] * (len(self.weights) - 1) + [self.output_derivative]
 
-        return final_outputs
+    def _scaled_deltas(self, errors, outputs, scale, derivative, out):
+        # computes scale * errors * f'(outputs), the gradient of each node scaled by `scale`, in `out`
+        derivative(outputs, out=out)
+        out *= errors
+        out *= scale
+        return out
+
+    def _workspace(self):
+        workspace = getattr(self._workspaces, "buffers", None)
+        if workspace is None or workspace.inputs.dtype != self.dtype:
+            workspace = _Workspace(self.layers, self.dtype, bias=self.bias)
+            self._workspaces.buffers = workspace
+        return workspace
+
+    def __getstate__(self):
+        # per-thread buffers, layer views and activation functions are not serialized, they are restored from the
+        # parameter buffer and the activation name
+        state = dict(self.__dict__)
+        for attribute in ("_workspaces", "weights", "biases", "activation_function", "activation_derivative",
+                          "output_function", "output_derivative"):
+            state.pop(attribute, None)
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        if "parameters" not in state:  # networks pickled by older versions hold separate wih/who arrays
+            wih, who = state.pop("wih"), state.pop("who")
+            state["layers"] = (state["inodes"], state["hnodes"], state["onodes"])
+            state["parameters"] = numpy.concatenate([wih.ravel(), who.ravel()])
+        state.setdefault("bias", False)
+        self.__dict__.update(state)
+        self.weights = _layer_views(self.parameters, self.layers)
+        self.biases = _bias_views(self.parameters, self.layers, self.bias)
+        if "optimizer" not in state:
+            self.optimizer = optimizers.create_optimizer()
+        # networks pickled by older versions hold a sigmoid lambda and no activation name
+        self._set_activation(state.get("activation", activations.DEFAULT_ACTIVATION), state.get("output_activation"))
+        self._workspaces = threading.local()
+
+    @property
+    def read_only(self):
+        """
+        True if the network weights cannot be changed in place, i.e. when they are mapped read-only from a shared file.
+        """
+        return not (self.parameters.flags.writeable and all(weights.flags.writeable for weights in self.weights) and
+                    all(layer_bias.flags.writeable for layer_bias in self.biases if layer_bias is not None))
 
     def __repr__(self):
-        nrep = "NeuralNetwork(input_nodes: {0}, hidden_nodes: {1}, output_nodes: {2}, learning_rate: {3})".format(
-            self.inodes, self.hnodes, self.onodes, self.lr)
-        nrep += "\n\nInput-Hidden Layer Weights:\n\t{0}\n\nHidden-Output Layer Weights:\n\t{1}\n\n".format(self.wih,
-                                                                                                           self.who)
+        nrep = "NeuralNetwork(input_nodes: {0}, hidden_nodes: {1}, output_nodes: {2}, learning_rate: {3}, " \
+               "activation: {4}, output_activation: {5}, optimizer: {6})\n\n".format(
+                   self.inodes, self.hnodes, self.onodes, self.lr, self.activation, self.output_activation,
+                   self.optimizer.name)
+        for layer, layer_weights in enumerate(self.weights):
+            layer_name = "{0}-{1}".format("Input" if layer == 0 else "Hidden",
+                                          "Output" if layer == len(self.weights) - 1 else "Hidden")
+            nrep += "{0} Layer Weights:\n\t{1}\n\n".format(layer_name, layer_weights)
+            if self.bias:
+                nrep += "{0} Layer Biases:\n\t{1}\n\n".format(layer_name, self.biases[layer])
         return nrep
 
     def __str__(self):
-        nstr = "NeuralNetwork(input_nodes: {0}, hidden_nodes: {1}, output_nodes: {2}, learning_rate: {3})".format(
-            self.inodes, self.hnodes, self.onodes, self.lr)
+        nstr = "NeuralNetwork(input_nodes: {0}, hidden_nodes: {1}, output_nodes: {2}, learning_rate: {3}, " \
+               "activation: {4}, output_activation: {5}, optimizer: {6})".format(
+                   self.inodes, self.hnodes, self.onodes, self.lr, self.activation, self.output_activation,
+                   self.optimizer.name)
         return nstr
 
 
+class _Workspace:
+    def __init__(self, layers, dtype, rows=None, bias=False):
+        # buffers of a forward pass and weight update, either for a single record (stored as a batch of one row, with
+        # buffers for its inputs and targets) or for a mini-batch of up to `rows` records (one record per row, the
+        # inputs and targets are provided as-is)
+        if rows is None:
+            self.inputs = numpy.empty((1, layers[0]), dtype=dtype)
+            self.targets = numpy.empty((1, layers[-1]), dtype=dtype)
+        self.rows = rows = rows or 1
+        self.outputs = [numpy.empty((rows, nodes), dtype=dtype) for nodes in layers[1:]]
+        self.errors = [numpy.empty((rows, nodes), dtype=dtype) for nodes in layers[1:]]
+        self.deltas = [numpy.empty((rows, nodes), dtype=dtype) for nodes in layers[1:]]
+        self.parameter_steps = numpy.empty(_parameter_count(layers, bias), dtype=dtype)
+        self.layer_steps = _layer_views(self.parameter_steps, layers)
+        self.bias_steps = _bias_views(self.parameter_steps, layers, bias)
+
+
+def _parameter_count(layers, bias=False):
+    return sum(inputs * outputs for inputs, outputs in zip(layers[:-1], layers[1:])) + (sum(layers[1:]) if bias else 0)
+
+
+def _layer_views(parameters, layers):
+    # splits a flat parameter buffer into one (output nodes, input nodes) weight matrix per layer, without copying
+    views, offset = list(), 0
+    for inputs, outputs in zip(layers[:-1], layers[1:]):
+        views.append(parameters[offset:offset + inputs * outputs].reshape(outputs, inputs))
+        offset += inputs * outputs
+    return views
+
+
+def _bias_views(parameters, layers, bias):
+    # splits the biases following the weights in a flat parameter buffer into one vector per layer, or returns one None
+    # per layer for networks without biases
+    if not bias:
+        return [None] * (len(layers) - 1)
+    views, offset = list(), _parameter_count(layers)
+    for outputs in layers[1:]:
+        views.append(parameters[offset:offset + outputs])
+        offset += outputs
+    return views
+
+
+def _network_dtype(dtype):
+    # resolves a precision given by name or numpy type, raising ValueError if it is not one of NETWORK_DTYPES
+    try:
+        resolved_dtype = numpy.dtype(dtype)
+    except TypeError:
+        resolved_dtype = None
+    if resolved_dtype is None or resolved_dtype not in NETWORK_DTYPES.values():
+        raise ValueError("unsupported network dtype {0}".format(dtype))
+    return resolved_dtype
+
+
 class NetworkTester:
     def __init__(self, training_data, testing_data, input_nodes, hidden_nodes, output_nodes, learning_rate):
         """
@@ -128,10 +497,7 @@ class NetworkTester:
             self.__train_one_record__(record[0], record[1])
 
     def __train_one_record__(self, inputs_list, target_class):
-        inputs = numpy.asfarray(inputs_list)
-        targets = numpy.zeros(self.output_nodes) + 0.01
-        targets[int(target_class)] = 0.99
-        self.neural_network.train(inputs, targets)
+        self.neural_network.train(numpy.asfarray(inputs_list), target_class)
 
     def update_network(self, inputs_list, target_class):
         """
@@ -143,16 +509,20 @@ class NetworkTester:
         self.__train_one_record__(inputs_list, target_class)
 
     def test(self):
-        _total = 0
-        _pass = 0
-
-        for record in self.testing_data:
-            print("Testing Record: {0} ...".format(record[0]), end=" ")
-            if int(record[1]) == numpy.argmax(self.neural_network.query(numpy.asfarray(record[0]))):
-                print("\t\t !!PASSED!! ", end=" ")
-                _pass += 1
-            else:
-                print("\t\t ==FAILED== ", end=" ")
-            print(" ({0})".format("Malignant" if int(record[1]) else "Benign"))
-            _total += 1
-        return float(_pass)/_total
+        """
+        Scores the network against every testing record in a single batched forward pass.
+
+        :return: the fraction of testing records which were classified correctly
+        """
+        return self.evaluate()["accuracy"]
+
+    def evaluate(self, include_roc_curve=False):
+        """
+        Evaluates the network against every testing record, see `network_evaluation.evaluate_outputs`.
+
+        :param include_roc_curve: if True, the points of each ROC curve are included in the results
+        :return: dictionary of evaluation metrics (accuracy, confusion matrix, precision/recall, ROC AUC)
+        """
+        features = numpy.array([record[0] for record in self.testing_data], dtype=float)
+        target_classes = [int(record[1]) for record in self.testing_data]
+        return network_evaluation.evaluate_network(self.neural_network, features, target_classes, include_roc_curve)
@@ -0,0 +1,182 @@
+import math
+import numpy
+
+# Settings of the learning rate schedules, shared by every optimizer:
+#  - "step": the learning rate is multiplied by `decay_rate` every `decay_steps` weight updates
+#  - "cosine": the learning rate is annealed from the network learning rate down to `min_learning_rate` (as a fraction
+#    of it) over `decay_steps` weight updates, following half a cosine wave
+SCHEDULE_DEFAULTS = {"decay_steps": 1000.0, "decay_rate": 0.5, "min_learning_rate": 0.0}
+DEFAULT_OPTIMIZER = "sgd"
+DEFAULT_SCHEDULE = "constant"
+
+
+def _constant_schedule(steps, settings):
+    return 1.0
+
+
+def _step_schedule(steps, settings):
+    return settings["decay_rate"] ** (steps // max(1, int(settings["decay_steps"])))
+
+
+def _cosine_schedule(steps, settings):
+    progress = min(steps, settings["decay_steps"]) / max(1.0, settings["decay_steps"])
+    min_factor = settings["min_learning_rate"]
+    return min_factor + (1.0 - min_factor) * 0.5 * (1.0 + math.cos(math.pi * progress))
+
+
+# Learning rate schedules are organized as {'name': function(weight updates so far, settings) -> learning rate factor}
+SCHEDULES = {"constant": _constant_schedule, "step": _step_schedule, "cosine": _cosine_schedule}
+
+
+class Optimizer:
+    name = "sgd"
+    # settings of the optimizer (besides the schedule settings) and their default values
+    defaults = dict()
+    # names of the arrays (shaped like the network parameters) holding the optimizer state between weight updates
+    state_names = ()
+
+    def __init__(self, schedule=DEFAULT_SCHEDULE, steps=0, state=None, **settings):
+        """
+        Applies the weight updates computed by a NeuralNetwork to its parameters. This base class is plain stochastic
+        gradient descent: every update moves the parameters by the learning rate times the update direction.
+
+        :param schedule: name of the learning rate schedule, see `SCHEDULES`
+        :param steps: number of weight updates applied so far, i.e. when restoring a saved optimizer
+        :param state: (optional) dictionary of the state arrays of a saved optimizer, see `state_names`. The arrays are
+        used as-is, without copying.
+        :param settings: optimizer and schedule settings overriding `defaults` and `SCHEDULE_DEFAULTS`
+        """
+        if schedule not in SCHEDULES:
+            raise ValueError("unknown learning rate schedule {0}, expected one of {1}".format(
+                schedule, ", ".join(sorted(SCHEDULES))))
+        unknown_settings = set(settings).difference(self.defaults, SCHEDULE_DEFAULTS)
+        if unknown_settings:
+            raise ValueError("unknown {0} optimizer settings: {1}".format(self.name,
+                                                                         ", ".join(sorted(unknown_settings))))
+        self.schedule = schedule
+        self.settings = dict(SCHEDULE_DEFAULTS, **self.defaults)
+        self.settings.update((key, float(value)) for key, value in settings.items())
+        self.steps = int(steps)
+        # State is organized as {'name': array shaped like the network parameters}, allocated by the first update
+        self.state = dict(state or dict())
+
+    def learning_rate(self, base_learning_rate):
+        """
+        :param base_learning_rate: the learning rate of the network
+        :return: the learning rate of the next weight update, according to the schedule
+        """
+        return base_learning_rate * SCHEDULES[self.schedule](self.steps, self.settings)
+
+    def apply(self, parameters, direction, base_learning_rate):
+        """
+        Applies a single weight update to the parameters, in place.
+
+        :param parameters: flat parameter buffer of the network
+        :param direction: flat buffer of the update direction (the weight adjustments for a learning rate of 1), which
+        is overwritten
+        :param base_learning_rate: the learning rate of the network, scaled by the schedule
+        :return:
+        """
+        learning_rate = self.learning_rate(base_learning_rate)
+        self.steps += 1
+        self._apply(parameters, direction, learning_rate)
+
+    def _apply(self, parameters, direction, learning_rate):
+        direction *= learning_rate
+        parameters += direction
+
+    def _state(self, name, parameters):
+        state = self.state.get(name)
+        if state is None or state.shape != parameters.shape or state.dtype != parameters.dtype:
+            state = self.state[name] = numpy.zeros_like(parameters)
+        return state
+
+    def config(self):
+        """
+        :return: JSON-serializable dictionary of the optimizer settings and update count (but not its state arrays),
+        which `create_optimizer` restores the optimizer from
+        """
+        return dict(self.settings, name=self.name, schedule=self.schedule, steps=self.steps)
+
+    def copy(self):
+        """
+        :return: a new optimizer with the same settings and a private copy of the state
+        """
+        return create_optimizer(**dict(self.config(), state={name: numpy.array(state)
+                                                             for name, state in self.state.items()}))
+
+    def restore(self, snapshot):
+        """
+        Restores the update count and state of another optimizer (i.e. a `copy` of this one) in place, so that the
+        optimizer is rolled back together with the parameters it was copied alongside.
+
+        :param snapshot: Optimizer with the same settings
+        :return:
+        """
+        self.steps = snapshot.steps
+        for name in set(self.state).difference(snapshot.state):
+            self.state.pop(name)
+        for name, state in snapshot.state.items():
+            numpy.copyto(self._state(name, state), state)
+
+    def __repr__(self):
+        return "{0}({1}, schedule: {2}, steps: {3})".format(type(self).__name__, self.name, self.schedule, self.steps)
+
+
+class MomentumOptimizer(Optimizer):
+    name = "momentum"
+    defaults = {"momentum": 0.9}
+    state_names = ("velocity",)
+
+    def _apply(self, parameters, direction, learning_rate):
+        # the velocity accumulates the updates, decaying by the momentum at every update
+        velocity = self._state("velocity", parameters)
+        velocity *= self.settings["momentum"]
+        direction *= learning_rate
+        velocity += direction
+        parameters += velocity
+
+
+class AdamOptimizer(Optimizer):
+    name = "adam"
+    defaults = {"beta1": 0.9, "beta2": 0.999, "epsilon": 1e-8}
+    state_names = ("first_moment", "second_moment")
+
+    def _apply(self, parameters, direction, learning_rate):
+        # moving averages of the update direction and of its square, corrected for their zero initialization
+        beta1, beta2 = self.settings["beta1"], self.settings["beta2"]
+        first_moment = self._state("first_moment", parameters)
+        second_moment = self._state("second_moment", parameters)
+        # beta * (average - x) + x = beta * average + (1 - beta) * x, computed without temporary arrays
+        first_moment -= direction
+        first_moment *= beta1
+        first_moment += direction
+        numpy.multiply(direction, direction, out=direction)
+        second_moment -= direction
+        second_moment *= beta2
+        second_moment += direction
+        # the bias corrections are folded into the step size, as in the efficient form of the Adam paper
+        step_size = learning_rate * math.sqrt(1.0 - beta2 ** self.steps) / (1.0 - beta1 ** self.steps)
+        numpy.sqrt(second_moment, out=direction)
+        direction += self.settings["epsilon"]
+        numpy.divide(first_moment, direction, out=direction)
+        direction *= step_size
+        parameters += direction
+
+
+# Optimizers are organized as {'name': Optimizer class}
+OPTIMIZERS = {optimizer.name: optimizer for optimizer in (Optimizer, MomentumOptimizer, AdamOptimizer)}
+# names of every optimizer and schedule setting, i.e. to pick them from request arguments
+OPTIMIZER_SETTINGS = set(SCHEDULE_DEFAULTS).union(*(optimizer.defaults for optimizer in OPTIMIZERS.values()))
+
+
+def create_optimizer(name=DEFAULT_OPTIMIZER, **settings):
+    """
+    :param name: name of a registered optimizer, see OPTIMIZERS
+    :param settings: schedule, optimizer settings, steps and state, see `Optimizer`
+    :return: new Optimizer object
+    """
+    optimizer = OPTIMIZERS.get(name)
+    if optimizer is None:
+        raise ValueError("unknown optimizer {0}, expected one of {1}".format(name, ", ".join(sorted(OPTIMIZERS))))
+    return optimizer(**settings)
@@ -1,36 +1,131 @@
-import random
+import atexit
+import json
+import multiprocessing
 import flask
 from flask_cors import cross_origin
 import numpy
 import uuid
 import os
-from APIHelpers import APIResponseStatus, db_helper, io_helper, cache_helper, debug_helper
+from functools import partial
+from APIHelpers import APIResponseStatus, db_helper, io_helper, batching_helper, cache_helper, debug_helper, \
+    jobs_helper, metadata_helper, metrics_helper, model_store_helper, online_training_helper, persistence_helper, \
+    records_helper, schema_helper
 from neural_network import NeuralNetwork
+import network_evaluation
+import optimizers
 import sample_data.setup_sample_neural_network
 
 # Load API configuration settings
 config_data = io_helper.load_config_data()
 
+# Load request latency, per phase timing and component statistics, exposed on the "metrics" endpoint
+metrics = metrics_helper.MetricsRegistry(enabled=config_data['metrics_enabled'])
+
 # Load MongoDB connection
 records_db = db_helper.DBConnection(config_data['mongo_host'], config_data['mongo_port'],
                                     config_data['mongo_database'],
-                                    config_data['data_collection'])
+                                    config_data['data_collection'],
+                                    indexes=db_helper.RECORD_INDEXES,
+                                    slow_query_ms=config_data['mongo_slow_query_ms'],
+                                    metrics=metrics)
 
 perceptron_db = db_helper.DBConnection(config_data['mongo_host'], config_data['mongo_port'],
                                        config_data['mongo_database'],
-                                       config_data['metadata_collection'])
+                                       config_data['metadata_collection'],
+                                       indexes=db_helper.METADATA_INDEXES,
+                                       slow_query_ms=config_data['mongo_slow_query_ms'],
+                                       metrics=metrics)
+schema_db = db_helper.DBConnection(config_data['mongo_host'], config_data['mongo_port'],
+                                   config_data['mongo_database'],
+                                   config_data['schema_collection'],
+                                   slow_query_ms=config_data['mongo_slow_query_ms'],
+                                   metrics=metrics)
+records_db.ensure_indexes()
+perceptron_db.ensure_indexes()
+
+# Load single round-trip access to the network metadata, recently read entries are served from memory
+network_metadata = metadata_helper.NetworkMetadataRepository(perceptron_db,
+                                                             ttl_seconds=config_data['metadata_cache_ttl_seconds'],
+                                                             max_size=int(config_data['metadata_cache_max_size']))
+
+# Load background writer for saving NeuralNetwork objects to disk outside of the request handlers
+network_writer = persistence_helper.WriteBehindQueue(max_pending=int(config_data['write_behind_max_pending']),
+                                                     workers=int(config_data['write_behind_workers']),
+                                                     fsync=config_data['write_behind_fsync'],
+                                                     atomic=config_data['write_behind_atomic'])
+atexit.register(network_writer.shutdown)
 
 # Load global cached storage for uncommited NeuralNetwork objects (i.e. data currently being manipulated by users)
-perceptron_cache = cache_helper.GlobalCacheHelper(max_size=int(config_data['flask_cache_max_size']))
-
-# optionally populate the database with sample records and save a trained Perceptron Network to disk
-if config_data['load_sample_network_on_start']:
+perceptron_cache = cache_helper.GlobalCacheHelper(max_size=int(config_data['flask_cache_max_size']),
+                                                  save_function=network_writer.submit,
+                                                  metrics=metrics)
+
+# Load read-only, memory-mapped storage for committed NeuralNetwork files, shared with other worker processes
+model_store = model_store_helper.SharedModelStore(max_size=int(config_data['model_store_max_size']))
+
+# Convert any records stored in the legacy (string valued) layout to the typed record schema, the collection is only
+# scanned until the conversion has been recorded in the schema collection
+schema_helper.migrate_records(records_db, chunk_size=int(config_data['sample_data_chunk_size']), schema_db=schema_db)
+
+# Load background workers for bulk training jobs
+training_jobs = jobs_helper.TrainingJobManager(workers=int(config_data['training_job_workers']),
+                                               max_finished_jobs=int(config_data['training_jobs_kept']))
+
+# Load micro-batching of concurrent single-record queries (of the same network) into one forward pass
+query_batcher = None
+if config_data['query_batching_enabled']:
+    query_batcher = batching_helper.QueryMicroBatcher(lambda name, features: query_network_rows(name, features),
+                                                      window_ms=config_data['query_batch_window_ms'],
+                                                      max_batch_size=int(config_data['query_batch_max_size']))
+
+# Load accumulation of single-record training requests into batched weight updates, with periodic checkpoints to disk.
+# Disabled by default, as it changes the /train contract (deferred and averaged updates, see `query_neural_network`).
+# Registered after the network writer, so that it is shut down (and checkpoints the networks) first on exit.
+online_trainer = None
+if config_data['online_training_enabled']:
+    online_trainer = online_training_helper.OnlineTrainer(
+        lambda name, features, target_classes: apply_training_batch(name, features, target_classes),
+        checkpoint=lambda name: checkpoint_neural_network(name),
+        batch_size=int(config_data['online_training_batch_size']),
+        max_delay_ms=config_data['online_training_max_delay_ms'],
+        max_pending=int(config_data['online_training_max_pending']),
+        checkpoint_samples=int(config_data['online_checkpoint_samples']),
+        checkpoint_interval_seconds=config_data['online_checkpoint_interval_seconds'])
+    atexit.register(online_trainer.shutdown)
+
+# Load materialized feature matrices of the records, shared with the sample setup so both use one set of files
+feature_cache = sample_data.setup_sample_neural_network.feature_cache
+feature_cache.watch(records_db)
+
+metrics.register_collector("network_cache", perceptron_cache.get_stats)
+metrics.register_collector("metadata_cache", network_metadata.get_stats)
+metrics.register_collector("feature_cache", feature_cache.get_stats)
+metrics.register_collector("write_behind", network_writer.get_stats)
+if query_batcher is not None:
+    metrics.register_collector("query_batcher", query_batcher.get_stats)
+if online_trainer is not None:
+    metrics.register_collector("online_training", online_trainer.get_stats)
+
+# optionally populate the database with sample records and save a trained Perceptron Network to disk. The setup is
+# skipped when this module is re-imported as the main module of a spawned sample training worker.
+if config_data['load_sample_network_on_start'] and multiprocessing.current_process().name == "MainProcess":
     sample_data.setup_sample_neural_network.main()
 
 app = flask.Flask(__name__)
 app.config['DEBUG'] = False
 
 
+@app.before_request
+def start_request_metrics():
+    metrics.start_request(flask.request.url_rule.rule if flask.request.url_rule is not None else "unmatched")
+
+
+@app.after_request
+def end_request_metrics(response):
+    metrics.end_request(response.status_code)
+    return response
+
+
 @app.errorhandler(404)
 @cross_origin()
 def api_invalid_page(e):
@@ -65,34 +160,68 @@ def records_query():
     """
     Allows the API to query the DB for testing/training records which match the provided arguments
 
+    Arguments which do not filter the records:
+     - "max": (required for "random") number of records randomly sampled by the db
+     - "fields": comma-separated list of the record fields to return
+     - "limit" / "after": page size, and the cursor ("next_after") returned with the previous page
+     - "format": "ndjson" streams the records one JSON document per line (including their "_id" cursor), instead of
+       building a single response
+
     :return:
     """
     req_rng = 'random' in flask.request.url_rule.rule
-    max_records = 0
-    request_json = flask.request.get_json()
+    request_json = flask.request.get_json(silent=True)
     if request_json is None:
         request_json = dict(flask.request.values)
-    if req_rng and 'max' not in request_json:
+    record_filter, options = records_helper.split_record_query(request_json)
+    if req_rng and 'max' not in options:
         return {"status": APIResponseStatus.MISSING_ARGS.value}, 400
     resp = {"status": APIResponseStatus.OK.value}
     status_code = 200
     try:
+        record_filter = schema_helper.coerce_filter(record_filter)
+        projection = records_helper.build_projection(options.get("fields"))
+        page_size = 0
         if req_rng:
-            max_records = int(request_json["max"])
-            request_json.pop("max")
-        records = list()
-        for record in records_db.read_documents(request_json):
-            record.pop("_id")
-            records.append(record)
-        if req_rng:
-            records = random.sample(records, min([max_records, len(records)]))
-        resp.update({"filter": request_json, "records": records})
+            sample_size = int(options["max"])
+            if sample_size < 1:  # rejected by the db's $sample stage
+                raise ValueError("max must be positive")
+            records = records_db.sample_documents(record_filter, sample_size, projection)
+        elif "limit" in options or "after" in options:
+            page_size = int(options.get("limit", 0))
+            if page_size < 0:
+                raise ValueError("limit must not be negative")
+            records = records_db.read_documents(records_helper.page_filter(record_filter, options.get("after")),
+                                                projection, limit=page_size, sort=[("_id", 1)])
+        else:
+            records = records_db.read_documents(record_filter, projection)
+        if options.get("format") == "ndjson":
+            return flask.Response(flask.stream_with_context(stream_ndjson_records(records)),
+                                  mimetype="application/x-ndjson")
+        records_list = list()
+        last_record_id = None
+        for record in records:
+            last_record_id = record.pop("_id")
+            records_list.append(schema_helper.to_api_record(record))
+        resp.update({"filter": record_filter, "records": records_list})
+        if page_size and len(records_list) == page_size:  # there may be more matching records on the next page
+            resp.update({"next_after": str(last_record_id)})
     except AttributeError:
         resp.update({"status": APIResponseStatus.ERROR.value})
         status_code = 400
+    except ValueError:  # out of range "max"/"limit", an invalid "after" cursor, or a filter value of the wrong type
+        resp.update({"status": APIResponseStatus.VALUE_ERROR.value})
+        status_code = 400
     return resp, status_code
 
 
+def stream_ndjson_records(records):
+    # records are serialized one at a time while the db cursor is consumed, so memory use does not grow with the result
+    for record in records:
+        record["_id"] = str(record["_id"])
+        yield json.dumps(schema_helper.to_api_record(record), default=str) + "\n"
+
+
 @app.route('/api/v1/perceptron/metadata', methods=['GET', 'POST'])
 @cross_origin()
 def metadata_query():
@@ -122,6 +251,16 @@ def create_neural_network():
     """
     Creates a new NeuralNetwork object with the given parameters, saving the serailized object to disk and creating a
     metadata entry in the db. The NeuralNetwork object is then loaded into global cache for further operations.
+    The optional "dtype" argument ("float32" or "float64") sets the precision of the network weights and computations,
+    and the optional "activation" argument the activation function of its nodes: "sigmoid" (default), "tanh", "relu",
+    or the cheaper sigmoid approximations "fast_sigmoid" and "lut_sigmoid" (lookup table). The output layer of "tanh"
+    and "relu" networks is a sigmoid, as the outputs are confidences within (0, 1).
+    The "hidden" argument is either the number of hidden nodes, or a comma-separated list with the number of nodes of
+    each hidden layer (i.e. "16,8") to create a deep network.
+    The optional "optimizer" argument ("sgd", "momentum" or "adam") selects how the weight updates are applied, and the
+    "schedule" argument ("constant", "step" or "cosine") how the learning rate changes over the updates, configured by
+    the optional optimizer/schedule settings (i.e. "momentum", "beta1", "decay_steps"), see `optimizers`.
+    The optional "bias" argument ("true" or "false") adds a trained bias to every node after the input layer.
 
     :return:
     """
@@ -130,38 +269,48 @@ def create_neural_network():
     status_code = 200
     required_args = {"name", "input", "hidden", "output", "learningrate"}
     update_request = 'update' in flask.request.url_rule.rule
-    db_record_exists = perceptron_db.record_exists({"network_id": flask.request.args['name']})
     if required_args.intersection(set(flask.request.args)) == required_args:
-        if db_record_exists and not update_request:
+        network_name = flask.request.args['name']
+        if not update_request and network_metadata.exists(network_name):
             return {'status': APIResponseStatus.ERROR_DUPLICATE_ENTRY.value}, 400
-        elif not db_record_exists and update_request:
-            update_request = False  # treat as a new network to create if no record currently exists
         try:
             # create new network class object with provided params
             new_neural_network = NeuralNetwork(int(flask.request.args['input']),
-                                               int(flask.request.args['hidden']),
+                                               [int(nodes) for nodes in flask.request.args['hidden'].split(',')],
                                                int(flask.request.args['output']),
-                                               float(flask.request.args['learningrate']))
+                                               float(flask.request.args['learningrate']),
+                                               dtype=flask.request.args.get('dtype', config_data['network_dtype']),
+                                               activation=flask.request.args.get('activation',
+                                                                                 config_data['network_activation']),
+                                               optimizer=create_optimizer(flask.request.args),
+                                               bias=flask.request.args.get('bias', str(config_data['network_bias']))
+                                               .lower() == "true")
             # setup metadata entry for tracking serialized file location via the db
-            network_storage_document = {"network_id": flask.request.args['name'],
+            network_storage_document = {"network_id": network_name,
                                         "saved_data": "{0}/{1}_{2}_perceptron_network.bin".format(
                                             config_data['trained_networks_directory'],
                                             uuid.uuid1(),
-                                            flask.request.args['name'])}
+                                            network_name)}
             # load the newly generated network into the global cache for fast access (i.e. for training operations)
             perceptron_cache.add(network_storage_document['network_id'], (new_neural_network,
                                                                           network_storage_document['saved_data']))
             # create a snapshot of the initialized class object and serialize it to the location given in the metadata
-            io_helper.save_pretrained_network(new_neural_network, network_storage_document['saved_data'])
+            network_writer.submit(new_neural_network, network_storage_document['saved_data'])
             # save metadata entry to db
             if update_request:
-                # cleanup the old serialized object from disk, then replace its metadata entry as well
-                os.remove(perceptron_db.read_document({"network_id": flask.request.args['name']})["saved_data"])
-                db_update_count = perceptron_db.update_document({"network_id": flask.request.args['name']},
-                                                                network_storage_document)
-                resp.update({'documents_updated': db_update_count})
-            else:
-                db_storage_id = perceptron_db.write_document(network_storage_document)
+                # replace the metadata entry, then cleanup the old serialized object from disk
+                old_network_document = network_metadata.update(network_name, network_storage_document['saved_data'])
+                if old_network_document is not None:
+                    remove_network_file(old_network_document['saved_data'])
+                    resp.update({'documents_updated': 1})
+                else:
+                    update_request = False  # treat as a new network to create if no record currently exists
+            if not update_request:
+                db_storage_id = network_metadata.create(network_name, network_storage_document['saved_data'])
+                if db_storage_id is None:  # created by a concurrent request, discard this network
+                    perceptron_cache.pop(network_name)
+                    remove_network_file(network_storage_document['saved_data'])
+                    return {'status': APIResponseStatus.ERROR_DUPLICATE_ENTRY.value}, 400
                 resp.update({'document_id': str(db_storage_id)})
 
         except ValueError:
@@ -173,23 +322,37 @@ def create_neural_network():
     return resp, status_code
 
 
+def create_optimizer(request_args):
+    """
+    :param request_args: request arguments, holding the optional "optimizer" and "schedule" names and settings
+    :return: new Optimizer object, see `optimizers.create_optimizer`
+    """
+    return optimizers.create_optimizer(request_args.get('optimizer', config_data['network_optimizer']),
+                                       schedule=request_args.get('schedule', optimizers.DEFAULT_SCHEDULE),
+                                       **{key: float(value) for key, value in request_args.items()
+                                          if key in optimizers.OPTIMIZER_SETTINGS})
+
+
 @app.route('/api/v1/perceptron/commit', methods=['GET', 'POST'])
 @cross_origin()
 def commit_network_training():
     """
     Forces any operations done to a NeuralNetwork object while in the global cache to be written to disk. The object is
     removed (popped) from the global cache in the process.
-    This can be called after training a network to ensure that the new weights are stored to disk.
+    This can be called after training a network to ensure that the new weights are stored to disk. The write itself is
+    performed by the background network writer, so the response does not wait for disk I/O. Training samples which are
+    still being accumulated by the online trainer are applied first.
 
     :return:
     """
     resp = {'status': APIResponseStatus.OK.value}
     status_code = 200
     if "name" in flask.request.args:
-        # Remove cached instance and commit to file (if cached)
-        if flask.request.args['name'] in perceptron_cache.keys():
-            cached_network = perceptron_cache.pop(flask.request.args['name'])
-            io_helper.save_pretrained_network(cached_network[0], cached_network[1])
+        if online_trainer is not None:
+            online_trainer.flush(flask.request.args['name'])
+        # Remove cached instance, which schedules it to be committed to file (if cached)
+        cached_network = perceptron_cache.pop(flask.request.args['name'])
+        if cached_network is not None:
             resp.update({"network": cached_network[1]})
         else:
             resp.update({'status': APIResponseStatus.NO_UNCOMMITED_CHANGES.value})
@@ -212,51 +375,82 @@ def query_neural_network():
 
     If accessed on the "train" endpoint, a list of features as well as a target class is required. The network will
     internally query itself using the feature values, then correct the internal weights based on the relative error from
-    the target class.
+    the target class. When online training is enabled (off by default), the sample is queued instead and applied as
+    part of a batch by the online trainer (see `apply_training_batch`), and the response reports the number of
+    "pending_samples" of the network. Queries then do not reflect the sample until its batch is applied, and as the
+    adjustments of a batch are averaged into one weight update, each sample moves the weights by about 1/batch size of
+    its synchronous update.
 
     :return: JSON response with either an "OK" status for training or a network response for queries
     """
-    # setup the response and validate the required arguments
-    resp = {'status': APIResponseStatus.OK.value}
-    status_code = 200
-    required_args = {"name", "features"}
     training_request = 'train' in flask.request.url_rule.rule
     request_json = flask.request.get_json()
     if request_json is None:
         return {'status': APIResponseStatus.ERROR.value}, 400
+    return process_query_request(request_json, training_request)
+
+
+def process_query_request(request_json, training_request=False):
+    """
+    Queries or trains a stored NeuralNetwork object, independently of the web framework serving the request (see
+    `query_neural_network`).
+
+    :param request_json: dictionary of request arguments, "name" and "features" plus "target" for training
+    :param training_request: if True, the network is trained on the features instead of queried
+    :return: tuple of (response dictionary, status code)
+    """
+    # setup the response and validate the required arguments
+    resp = {'status': APIResponseStatus.OK.value}
+    status_code = 200
+    required_args = {"name", "features"}
     if training_request:
         required_args.add("target")
     if required_args.intersection(set(request_json)) == required_args:
-        perceptron_network, save_data_path = None, None
-        # Look for the requested Perceptron Network in the cache, othwerise load it from disk based on db metadata
-        if request_json['name'] in perceptron_cache.keys():
-            cached_perceptron_network = perceptron_cache.read(request_json['name'])
-            perceptron_network = cached_perceptron_network[0]
-            save_data_path = cached_perceptron_network[1]
-        else:
-            if perceptron_db.record_exists({"network_id": request_json['name']}):
-                perceptron_network_doc = perceptron_db.read_document({"network_id": request_json['name']})
-                perceptron_network = io_helper.load_pretrained_network(perceptron_network_doc['saved_data'])
-                save_data_path = perceptron_network_doc['saved_data']
-        if perceptron_network is not None:
-            try:
-                # Based on the endpoint used, 'features' will either be used to query the network for a classification,
-                # or used to train the network towards a provided target class
-                inputs = numpy.asfarray(request_json['features'].strip(",").split(','))  # TODO: Improve parsing method
-                if training_request:  # Updates the internal network weights after the query is complete
-                    target_class = int(request_json['target'])
-                    perceptron_network.train(inputs, target_class)
+        try:
+            # Based on the endpoint used, 'features' will either be used to query the network for a classification,
+            # or used to train the network towards a provided target class
+            inputs = numpy.asfarray(request_json['features'].strip(",").split(','))  # TODO: Improve parsing method
+            target_class = int(request_json['target']) if training_request else None
+            if not training_request and query_batcher is not None:
+                # the query is answered by a forward pass shared with concurrent queries of the same network
+                network_outputs = query_batcher.query(request_json['name'], inputs)
+                if network_outputs is None:  # the network was NOT found in either global cache or the db
+                    return {'status': APIResponseStatus.NO_RECORD.value}, 400
+                resp.update({"identified_class": int(numpy.argmax(network_outputs)),
+                             "raw_network_output": [network_outputs.tolist()]})
+                return resp, status_code
+            if training_request and online_trainer is not None:
+                return queue_training_sample(request_json['name'], inputs, target_class)
+            # Look for the requested Perceptron Network in the cache, othwerise load it from disk based on db metadata.
+            # Queries share the network with each other, training requires exclusive access to the network weights.
+            with perceptron_cache.checkout(request_json['name'], partial(load_neural_network, request_json['name']),
+                                           write=training_request) as cached_perceptron_network:
+                if cached_perceptron_network is None:  # the network was NOT found in either global cache or the db
+                    resp.update({'status': APIResponseStatus.NO_RECORD.value})
+                    status_code = 400
+                elif training_request:  # Updates the internal network weights after the query is complete
+                    validate_training_sample(cached_perceptron_network[0], inputs, target_class)
+                    if cached_perceptron_network[0].read_only:
+                        # take a private, trainable copy of a network which is still shared with other processes
+                        try:
+                            trainable_network = model_store.checkout(cached_perceptron_network[1])
+                        except FileNotFoundError:
+                            trainable_network = None
+                        if trainable_network is None:
+                            # the file was replaced by another worker process (or is no longer a binary network
+                            # file), copy the weights of the shared network instead
+                            trainable_network = cached_perceptron_network[0].copy()
+                        cached_perceptron_network = (trainable_network, cached_perceptron_network[1])
+                        perceptron_cache.replace(request_json['name'], cached_perceptron_network)
+                    with metrics.phase("training"):
+                        cached_perceptron_network[0].train(inputs, target_class)
                 else:  # Query the network to receive a classification only
-                    network_outputs = perceptron_network.query(inputs)
+                    with metrics.phase("forward"):
+                        network_outputs = cached_perceptron_network[0].query(inputs)
                     resp.update({"identified_class": int(numpy.argmax(network_outputs)),
                                  "raw_network_output": network_outputs.T.tolist()})
-                # Place recently queried network into cache (overwrite if already in cache)
-                perceptron_cache.add(request_json['name'], (perceptron_network, save_data_path))
-            except ValueError:  # unexpected values were passed in the request, i.e. chars, additional punctuation, etc.
-                resp.update({'status': APIResponseStatus.VALUE_ERROR.value})
-                status_code = 400
-        else:  # the requested network was NOT found in either global cache or via a db entry
-            resp.update({'status': APIResponseStatus.NO_RECORD.value})
+        except ValueError:  # unexpected values were passed in the request, i.e. chars, additional punctuation, etc.
+            resp.update({'status': APIResponseStatus.VALUE_ERROR.value})
             status_code = 400
     else:  # the request did not provide all of the required arguments
         resp.update({'status': APIResponseStatus.MISSING_ARGS.value})
@@ -264,6 +458,377 @@ def query_neural_network():
     return resp, status_code
 
 
+def validate_training_sample(neural_network, inputs, target_class):
+    """
+    Checks that a training sample fits a NeuralNetwork object, so that malformed requests are rejected before training.
+
+    :param neural_network: the NeuralNetwork to train
+    :param inputs: vector of feature values
+    :param target_class: the class index which is being represented by the feature values
+    :return:
+    """
+    if inputs.shape[0] != neural_network.inodes or not 0 <= target_class < neural_network.onodes:
+        raise ValueError("training sample does not fit the network")
+
+
+def queue_training_sample(network_name, inputs, target_class):
+    """
+    Queues a training sample with the online trainer, after validating it against the stored NeuralNetwork object.
+
+    :param network_name: the network_id of the network to train
+    :param inputs: vector of feature values
+    :param target_class: the class index which is being represented by the feature values
+    :return: tuple of (response dictionary, status code)
+    """
+    network_loader = partial(load_neural_network, network_name)
+    with perceptron_cache.checkout(network_name, network_loader) as cached_perceptron_network:
+        if cached_perceptron_network is None:  # the network was NOT found in either global cache or the db
+            return {'status': APIResponseStatus.NO_RECORD.value}, 400
+        validate_training_sample(cached_perceptron_network[0], inputs, target_class)
+    # queued outside of the cache lock, as a full queue blocks until the online trainer has published a batch
+    pending_samples = online_trainer.submit(network_name, inputs, target_class)
+    return {'status': APIResponseStatus.OK.value, 'pending_samples': pending_samples}, 200
+
+
+def apply_training_batch(network_name, features, target_classes):
+    """
+    Trains a copy of a stored NeuralNetwork object with a single (averaged) weight update for a batch of accumulated
+    training samples, then swaps it into the global cache. Queries keep reading the previous network until the swap.
+    Runs on the online trainer thread, see `queue_training_sample`.
+
+    :param network_name: the network_id of the network to train
+    :param features: float matrix of shape (samples, input nodes)
+    :param target_classes: vector of class indices, one per sample
+    :return: False if the network does not exist, otherwise True
+    """
+    network_loader = partial(load_neural_network, network_name)
+    while True:
+        with perceptron_cache.checkout(network_name, network_loader) as cached_perceptron_network:
+            if cached_perceptron_network is None:
+                return False
+            trained_network = cached_perceptron_network[0].copy()
+        with metrics.phase("training"):
+            trained_network.train_batch(features, target_classes, batch_size=len(target_classes))
+        with perceptron_cache.checkout(network_name, network_loader, write=True) as current_perceptron_network:
+            if current_perceptron_network is None:
+                return False
+            if current_perceptron_network is cached_perceptron_network:
+                perceptron_cache.replace(network_name, (trained_network, cached_perceptron_network[1]))
+                return True
+        # the network was replaced while training (i.e. by a bulk training job), the batch is applied to the new one
+
+
+def checkpoint_neural_network(network_name):
+    """
+    Saves the last published state of a NeuralNetwork object which is being trained online to disk, without removing it
+    from the global cache. Runs on the online trainer thread, and for the final checkpoints when the API process exits.
+    The checkpoint is skipped if the directory of the network file no longer exists (i.e. a temporary storage directory
+    which was already cleaned up on exit), as there is nothing left to save the network to.
+
+    :param network_name: the network_id of the network to save
+    :return:
+    """
+    # networks which are no longer cached were (or are being) saved when they were removed from the cache
+    with perceptron_cache.reading(network_name):
+        cached_perceptron_network = perceptron_cache.peek(network_name)
+        if cached_perceptron_network is None or not os.path.isdir(os.path.dirname(cached_perceptron_network[1])):
+            return
+        network_writer.discard(cached_perceptron_network[1])  # an older scheduled write must not overwrite this one
+        with metrics.phase("disk"):
+            io_helper.save_pretrained_network(cached_perceptron_network[0], cached_perceptron_network[1],
+                                              fsync=config_data['write_behind_fsync'])
+
+
+@app.route('/api/v1/perceptron/train/bulk', methods=['POST'])
+@cross_origin()
+def bulk_train_neural_network():
+    """
+    Starts a background job training a stored NeuralNetwork object on many records, returning the id of the job which
+    can be polled on the "jobs" endpoint.
+
+    The training records are either selected from the db by a record "filter" (by default, all training records), or
+    uploaded as CSV rows of feature values with the target class in the last column, as a "file" (multipart form) or as
+    the request body. Arguments are provided as JSON (for db records) or as form/URL arguments (for CSV uploads):
+     - "name": (required) the network to train
+     - "epochs" / "batch_size": number of passes over the records, and records per weight update (default 1 / 1)
+     - "shuffle": "true" to shuffle the records before every epoch
+     - "validation_split": fraction of the records held out as a validation set (default 0). The network is scored
+       against it after every epoch, and the weights of the epoch with the lowest validation loss are kept
+     - "patience": number of epochs without a validation loss improvement after which training stops early
+
+    The network is trained on a copy, which replaces the stored network (and is saved to disk) once training completes.
+    Single record training requests made to the network while the job runs are overwritten.
+
+    :return: JSON response with the "job_id"
+    """
+    request_json = flask.request.get_json(silent=True)
+    training_rows = None
+    if request_json is None:  # CSV upload, with the arguments passed as form/URL arguments
+        request_json = dict(flask.request.values)
+        if "file" in flask.request.files:
+            training_rows = flask.request.files["file"].read().decode("utf-8")
+        else:
+            training_rows = flask.request.get_data(as_text=True)
+    if "name" not in request_json:
+        return {'status': APIResponseStatus.MISSING_ARGS.value}, 400
+    try:
+        epochs, batch_size = int(request_json.get("epochs", 1)), int(request_json.get("batch_size", 1))
+        shuffle = schema_helper.to_bool(request_json.get("shuffle", False))
+        validation_split = float(request_json.get("validation_split", 0.0))
+        patience = int(request_json["patience"]) if request_json.get("patience") is not None else None
+        if epochs < 1 or batch_size < 1:
+            raise ValueError("epochs and batch_size must be positive")
+        if not 0.0 <= validation_split < 1.0 or (patience is not None and patience < 1):
+            raise ValueError("validation_split must be in [0, 1) and patience positive")
+        record_filter, training_matrix = None, None
+        if training_rows is None:
+            record_filter = request_json.get("filter", {"training_record": True})
+            if not isinstance(record_filter, dict):
+                raise ValueError("record filter must be a JSON object")
+            record_filter = schema_helper.coerce_filter(record_filter)
+        else:
+            training_matrix = io_helper.read_feature_rows(training_rows)
+            if training_matrix.shape[1] < 2:
+                raise ValueError("training rows must contain feature values and a target class")
+    except ValueError:
+        return {'status': APIResponseStatus.VALUE_ERROR.value}, 400
+    if not network_metadata.exists(request_json['name']):
+        return {'status': APIResponseStatus.NO_RECORD.value}, 400
+    job_description = {"name": request_json['name'], "epochs": epochs, "batch_size": batch_size, "shuffle": shuffle,
+                       "validation_split": validation_split, "patience": patience,
+                       "source": "upload" if training_matrix is not None else "db"}
+    job_id = training_jobs.submit(partial(run_bulk_training_job, network_name=request_json['name'],
+                                          record_filter=record_filter, training_matrix=training_matrix,
+                                          epochs=epochs, batch_size=batch_size, shuffle=shuffle,
+                                          validation_split=validation_split, patience=patience), job_description)
+    return {'status': APIResponseStatus.OK.value, 'job_id': job_id}, 200
+
+
+@app.route('/api/v1/perceptron/jobs/<job_id>', methods=['GET'])
+@cross_origin()
+def training_job_status(job_id):
+    """
+    Returns the state of a bulk training job: its progress, throughput (records per second) and latest training loss.
+
+    :return: JSON response with the job status
+    """
+    job_status = training_jobs.get(job_id)
+    if job_status is None:
+        return {'status': APIResponseStatus.NO_RECORD.value}, 400
+    return {'status': APIResponseStatus.OK.value, 'job': job_status}, 200
+
+
+def run_bulk_training_job(job, network_name, record_filter, training_matrix, epochs, batch_size, shuffle,
+                          validation_split=0.0, patience=None):
+    """
+    Trains a copy of a stored NeuralNetwork object, then swaps it into the global cache and saves it to disk.
+    Runs on a training job worker thread, see `bulk_train_neural_network`.
+
+    :param job: TrainingJob which the progress is reported to
+    :param network_name: the network_id of the network to train
+    :param record_filter: db filter selecting the training records, or None to use `training_matrix`
+    :param training_matrix: float matrix of uploaded training rows (with the target class in the last column)
+    :param epochs: number of passes over the records
+    :param batch_size: number of records per weight update
+    :param shuffle: if True, the records are shuffled before every epoch
+    :param validation_split: fraction of the records held out as a validation set for early stopping
+    :param patience: number of epochs without a validation loss improvement after which training stops
+    :return: dictionary summarizing the completed training
+    """
+    network_loader = partial(load_neural_network, network_name)
+    with perceptron_cache.checkout(network_name, network_loader) as cached_perceptron_network:
+        if cached_perceptron_network is None:
+            raise ValueError("network {0} does not exist".format(network_name))
+        trained_network, saved_data = cached_perceptron_network[0].copy(), cached_perceptron_network[1]
+    if training_matrix is None:
+        with metrics.phase("disk"):
+            features, target_classes = feature_cache.read(records_db, record_filter, trained_network.inodes)
+    else:
+        features, target_classes = training_matrix[:, :-1], training_matrix[:, -1]
+    (features, target_classes), validation_data = network_evaluation.split_validation_records(
+        (features, target_classes), validation_split)
+    if not len(target_classes):
+        raise ValueError("no training records")
+    job.set_total(len(target_classes) * epochs)
+    validation_losses = list()
+    with metrics.phase("training"):
+        trained_network.train_batch(features, target_classes, batch_size=batch_size, epochs=epochs, shuffle=shuffle,
+                                    callback=job.update, validation_data=validation_data, patience=patience,
+                                    validation_callback=lambda epoch, loss: validation_losses.append(loss))
+    # the trained network replaces the stored network, unless that was deleted or replaced while training
+    with perceptron_cache.checkout(network_name, network_loader, write=True) as cached_perceptron_network:
+        if cached_perceptron_network is None or cached_perceptron_network[1] != saved_data:
+            raise RuntimeError("network {0} was deleted or replaced while training".format(network_name))
+        network_writer.discard(saved_data)  # an older scheduled write must not overwrite the trained network
+        with metrics.phase("disk"):
+            io_helper.save_pretrained_network(trained_network, saved_data, fsync=config_data['write_behind_fsync'])
+        perceptron_cache.replace(network_name, (trained_network, saved_data))
+    result = {"network": saved_data, "records": int(len(target_classes))}
+    if validation_losses:
+        result.update({"epochs": len(validation_losses), "validation_records": int(len(validation_data[1])),
+                       "validation_loss": min(validation_losses)})
+    return result
+
+
+@app.route('/api/v1/perceptron/query/batch', methods=['POST'])
+@cross_origin()
+def query_neural_network_batch():
+    """
+    Classifies many records with a stored NeuralNetwork object in a single forward pass.
+
+    The feature rows are provided either as a JSON body {"name": ..., "features": [...]}, where "features" is a list of
+    rows (lists of values or comma-separated strings), or as a CSV request body with the network name passed as the
+    "name" argument.
+
+    :return: JSON response with the identified class and raw network outputs for every provided row
+    """
+    request_json = flask.request.get_json(silent=True)
+    if request_json is None:  # fall back to a CSV body, with the network name passed as an argument
+        request_json = {"features": flask.request.get_data(as_text=True)}
+        if "name" in flask.request.args:
+            request_json["name"] = flask.request.args["name"]
+    return process_batch_query_request(request_json)
+
+
+def process_batch_query_request(request_json):
+    """
+    Classifies many records with a stored NeuralNetwork object, independently of the web framework serving the request
+    (see `query_neural_network_batch`).
+
+    :param request_json: dictionary of request arguments, "name" and "features"
+    :return: tuple of (response dictionary, status code)
+    """
+    resp = {'status': APIResponseStatus.OK.value}
+    status_code = 200
+    if {"name", "features"}.issubset(set(request_json)):
+        try:
+            inputs = io_helper.read_feature_rows(request_json['features'])
+            network_outputs = query_network_rows(request_json['name'], inputs)
+            if network_outputs is not None:
+                identified_classes = numpy.argmax(network_outputs, axis=1)
+                resp.update({"count": len(identified_classes),
+                             "results": [{"identified_class": int(identified_class),
+                                          "raw_network_output": network_output}
+                                         for identified_class, network_output in zip(identified_classes,
+                                                                                     network_outputs.tolist())]})
+            else:
+                resp.update({'status': APIResponseStatus.NO_RECORD.value})
+                status_code = 400
+        except ValueError:  # rows were malformed or did not match the number of network input nodes
+            resp.update({'status': APIResponseStatus.VALUE_ERROR.value})
+            status_code = 400
+    else:
+        resp.update({'status': APIResponseStatus.MISSING_ARGS.value})
+        status_code = 400
+    return resp, status_code
+
+
+def query_network_rows(network_name, features):
+    """
+    Queries a stored NeuralNetwork object with many records in a single forward pass.
+
+    :param network_name: the network_id of the requested network
+    :param features: float matrix of shape (records, input nodes)
+    :return: float matrix of shape (records, output nodes), or None if the network does not exist
+    """
+    network_loader = partial(load_neural_network, network_name)
+    with perceptron_cache.checkout(network_name, network_loader) as cached_perceptron_network:
+        if cached_perceptron_network is None:
+            return None
+        with metrics.phase("forward"):
+            return cached_perceptron_network[0].query_batch(features)
+
+
+@app.route('/api/v1/perceptron/evaluate', methods=['POST'])
+@cross_origin()
+def evaluate_neural_network():
+    """
+    Evaluates a stored NeuralNetwork object against the records matching a filter (by default, all testing records),
+    scoring every record in a single batched forward pass.
+
+    The request JSON must provide the network "name", and may provide a record "filter" as well as "roc_curve": true to
+    include the points of the ROC curve for each class.
+
+    :return: JSON response with the accuracy, confusion matrix, per-class precision/recall and ROC AUC of the network
+    """
+    resp = {'status': APIResponseStatus.OK.value}
+    status_code = 200
+    request_json = flask.request.get_json(silent=True)
+    if request_json is None or "name" not in request_json:
+        return {'status': APIResponseStatus.MISSING_ARGS.value}, 400
+    record_filter = request_json.get("filter", {"training_record": False})
+    try:
+        if not isinstance(record_filter, dict):
+            raise ValueError("record filter must be a JSON object")
+        record_filter = schema_helper.coerce_filter(record_filter)
+        network_loader = partial(load_neural_network, request_json['name'])
+        with perceptron_cache.checkout(request_json['name'], network_loader) as cached_perceptron_network:
+            network_outputs, target_classes = None, None
+            if cached_perceptron_network is not None:
+                with metrics.phase("disk"):
+                    features, target_classes = feature_cache.read(records_db, record_filter,
+                                                                  cached_perceptron_network[0].inodes)
+                with metrics.phase("forward"):
+                    network_outputs = cached_perceptron_network[0].query_batch(features)
+        if network_outputs is None:
+            resp.update({'status': APIResponseStatus.NO_RECORD.value})
+            status_code = 400
+        elif not len(target_classes):
+            resp.update({'status': APIResponseStatus.NO_RECORD.value, 'filter': record_filter})
+            status_code = 400
+        else:
+            resp.update({'filter': record_filter,
+                         'evaluation': network_evaluation.evaluate_outputs(network_outputs, target_classes,
+                                                                           bool(request_json.get("roc_curve")))})
+    except (ValueError, TypeError):  # the filter was invalid, or the matching records do not fit the network
+        resp.update({'status': APIResponseStatus.VALUE_ERROR.value})
+        status_code = 400
+    return resp, status_code
+
+
+def load_neural_network(network_name):
+    """
+    Loads a NeuralNetwork object from disk based on the metadata stored in the db. Used to populate the global cache
+    when a requested network is not already cached.
+
+    :param network_name: the network_id of the requested network
+    :return: tuple of (NeuralNetwork, save data path), or None if the network does not exist
+    """
+    for attempt in range(2):
+        perceptron_network_doc = network_metadata.get(network_name)
+        if perceptron_network_doc is None:
+            return None
+        try:
+            with metrics.phase("disk"):
+                pending_network_data = network_writer.latest(perceptron_network_doc['saved_data'])
+                if pending_network_data is not None:  # the file on disk is not up to date yet, use the scheduled one
+                    perceptron_network = io_helper.deserialize_network(bytearray(pending_network_data))
+                else:
+                    perceptron_network = model_store.open(perceptron_network_doc['saved_data'])
+        except FileNotFoundError:
+            # the cached metadata is out of date (i.e. the network was updated or deleted by another worker process),
+            # re-read it from the db once
+            network_metadata.invalidate(network_name)
+            continue
+        if perceptron_network is not None:
+            return perceptron_network, perceptron_network_doc['saved_data']
+        return None
+    return None
+
+
+def remove_network_file(saved_data):
+    """
+    Removes a serialized NeuralNetwork file, cancelling any scheduled write to it first.
+
+    :param saved_data: location of the serialized network
+    :return:
+    """
+    network_writer.discard(saved_data)
+    model_store.invalidate(saved_data)
+    if os.path.exists(saved_data):
+        os.remove(saved_data)
+
+
 @app.route('/api/v1/perceptron/delete', methods=['GET', 'POST'])
 @cross_origin()
 def delete_neural_network():
@@ -273,12 +838,13 @@ def delete_neural_network():
     required_args = {"name"}
     if required_args.intersection(set(flask.request.args)) == required_args:
         try:
-            if flask.request.args['name'] in perceptron_cache.keys():
-                perceptron_cache.pop(flask.request.args['name'])
-            if perceptron_db.record_exists({'network_id': flask.request.args['name']}):
-                os.remove(perceptron_db.read_document({'network_id': flask.request.args['name']})["saved_data"])
-                deleted_count = perceptron_db.remove_document({'network_id': flask.request.args['name']})
-                resp.update({"deleted_count": deleted_count})
+            if online_trainer is not None:
+                online_trainer.discard(flask.request.args['name'])
+            perceptron_cache.pop(flask.request.args['name'])
+            removed_network_document = network_metadata.delete(flask.request.args['name'])
+            if removed_network_document is not None:
+                remove_network_file(removed_network_document["saved_data"])
+                resp.update({"deleted_count": 1})
         except ValueError:
             resp.update({'status': APIResponseStatus.VALUE_ERROR.value})
             status_code = 400
@@ -288,6 +854,20 @@ def delete_neural_network():
     return resp, status_code
 
 
+@app.route('/api/v1/perceptron/metrics', methods=['GET'])
+@cross_origin()
+def api_metrics():
+    """
+    Reports request latencies (split into cache lookup, db, disk and network forward/training time), db operation
+    counts and cache statistics in the Prometheus text format, i.e. to be scraped by a Prometheus server.
+
+    :return: plain text response of every metric
+    """
+    if not metrics.enabled:
+        return {'status': APIResponseStatus.METRICS_DISABLED.value}, 400
+    return flask.Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 # Optional debug endpoints for directly interacting with the backend database
 @app.route('/api/v1/perceptron/dbtest', methods=['GET', 'POST'])
 def api_db_check():
@@ -316,6 +896,15 @@ def mongo_db_write_document():
     return resp, status_code
 
 
+@app.route('/api/v1/dbreport', methods=['GET', 'POST'])
+def mongo_db_query_report():
+    if config_data['flask_enable_debug_endpoints']:
+        resp, status_code = debug_helper.mongo_db_query_report(records_db, perceptron_db, flask.request.args), 200
+    else:
+        resp, status_code = {'status': APIResponseStatus.DEBUG_DISABLED.value}, 400
+    return resp, status_code
+
+
 @app.route('/api/v1/delete', methods=['GET', 'POST'])
 def mongo_db_delete_document():
     if config_data['flask_enable_debug_endpoints']:
@@ -0,0 +1,100 @@
+# Asynchronous (ASGI) entry point for the Perceptron API, serving the same /api/v1/perceptron/* routes as
+# `perceptron_api`. Run with `python3 perceptron_asgi.py`, or `uvicorn perceptron_asgi:app`.
+# Connections are handled by the event loop, so idle or waiting clients do not hold a thread. The query and training
+# routes run their blocking work (cache/model loads, db lookups and forward/backward passes) on a bounded thread pool,
+# every other route is served by the Flask application on a separate thread pool.
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+import uvicorn
+import perceptron_api
+from perceptron_api import config_data
+from APIHelpers import APIResponseStatus
+
+# Thread pool running the blocking part of each query/training request, its size bounds the number of requests being
+# processed at once (further requests wait on the event loop)
+network_executor = ThreadPoolExecutor(max_workers=int(config_data['asgi_network_workers']),
+                                      thread_name_prefix="network-worker")
+
+
+async def run_blocking(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(network_executor, partial(function, *args))
+
+
+def process_timed_request(route, function, *args):
+    # runs a request handler returning a (response, status code) tuple, recording its metrics on the worker thread
+    perceptron_api.metrics.start_request(route)
+    status_code = 500
+    try:
+        resp, status_code = function(*args)
+        return resp, status_code
+    finally:
+        perceptron_api.metrics.end_request(status_code)
+
+
+async def read_json(request):
+    # returns the parsed JSON body of the request, or None if the body is not valid JSON
+    try:
+        return json.loads(await request.body())
+    except ValueError:
+        return None
+
+
+async def query_neural_network(request):
+    """
+    Asynchronous version of `perceptron_api.query_neural_network`, for the "query" and "train" endpoints.
+
+    :return: JSON response with either an "OK" status for training or a network response for queries
+    """
+    request_json = await read_json(request)
+    if not isinstance(request_json, dict):
+        return JSONResponse({'status': APIResponseStatus.ERROR.value}, status_code=400)
+    training_request = request.url.path.rstrip("/").endswith("/train")
+    resp, status_code = await run_blocking(process_timed_request, request.url.path,
+                                           perceptron_api.process_query_request, request_json, training_request)
+    return JSONResponse(resp, status_code=status_code)
+
+
+async def query_neural_network_batch(request):
+    """
+    Asynchronous version of `perceptron_api.query_neural_network_batch`, accepting a JSON or CSV request body.
+
+    :return: JSON response with the identified class and raw network outputs for every provided row
+    """
+    request_json = await read_json(request)
+    if not isinstance(request_json, dict):  # fall back to a CSV body, with the network name passed as an argument
+        request_json = {"features": (await request.body()).decode("utf-8", errors="replace")}
+        if "name" in request.query_params:
+            request_json["name"] = request.query_params["name"]
+    resp, status_code = await run_blocking(process_timed_request, request.url.path,
+                                           perceptron_api.process_batch_query_request, request_json)
+    return JSONResponse(resp, status_code=status_code)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # requests still running on the thread pool are completed before the server exits
+    network_executor.shutdown(wait=True)
+
+
+app = Starlette(routes=[Route('/api/v1/perceptron/query', query_neural_network, methods=['GET', 'POST']),
+                        Route('/api/v1/perceptron/train', query_neural_network, methods=['GET', 'POST']),
+                        Route('/api/v1/perceptron/query/batch', query_neural_network_batch, methods=['POST']),
+                        # every other route is served by the (synchronous) Flask application
+                        Mount('/', app=WSGIMiddleware(perceptron_api.app,
+                                                      workers=int(config_data['asgi_wsgi_workers'])))],
+                middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+                lifespan=lifespan)
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=config_data['flask_host'], port=config_data['flask_port'])
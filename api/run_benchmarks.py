@@ -0,0 +1,209 @@
+# Benchmarks the hot paths of the Perceptron API: NeuralNetwork queries/training, the global cache, network
+# serialization and the /query and /train endpoints. Run from the api directory with `python3 run_benchmarks.py`.
+# Results are written as JSON and compared against a stored baseline (see --save-baseline), the script exits with a
+# non-zero status when any benchmark is slower than the baseline by more than the tolerance.
+# The endpoint benchmarks run against an in-memory db and require `mongomock` (`pip3 install mongomock`), they are
+# skipped when it is not installed.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy
+import activations
+import optimizers
+from APIHelpers import benchmark_helper, cache_helper, io_helper
+from neural_network import NeuralNetwork
+
+API_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# (input nodes, hidden nodes..., output nodes) of the benchmarked networks, starting with the sample network layout
+LAYER_SIZES = [(9, 4, 2), (64, 32, 2), (256, 128, 10), (256, 128, 64, 32, 10)]
+BATCH_SIZES = [1, 64, 1024]
+CACHE_SIZE = 100000
+SEED = 0
+
+
+def benchmark_neural_network(repeat):
+    results = dict()
+    for layers in LAYER_SIZES:
+        layout = "-".join(str(nodes) for nodes in layers)
+        random_state = numpy.random.RandomState(SEED)
+        neural_network = NeuralNetwork(layers[0], layers[1:-1], layers[-1], 0.1, seed=SEED)
+        features = random_state.uniform(0.01, 1.0, (max(BATCH_SIZES), layers[0]))
+        target_classes = random_state.randint(0, layers[-1], max(BATCH_SIZES))
+
+        results["nn.query[{0}]".format(layout)] = benchmark_helper.measure(
+            lambda: neural_network.query(features[0]), repeat=repeat, number=200)
+        results["nn.train[{0}]".format(layout)] = benchmark_helper.measure(
+            lambda: neural_network.train(features[0], target_classes[0]), repeat=repeat, number=200)
+        for batch_size in BATCH_SIZES:
+            batch = features[:batch_size]
+            results["nn.query_batch[{0},records={1}]".format(layout, batch_size)] = benchmark_helper.measure(
+                lambda: neural_network.query_batch(batch), repeat=repeat, number=20)
+            # one epoch over every record, updating the weights once per mini-batch
+            results["nn.train_batch[{0},batch_size={1}]".format(layout, batch_size)] = benchmark_helper.measure(
+                lambda: neural_network.train_batch(features, target_classes, batch_size=batch_size), repeat=repeat)
+    # forward passes of the largest two-layer layout with each activation function
+    input_nodes, hidden_nodes, output_nodes = LAYER_SIZES[2]
+    features = numpy.random.RandomState(SEED).uniform(0.01, 1.0, (max(BATCH_SIZES), input_nodes))
+    for activation in activations.ACTIVATIONS:
+        neural_network = NeuralNetwork(input_nodes, hidden_nodes, output_nodes, 0.1, seed=SEED, activation=activation)
+        results["nn.query_batch[activation={0}]".format(activation)] = benchmark_helper.measure(
+            lambda: neural_network.query_batch(features), repeat=repeat, number=20)
+    # one epoch of mini-batch training of the same layout with each optimizer
+    target_classes = numpy.random.RandomState(SEED).randint(0, output_nodes, max(BATCH_SIZES))
+    for optimizer in optimizers.OPTIMIZERS:
+        neural_network = NeuralNetwork(input_nodes, hidden_nodes, output_nodes, 0.01, seed=SEED, optimizer=optimizer)
+        results["nn.train_batch[optimizer={0},batch_size=64]".format(optimizer)] = benchmark_helper.measure(
+            lambda: neural_network.train_batch(features, target_classes, batch_size=64), repeat=repeat)
+    return results
+
+
+def benchmark_cache(repeat):
+    results = dict()
+    keys = ["network_{0}".format(i) for i in range(CACHE_SIZE)]
+    entry = (None, "./bin/network.bin")
+
+    def fill_cache():
+        global_cache = cache_helper.GlobalCacheHelper(max_size=CACHE_SIZE, save_function=lambda network, path: None)
+        for key in keys:
+            global_cache.add(key, entry)
+        return global_cache
+
+    # every add past `max_size` evicts (and hands to the save function) the least recently accessed entry
+    full_cache = fill_cache()
+    evicting_keys = ["evicting_network_{0}".format(i) for i in range(CACHE_SIZE)]
+    random_keys = [keys[i] for i in numpy.random.RandomState(SEED).randint(0, CACHE_SIZE, CACHE_SIZE)]
+    key_sets = [evicting_keys, keys]
+
+    def add_evicting():
+        for key in key_sets[0]:
+            full_cache.add(key, entry)
+        key_sets.reverse()  # the next repetition evicts the keys added by this one
+
+    results["cache.add[max_size={0}]".format(CACHE_SIZE)] = benchmark_helper.measure(fill_cache, repeat=repeat)
+    results["cache.read[max_size={0}]".format(CACHE_SIZE)] = benchmark_helper.measure(
+        lambda: [full_cache.read(key) for key in random_keys], repeat=repeat)
+    results["cache.add_evicting[max_size={0}]".format(CACHE_SIZE)] = benchmark_helper.measure(add_evicting,
+                                                                                             repeat=repeat)
+    return results
+
+
+def benchmark_serialization(repeat, directory):
+    results = dict()
+    for layers in LAYER_SIZES:
+        layout = "-".join(str(nodes) for nodes in layers)
+        neural_network = NeuralNetwork(layers[0], layers[1:-1], layers[-1], 0.1, seed=SEED)
+        network_file = os.path.join(directory, "benchmark_{0}.bin".format(layout))
+        results["io.save[{0}]".format(layout)] = benchmark_helper.measure(
+            lambda: io_helper.save_pretrained_network(neural_network, network_file), repeat=repeat, number=20)
+        # the weights are mapped lazily, so the loaded network is queried once to include reading them in the timing
+        results["io.load[{0}]".format(layout)] = benchmark_helper.measure(
+            lambda: io_helper.load_pretrained_network(network_file).query(numpy.zeros(layers[0])),
+            repeat=repeat, number=20)
+    return results
+
+
+def benchmark_api(repeat, directory):
+    try:
+        import mongomock
+        import pymongo
+    except ImportError:
+        print("[Benchmarks] mongomock is not installed, skipping the API benchmarks...")
+        return dict()
+    # the API is loaded from a copy of the configuration which keeps every file it writes in `directory`, against a
+    # single in-memory db shared by all of its connections
+    config_data = io_helper.load_config_data(os.path.join(API_DIRECTORY, 'config.json'))
+    config_data.update({"trained_networks_directory": os.path.join(directory, "bin"),
+                        "feature_cache_directory": os.path.join(directory, "bin", "feature_cache"),
+                        "sample_network_training_data_csv": os.path.join(API_DIRECTORY, "sample_data", "bc_train.csv"),
+                        "sample_network_testing_data_csv": os.path.join(API_DIRECTORY, "sample_data", "bc_test.csv"),
+                        "load_sample_network_on_start": True,
+                        "sample_training_iterations": 1,
+                        "sample_training_processes": 0})
+    os.makedirs(config_data["trained_networks_directory"], exist_ok=True)
+    with open(os.path.join(directory, 'config.json'), 'w') as config_file:
+        json.dump(config_data, config_file)
+    mongo_client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: mongo_client
+    working_directory = os.getcwd()
+    os.chdir(directory)
+    try:
+        import perceptron_api
+    finally:
+        os.chdir(working_directory)
+
+    results = dict()
+    client = perceptron_api.app.test_client()
+    network_name = config_data['sample_network_name']
+    features = "5,1,1,1,2,1,3,1,1"
+
+    def request(endpoint, request_json):
+        response = client.post(endpoint, json=request_json)
+        if response.status_code != 200:
+            raise RuntimeError("{0} failed with {1}: {2}".format(endpoint, response.status_code, response.json))
+
+    results["api.query"] = benchmark_helper.measure(
+        lambda: request('/api/v1/perceptron/query', {"name": network_name, "features": features}),
+        repeat=repeat, number=100)
+    results["api.train"] = benchmark_helper.measure(
+        lambda: request('/api/v1/perceptron/train', {"name": network_name, "features": features, "target": "0"}),
+        repeat=repeat, number=100)
+    perceptron_api.network_writer.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the Perceptron API hot paths.")
+    parser.add_argument("--output", default="benchmark_results.json", help="file the results are written to")
+    parser.add_argument("--baseline", default=os.path.join(API_DIRECTORY, "benchmark_baseline.json"),
+                        help="results of a previous run to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown of the fastest time reported as a regression (default 0.25)")
+    parser.add_argument("--repeat", type=int, default=7, help="timed repetitions of every benchmark")
+    parser.add_argument("--suites", default="nn,cache,io,api",
+                        help="comma-separated list of the suites to run (nn, cache, io, api)")
+    args = parser.parse_args()
+
+    suites = set(args.suites.split(","))
+    results = {"created": time.time(),
+               "environment": benchmark_helper.environment_info(),
+               "benchmarks": dict()}
+    with tempfile.TemporaryDirectory() as directory:
+        if "nn" in suites:
+            results["benchmarks"].update(benchmark_neural_network(args.repeat))
+        if "cache" in suites:
+            results["benchmarks"].update(benchmark_cache(args.repeat))
+        if "io" in suites:
+            results["benchmarks"].update(benchmark_serialization(args.repeat, directory))
+        if "api" in suites:
+            results["benchmarks"].update(benchmark_api(args.repeat, directory))
+
+    for name, timing in sorted(results["benchmarks"].items()):
+        print("{0:<50} {1:>12.3f} ms (min {2:.3f} ms)".format(name, timing["median"] * 1000, timing["min"] * 1000))
+    benchmark_helper.save_results(results, args.output)
+    if args.save_baseline:
+        benchmark_helper.save_results(results, args.baseline)
+        print("[Benchmarks] Stored the results as the baseline in '{0}'...".format(args.baseline))
+        return 0
+
+    baseline = benchmark_helper.load_results(args.baseline)
+    if baseline is None:
+        print("[Benchmarks] No baseline found at '{0}', run with --save-baseline to store one...".format(args.baseline))
+        return 0
+    if baseline.get("environment") != results["environment"]:
+        print("[Benchmarks] Warning: the baseline was measured on a different environment, timings may differ...")
+    comparisons = benchmark_helper.compare_results(results, baseline, args.tolerance)
+    regressions = [comparison for comparison in comparisons if comparison["regression"]]
+    for comparison in comparisons:
+        print("{0:<50} {1:>8.2f}x baseline{2}".format(comparison["name"], comparison["ratio"],
+                                                      "  <-- REGRESSION" if comparison["regression"] else ""))
+    print("[Benchmarks] {0} of {1} benchmarks regressed by more than {2:.0f}%...".format(
+        len(regressions), len(comparisons), args.tolerance * 100))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
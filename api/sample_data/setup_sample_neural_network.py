@@ -1,17 +1,31 @@
-import csv
+import multiprocessing
 import os
 import time
-import numpy
-from APIHelpers import db_helper, io_helper
+from APIHelpers import db_helper, feature_cache_helper, io_helper, schema_helper
 from neural_network import NeuralNetwork
+import network_evaluation
 
 config_data = io_helper.load_config_data()
 
 mongo_db = db_helper.DBConnection(config_data['mongo_host'], config_data['mongo_port'], config_data['mongo_database'],
-                                  config_data['data_collection'])
+                                  config_data['data_collection'], indexes=db_helper.RECORD_INDEXES)
 mongo_metadata_db = db_helper.DBConnection(config_data['mongo_host'], config_data['mongo_port'],
                                            config_data['mongo_database'],
-                                           config_data['metadata_collection'])
+                                           config_data['metadata_collection'],
+                                           indexes=db_helper.METADATA_INDEXES)
+mongo_schema_db = db_helper.DBConnection(config_data['mongo_host'], config_data['mongo_port'],
+                                         config_data['mongo_database'], config_data['schema_collection'])
+
+# Materialized feature matrices of the sample records, reused by every training/testing run until the records change
+feature_cache = feature_cache_helper.FeatureMatrixCache(config_data['feature_cache_directory'],
+                                                        max_size=int(config_data['feature_cache_max_size']),
+                                                        enabled=config_data['feature_cache_enabled'])
+feature_cache.watch(mongo_db)
+
+# anchored record_id prefixes, so the records are selected with the (training_record, record_id) index
+TRAINING_RECORDS = {"training_record": True, "record_id": db_helper.prefix_match("BC_Sample_Train_")}
+TESTING_RECORDS = {"training_record": False, "record_id": db_helper.prefix_match("BC_Sample_Test_")}
+_worker_training_data, _worker_testing_data = None, None
 
 
 def main(timeout=20):
@@ -33,66 +47,136 @@ def main(timeout=20):
     if not wait_for_db:
         mongo_db.remove_document(test_doc)
         write_data_db()
-        trained_networks = list()
-        record_count = 0
-        for _ in range(config_data['sample_training_iterations']):
-            record_count, trained_network = train_network_db()
-            pass_rate, test_count = test_network_db(trained_network)
-            trained_networks.append((trained_network, pass_rate))
-            # print("[Breast Cancer Classifier] Sample Neural Network trained on {0} records ...".format(record_count))
-            # print("[Breast Cancer Classifier] Sample Neural Network tested on "
-            #       "{1} records with {0:.2f}% PassRate!".format(pass_rate, test_count))
-        trained_networks.sort(key=lambda x: x[1], reverse=True)
+        # Fetch the training/testing records once, then train one network per seed in parallel
+        training_data = read_records_db(TRAINING_RECORDS)
+        testing_data = read_records_db(TESTING_RECORDS)
+        seeds = [config_data['sample_training_seed'] + i for i in range(config_data['sample_training_iterations'])]
+        trained_networks = train_networks_parallel(seeds, training_data, testing_data,
+                                                   config_data['sample_training_processes'])
+        for seed, (trained_network, validation_rate, pass_rate) in zip(seeds, trained_networks):
+            print("[Breast Cancer Classifier] Seed {0}: Sample Neural Network validated with {1:.2f}% PassRate, "
+                  "tested on {2} records with {3:.2f}% PassRate".format(seed, validation_rate, len(testing_data[1]),
+                                                                       pass_rate))
+        # the network is selected by its validation records only, the testing records only report its accuracy
+        trained_network, _, pass_rate = max(trained_networks, key=lambda x: x[1])
         print("[Breast Cancer Classifier] After {0} training iterations on {1} records, "
               "deploying Sample Network with {2:.2f}% Accuracy...".format(config_data['sample_training_iterations'],
-                                                                          record_count,
-                                                                          trained_networks[0][1]))
-        write_network_metadata(trained_networks[0][0])
+                                                                          len(training_data[1]), pass_rate))
+        write_network_metadata(trained_network)
 
 
 def write_data_db():
-    # Write sample data to Mongo DB (if not previously loaded)
+    # Write sample data to Mongo DB (if not previously loaded), streaming each CSV in bulk-inserted chunks
+    mongo_db.ensure_indexes()
+    mongo_metadata_db.ensure_indexes()
+    # records loaded by earlier versions are converted to the typed schema, rather than skipped as already loaded
+    schema_helper.migrate_records(mongo_db, config_data['sample_data_chunk_size'], schema_db=mongo_schema_db)
     # Training Records
-    with open(config_data["sample_network_training_data_csv"]) as csvfile:
-        csv_rows = csv.reader(csvfile)
-        for i, row in enumerate(csv_rows):
-            if mongo_db.record_exists({"record_id": "BC_Sample_Train_{0}".format(i)}):
-                continue
-            document = dict()
-            features = {str(k): v for k, v in enumerate(row[:-1])}
-            target = {"record_id": "BC_Sample_Train_{0}".format(i), "training_record": str(True),
-                      "target_class": str(row[-1])}
-            document.update(features)
-            document.update(target)
-            mongo_db.write_document(document)
+    write_records_csv(config_data["sample_network_training_data_csv"], "BC_Sample_Train_", True)
     # Testing Records
-    with open(config_data["sample_network_testing_data_csv"]) as csvfile:
-        csv_rows = csv.reader(csvfile)
-        for i, row in enumerate(csv_rows):
-            if mongo_db.record_exists({"record_id": "BC_Sample_Test_{0}".format(i)}):
-                continue
-            document = dict()
-            features = {str(k): v for k, v in enumerate(row[:-1])}
-            target = {"record_id": "BC_Sample_Test_{0}".format(i), "training_record": str(False),
-                      "target_class": str(row[-1])}
-            document.update(features)
-            document.update(target)
-            mongo_db.write_document(document)
-
-
-def train_network_db():
+    write_records_csv(config_data["sample_network_testing_data_csv"], "BC_Sample_Test_", False)
+
+
+def write_records_csv(csv_file, record_prefix, training_record, chunk_size=None):
+    """
+    Streams the records of a (optionally gzip compressed) CSV file into the db, inserting one chunk of records per
+    bulk operation. Records whose `record_id` already exists in the db are skipped, so loading is idempotent.
+
+    :param csv_file: path to a CSV file of feature values, with the target class in the last column
+    :param record_prefix: prefix of the generated `record_id` values, which are numbered by row
+    :param training_record: whether the records are used for training (True) or testing (False)
+    :param chunk_size: number of records per bulk operation, defaults to the `sample_data_chunk_size` setting
+    :return: tuple of (records read, records inserted)
+    """
+    chunk_size = chunk_size or config_data['sample_data_chunk_size']
+    record_count, inserted_count = 0, 0
+    for chunk in io_helper.iter_data_csv(csv_file, chunk_size):
+        documents = list()
+        for features, target_class in chunk:
+            documents.append(schema_helper.record_document(features, target_class, training_record,
+                                                           record_id="{0}{1}".format(record_prefix, record_count)))
+            record_count += 1
+        inserted_count += mongo_db.upsert_documents(documents, "record_id")
+    return record_count, inserted_count
+
+
+def read_records_db(match):
+    # records are fetched once into a (records, input nodes) feature matrix and a vector of target classes, which are
+    # then served from the feature cache until a matching record is written
+    return feature_cache.read(mongo_db, match, config_data['sample_network_input_nodes'])
+
+
+def train_network(training_data, seed=None):
+    """
+    Trains a new sample network with the configured optimizer. A fraction of the training records (the
+    `sample_validation_split`) is held out as a validation set, which stops training once it no longer improves and
+    selects the weights of the best epoch.
+
+    :param training_data: tuple of (feature matrix, target classes), see `read_records_db`
+    :param seed: (optional) seed for the initial network weights, the validation split and the record shuffling
+    :return: the trained NeuralNetwork
+    """
     sample_network = NeuralNetwork(input_nodes=config_data['sample_network_input_nodes'],
                                    hidden_nodes=config_data['sample_network_hidden_nodes'],
                                    output_nodes=config_data['sample_network_output_nodes'],
-                                   learning_rate=config_data['sample_network_learn_rate'])
-    rcount = 0
-    for record in mongo_db.read_documents({"training_record": str(True),
-                                           "record_id": {"$regex": "BC_Sample_Train_.*?"}}):
-        rcount += 1
-        features = [record[str(i)] for i in range(config_data['sample_network_input_nodes'])]
-        target_class = int(record['target_class'])
-        sample_network.train(features, target_class)
-    return rcount, sample_network
+                                   learning_rate=config_data['sample_network_learn_rate'],
+                                   seed=seed, optimizer=config_data['sample_network_optimizer'],
+                                   bias=config_data['sample_network_bias'])
+    (features, target_classes), validation_data = network_evaluation.split_validation_records(
+        training_data, config_data['sample_validation_split'], seed)
+    sample_network.train_batch(features, target_classes, batch_size=config_data['sample_training_batch_size'],
+                               epochs=config_data['sample_training_epochs'], shuffle=True,
+                               validation_data=validation_data, patience=config_data['sample_training_patience'],
+                               seed=seed)
+    return sample_network
+
+
+def test_network(neural_network, testing_data):
+    # small test which checks the pass-rate (in percent) against the testing records
+    return network_evaluation.evaluate_network(neural_network, testing_data[0], testing_data[1])["accuracy"] * 100
+
+
+def train_networks_parallel(seeds, training_data, testing_data, processes=0):
+    """
+    Trains and tests one sample network per seed, spreading the seeds across a pool of worker processes.
+
+    :param seeds: list of seeds, one network is trained for each
+    :param training_data: tuple of (feature matrix, target classes) to train each network with
+    :param testing_data: tuple of (feature matrix, target classes) to test each network against
+    :param processes: number of worker processes, 0 uses every available core and 1 trains in this process
+    :return: list of tuples of (trained NeuralNetwork, validation pass rate, test pass rate), in the same order as
+    `seeds`
+    """
+    processes = min(processes or os.cpu_count() or 1, len(seeds))
+    if processes <= 1:
+        _init_training_worker(training_data, testing_data)
+        return [_train_seed(seed) for seed in seeds]
+    # Workers are spawned rather than forked, as the API process already runs db client and worker threads which must
+    # not be copied into a forked child. Spawned workers re-import the main module, which skips the sample setup in
+    # worker processes (see `perceptron_api`).
+    with multiprocessing.get_context("spawn").Pool(processes, initializer=_init_training_worker,
+                                                  initargs=(training_data, testing_data)) as pool:
+        return pool.map(_train_seed, seeds)
+
+
+def _init_training_worker(training_data, testing_data):
+    # records are handed to each worker process once, rather than with every seed
+    global _worker_training_data, _worker_testing_data
+    _worker_training_data, _worker_testing_data = training_data, testing_data
+
+
+def _train_seed(seed):
+    trained_network = train_network(_worker_training_data, seed)
+    # the validation records held out by `train_network` (or the training records, without a validation split)
+    _, validation_data = network_evaluation.split_validation_records(_worker_training_data,
+                                                                    config_data['sample_validation_split'], seed)
+    return trained_network, test_network(trained_network, validation_data or _worker_training_data), \
+        test_network(trained_network, _worker_testing_data)
+
+
+def train_network_db(seed=None):
+    training_data = read_records_db(TRAINING_RECORDS)
+    return len(training_data[1]), train_network(training_data, seed)
 
 
 def write_network_metadata(neural_network):
@@ -108,18 +192,8 @@ def write_network_metadata(neural_network):
 
 
 def test_network_db(neural_network):
-    # small test which checks the pass-rate against the db testing records
-    total_tests = 0
-    passed_tests = 0
-    for testing_record in mongo_db.read_documents({"training_record": str(False),
-                                                   "record_id": {"$regex": "BC_Sample_Test_.*?"}}):
-        total_tests += 1
-        features = [testing_record[str(i)] for i in range(config_data['sample_network_input_nodes'])]
-        target_class = int(testing_record['target_class'])
-        network_outputs = neural_network.query(numpy.asfarray(features))
-        if numpy.argmax(network_outputs) == target_class:
-            passed_tests += 1
-    return (float(passed_tests) / total_tests) * 100, total_tests
+    testing_data = read_records_db(TESTING_RECORDS)
+    return test_network(neural_network, testing_data), len(testing_data[1])
 
 
 if __name__ == '__main__':
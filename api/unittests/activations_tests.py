@@ -0,0 +1,49 @@
+import unittest
+import numpy
+from scipy import special
+import activations
+
+
+class TestActivations(unittest.TestCase):
+    def test_derivatives_match_finite_differences(self):
+        x = numpy.linspace(-4.0, 4.0, 41) + 0.05  # avoids the ReLU kink at 0
+        epsilon = 1e-6
+        for name in ("sigmoid", "tanh", "relu", "fast_sigmoid"):
+            activation = activations.get_activation(name)
+            # Test Instructions
+            numerical_derivative = (activation.function(x + epsilon) - activation.function(x - epsilon)) / (2 * epsilon)
+            derivative = activation.derivative(activation.function(x))
+            # Assertions
+            numpy.testing.assert_allclose(derivative, numerical_derivative, atol=1e-6, err_msg=name)
+
+    def test_lut_sigmoid_approximates_sigmoid(self):
+        x = numpy.linspace(-12.0, 12.0, 10001)
+        activation = activations.get_activation("lut_sigmoid")
+        # Test Instructions
+        outputs = activation.function(x)
+        outputs_32 = activation.function(x.astype(numpy.float32))
+        # Assertions
+        self.assertLess(numpy.max(numpy.abs(outputs - special.expit(x))), 0.002)
+        self.assertEqual(outputs_32.dtype, numpy.float32)
+        numpy.testing.assert_allclose(outputs_32, outputs, atol=0.002)
+
+    def test_in_place_computation(self):
+        for name, activation in activations.ACTIVATIONS.items():
+            x = numpy.linspace(-3.0, 3.0, 7)
+            expected_outputs = activation.function(x.copy())
+            buffer = numpy.empty_like(x)
+            # Test Instructions
+            outputs = activation.function(x, out=x)
+            derivative = activation.derivative(outputs, out=buffer)
+            # Assertions
+            self.assertIs(outputs, x, msg=name)
+            self.assertIs(derivative, buffer, msg=name)
+            numpy.testing.assert_allclose(outputs, expected_outputs, err_msg=name)
+
+    def test_unknown_activation(self):
+        with self.assertRaises(ValueError):
+            activations.get_activation("softsign")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,747 @@
+import atexit
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import numpy
+import network_evaluation
+from neural_network import NeuralNetwork
+from APIHelpers import APIResponseStatus
+try:
+    import mongomock
+    import pymongo
+except ImportError:
+    mongomock = None
+try:
+    from starlette.testclient import TestClient
+except ImportError:
+    TestClient = None
+
+API_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_FEATURES = "5,1,1,1,2,1,3,1,1"
+
+
+def load_api():
+    """
+    Imports `perceptron_api` against a single in-memory db shared by all of its connections, from a temporary working
+    directory holding a copy of the configuration which keeps every file the API writes in that directory. The sample
+    setup runs on import, training its seeds in a pool of spawned worker processes.
+
+    :return: the imported perceptron_api module
+    """
+    if "perceptron_api" in sys.modules:
+        return sys.modules["perceptron_api"]
+    directory = tempfile.mkdtemp()
+    # registered before the API is imported, so that the directory is removed after the API exit hooks have run
+    atexit.register(shutil.rmtree, directory, True)
+    with open(os.path.join(API_DIRECTORY, "config.json")) as config_file:
+        config_data = json.load(config_file)
+    config_data.update({"trained_networks_directory": os.path.join(directory, "bin"),
+                        "feature_cache_directory": os.path.join(directory, "bin", "feature_cache"),
+                        "sample_network_training_data_csv": os.path.join(API_DIRECTORY, "sample_data", "bc_train.csv"),
+                        "sample_network_testing_data_csv": os.path.join(API_DIRECTORY, "sample_data", "bc_test.csv"),
+                        "load_sample_network_on_start": True,
+                        "sample_training_iterations": 2,
+                        "sample_training_processes": 2})
+    os.makedirs(config_data["trained_networks_directory"])
+    with open(os.path.join(directory, "config.json"), "w") as config_file:
+        json.dump(config_data, config_file)
+    mongo_client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: mongo_client
+    working_directory = os.getcwd()
+    os.chdir(directory)
+    try:
+        import perceptron_api
+    finally:
+        os.chdir(working_directory)
+    return perceptron_api
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestAPIStartup(unittest.TestCase):
+    def test_sample_network_is_set_up_on_import(self):
+        # Test Instructions
+        perceptron_api = load_api()
+        client = perceptron_api.app.test_client()
+        network_name = perceptron_api.config_data['sample_network_name']
+        response = client.post('/api/v1/perceptron/query', json={"name": network_name, "features": SAMPLE_FEATURES})
+        metadata = perceptron_api.perceptron_db.read_document({"network_id": network_name})
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["status"], "OK")
+        self.assertTrue(os.path.isfile(metadata["saved_data"]))
+        self.assertTrue(os.path.isabs(metadata["saved_data"]))
+
+
+def add_network(perceptron_api, network_name, neural_network=None):
+    """
+    Saves a network file and its metadata entry, as committed by another worker process.
+
+    :return: tuple of (NeuralNetwork, location of the network file)
+    """
+    neural_network = neural_network or NeuralNetwork(9, 4, 2, 0.1, seed=3)
+    saved_data = os.path.join(perceptron_api.config_data['trained_networks_directory'],
+                              "{0}_perceptron_network.bin".format(network_name))
+    perceptron_api.io_helper.save_pretrained_network(neural_network, saved_data)
+    perceptron_api.network_metadata.create(network_name, saved_data)
+    return neural_network, saved_data
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestTraining(unittest.TestCase):
+    def setUp(self):
+        self.perceptron_api = load_api()
+        self.client = self.perceptron_api.app.test_client()
+
+    def test_shared_network_replaced_by_a_legacy_file_is_copied(self):
+        network, saved_data = add_network(self.perceptron_api, "LegacyReplaced")
+        self.client.post('/api/v1/perceptron/query', json={"name": "LegacyReplaced", "features": SAMPLE_FEATURES})
+        with open(saved_data, "wb") as network_file:  # replaced in place, i.e. by an older build
+            network_file.write(b"legacy pickled network")
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/train',
+                                    json={"name": "LegacyReplaced", "features": SAMPLE_FEATURES, "target": 1})
+        trained_network = self.perceptron_api.perceptron_cache.peek("LegacyReplaced")[0]
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {"status": "OK"})
+        self.assertFalse(trained_network.read_only)
+        self.assertFalse(numpy.array_equal(trained_network.parameters, network.parameters))
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestBatchQuery(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.perceptron_api = load_api()
+        cls.network = add_network(cls.perceptron_api, "BatchQueried")[0]
+
+    def setUp(self):
+        self.client = self.perceptron_api.app.test_client()
+        self.rows = [[5, 1, 1, 1, 2, 1, 3, 1, 1], [8, 10, 10, 8, 7, 10, 9, 7, 1]]
+
+    def test_json_rows(self):
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/query/batch',
+                                    json={"name": "BatchQueried", "features": [self.rows[0], ",".join(
+                                        str(value) for value in self.rows[1])]})
+        network_outputs = self.network.query_batch(numpy.array(self.rows, dtype=float))
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["status"], "OK")
+        self.assertEqual(response.json["count"], 2)
+        for result, network_output in zip(response.json["results"], network_outputs):
+            self.assertEqual(result["identified_class"], int(numpy.argmax(network_output)))
+            numpy.testing.assert_allclose(result["raw_network_output"], network_output)
+
+    def test_csv_body(self):
+        # Test Instructions
+        csv_body = "\n".join(",".join(str(value) for value in row) for row in self.rows)
+        response = self.client.post('/api/v1/perceptron/query/batch?name=BatchQueried', data=csv_body,
+                                    content_type="text/csv")
+        network_outputs = self.network.query_batch(numpy.array(self.rows, dtype=float))
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["count"], 2)
+        numpy.testing.assert_allclose([result["raw_network_output"] for result in response.json["results"]],
+                                      network_outputs)
+
+    def test_unknown_network(self):
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/query/batch',
+                                    json={"name": "NotANetwork", "features": self.rows})
+        # Assertions
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {"status": APIResponseStatus.NO_RECORD.value})
+
+    def test_rows_not_matching_the_network_inputs(self):
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/query/batch',
+                                    json={"name": "BatchQueried", "features": [[1, 2, 3]]})
+        # Assertions
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {"status": APIResponseStatus.VALUE_ERROR.value})
+
+    def test_missing_name(self):
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/query/batch', data="5,1,1,1,2,1,3,1,1",
+                                    content_type="text/csv")
+        # Assertions
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {"status": APIResponseStatus.MISSING_ARGS.value})
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestEvaluation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.perceptron_api = load_api()
+        cls.network = add_network(cls.perceptron_api, "Evaluated")[0]
+
+    def setUp(self):
+        self.client = self.perceptron_api.app.test_client()
+
+    def expected_evaluation(self, record_filter, roc_curve=False):
+        records = list(self.perceptron_api.records_db.read_documents(record_filter))
+        network_outputs = self.network.query_batch(numpy.array([record["features"] for record in records]))
+        return network_evaluation.evaluate_outputs(network_outputs, [record["target_class"] for record in records],
+                                                   roc_curve)
+
+    def test_testing_records_by_default(self):
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/evaluate', json={"name": "Evaluated"})
+        expected_evaluation = self.expected_evaluation({"training_record": False})
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["filter"], {"training_record": False})
+        self.assertGreater(response.json["evaluation"]["record_count"], 0)
+        self.assertEqual(response.json["evaluation"]["record_count"], expected_evaluation["record_count"])
+        self.assertEqual(response.json["evaluation"]["confusion_matrix"], expected_evaluation["confusion_matrix"])
+        self.assertAlmostEqual(response.json["evaluation"]["accuracy"], expected_evaluation["accuracy"])
+        self.assertNotIn("roc_curve", response.json["evaluation"])
+
+    def test_filter_and_roc_curve(self):
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/evaluate',
+                                    json={"name": "Evaluated", "filter": {"training_record": "true"},
+                                          "roc_curve": True})
+        expected_evaluation = self.expected_evaluation({"training_record": True}, roc_curve=True)
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["filter"], {"training_record": True})
+        self.assertEqual(response.json["evaluation"]["record_count"], expected_evaluation["record_count"])
+        self.assertEqual(len(response.json["evaluation"]["roc_curve"]), 2)
+
+    def test_filter_matching_no_records(self):
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/evaluate',
+                                    json={"name": "Evaluated", "filter": {"record_id": "not a record"}})
+        # Assertions
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {"status": APIResponseStatus.NO_RECORD.value,
+                                         "filter": {"record_id": "not a record"}})
+
+    def test_invalid_filter(self):
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/evaluate', json={"name": "Evaluated", "filter": [1]})
+        # Assertions
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {"status": APIResponseStatus.VALUE_ERROR.value})
+
+    def test_unknown_network_and_missing_name(self):
+        # Test Instructions
+        unknown_response = self.client.post('/api/v1/perceptron/evaluate', json={"name": "NotANetwork"})
+        missing_response = self.client.post('/api/v1/perceptron/evaluate', json={})
+        # Assertions
+        self.assertEqual(unknown_response.status_code, 400)
+        self.assertEqual(unknown_response.json, {"status": APIResponseStatus.NO_RECORD.value})
+        self.assertEqual(missing_response.status_code, 400)
+        self.assertEqual(missing_response.json, {"status": APIResponseStatus.MISSING_ARGS.value})
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestRecords(unittest.TestCase):
+    def setUp(self):
+        self.perceptron_api = load_api()
+        self.client = self.perceptron_api.app.test_client()
+        self.testing_record_ids = {record["record_id"] for record in
+                                   self.perceptron_api.records_db.read_documents({"training_record": False})}
+
+    def test_pages_follow_the_next_after_cursor(self):
+        # Test Instructions
+        record_ids, pages = list(), 0
+        response = self.client.get('/api/v1/perceptron/records?training_record=false&limit=5')
+        while True:
+            pages += 1
+            self.assertEqual(response.status_code, 200)
+            record_ids.extend(record["record_id"] for record in response.json["records"])
+            if "next_after" not in response.json:
+                break
+            response = self.client.get('/api/v1/perceptron/records?training_record=false&limit=5&after={0}'.format(
+                response.json["next_after"]))
+        # Assertions
+        self.assertEqual(pages, len(self.testing_record_ids) // 5 + 1)
+        self.assertEqual(len(record_ids), len(self.testing_record_ids))
+        self.assertEqual(set(record_ids), self.testing_record_ids)
+
+    def test_fields(self):
+        # Test Instructions
+        response = self.client.get('/api/v1/perceptron/records?training_record=false&fields=record_id,target_class')
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["filter"], {"training_record": False})
+        self.assertEqual(len(response.json["records"]), len(self.testing_record_ids))
+        for record in response.json["records"]:
+            self.assertEqual(set(record), {"record_id", "target_class"})
+
+    def test_ndjson(self):
+        # Test Instructions
+        response = self.client.get('/api/v1/perceptron/records?training_record=false&format=ndjson')
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertEqual({record["record_id"] for record in records}, self.testing_record_ids)
+        for record in records:
+            self.assertIn("_id", record)
+            self.assertEqual(len([key for key in record if key.isdigit()]), 9)
+
+    def test_random_sample(self):
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/records/random', json={"max": 3, "training_record": False})
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json["records"]), 3)
+        self.assertTrue({record["record_id"] for record in response.json["records"]}.issubset(
+            self.testing_record_ids))
+
+    def test_invalid_options(self):
+        # Test Instructions
+        responses = [self.client.get('/api/v1/perceptron/records/random?max=0'),
+                     self.client.get('/api/v1/perceptron/records?limit=-1'),
+                     self.client.get('/api/v1/perceptron/records?limit=5&after=not-a-cursor')]
+        missing_response = self.client.get('/api/v1/perceptron/records/random')
+        # Assertions
+        for response in responses:
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json, {"status": APIResponseStatus.VALUE_ERROR.value})
+        self.assertEqual(missing_response.status_code, 400)
+        self.assertEqual(missing_response.json, {"status": APIResponseStatus.MISSING_ARGS.value})
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestMetadata(unittest.TestCase):
+    def setUp(self):
+        self.perceptron_api = load_api()
+        self.client = self.perceptron_api.app.test_client()
+
+    def read_metadata(self, network_name):
+        response = self.client.get('/api/v1/perceptron/metadata?network_id={0}'.format(network_name))
+        self.assertEqual(response.status_code, 200)
+        return response.json["records"]
+
+    def test_create_update_and_delete(self):
+        # Test Instructions
+        create_response = self.client.post('/api/v1/perceptron/create?name=MetadataLifecycle&input=9&hidden=4&output=2'
+                                           '&learningrate=0.1')
+        created_metadata = self.read_metadata("MetadataLifecycle")
+        duplicate_response = self.client.post('/api/v1/perceptron/create?name=MetadataLifecycle&input=9&hidden=4'
+                                              '&output=2&learningrate=0.1')
+        self.perceptron_api.network_writer.flush()
+        update_response = self.client.post('/api/v1/perceptron/update?name=MetadataLifecycle&input=9&hidden=6,3'
+                                           '&output=2&learningrate=0.1')
+        updated_metadata = self.read_metadata("MetadataLifecycle")
+        updated_network = self.perceptron_api.perceptron_cache.peek("MetadataLifecycle")[0]
+        self.perceptron_api.network_writer.flush()
+        delete_response = self.client.post('/api/v1/perceptron/delete?name=MetadataLifecycle')
+        query_response = self.client.post('/api/v1/perceptron/query',
+                                          json={"name": "MetadataLifecycle", "features": SAMPLE_FEATURES})
+        # Assertions
+        self.assertEqual(create_response.status_code, 200)
+        self.assertEqual(create_response.json["status"], "OK")
+        self.assertIn("document_id", create_response.json)
+        self.assertEqual(len(created_metadata), 1)
+        self.assertEqual(duplicate_response.status_code, 400)
+        self.assertEqual(duplicate_response.json, {"status": APIResponseStatus.ERROR_DUPLICATE_ENTRY.value})
+        self.assertEqual(update_response.status_code, 200)
+        self.assertEqual(update_response.json, {"status": "OK", "documents_updated": 1})
+        self.assertEqual(len(updated_metadata), 1)
+        self.assertNotEqual(updated_metadata[0]["saved_data"], created_metadata[0]["saved_data"])
+        self.assertFalse(os.path.exists(created_metadata[0]["saved_data"]))
+        self.assertEqual(updated_network.layers, (9, 6, 3, 2))
+        self.assertEqual(delete_response.status_code, 200)
+        self.assertEqual(delete_response.json, {"status": "OK", "deleted_count": 1})
+        self.assertEqual(self.read_metadata("MetadataLifecycle"), [])
+        self.assertFalse(os.path.exists(updated_metadata[0]["saved_data"]))
+        self.assertEqual(query_response.status_code, 400)
+        self.assertEqual(query_response.json["status"], APIResponseStatus.NO_RECORD.value)
+
+    def test_update_of_a_missing_network_creates_it(self):
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/update?name=MetadataUpdated&input=9&hidden=4&output=2'
+                                    '&learningrate=0.1')
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("document_id", response.json)
+        self.assertNotIn("documents_updated", response.json)
+        self.assertEqual(len(self.read_metadata("MetadataUpdated")), 1)
+
+    def test_invalid_requests(self):
+        # Test Instructions
+        invalid_response = self.client.post('/api/v1/perceptron/create?name=MetadataInvalid&input=9&hidden=4'
+                                            '&output=2&learningrate=fast')
+        missing_response = self.client.post('/api/v1/perceptron/create?name=MetadataInvalid&input=9')
+        delete_response = self.client.post('/api/v1/perceptron/delete?name=MetadataInvalid')
+        # Assertions
+        self.assertEqual(invalid_response.status_code, 400)
+        self.assertEqual(invalid_response.json, {"status": APIResponseStatus.VALUE_ERROR.value})
+        self.assertEqual(missing_response.status_code, 400)
+        self.assertEqual(missing_response.json, {"status": APIResponseStatus.NO_ID_ERROR.value})
+        self.assertEqual(delete_response.status_code, 200)
+        self.assertEqual(delete_response.json, {"status": "OK", "deleted_count": 0})
+        self.assertEqual(self.read_metadata("MetadataInvalid"), [])
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestMicroBatchedQuery(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.perceptron_api = load_api()
+        cls.network = add_network(cls.perceptron_api, "MicroBatched")[0]
+
+    def setUp(self):
+        self.query_batcher = self.perceptron_api.query_batcher
+        self.run_batch, self.window_ms, self.max_batch_size = (self.query_batcher.run_batch,
+                                                               self.query_batcher.window_ms,
+                                                               self.query_batcher.max_batch_size)
+
+    def tearDown(self):
+        self.query_batcher.run_batch, self.query_batcher.window_ms, self.query_batcher.max_batch_size = (
+            self.run_batch, self.window_ms, self.max_batch_size)
+
+    def post_query(self, features, responses, index):
+        responses[index] = self.perceptron_api.app.test_client().post(
+            '/api/v1/perceptron/query', json={"name": "MicroBatched", "features": features})
+
+    def test_concurrent_queries_share_a_batch(self):
+        batch_started, release_batch = threading.Event(), threading.Event()
+
+        def blocking_run_batch(key, features):
+            if not batch_started.is_set():  # holds the first batch until the next one has run
+                batch_started.set()
+                release_batch.wait(10)
+            return self.run_batch(key, features)
+        self.query_batcher.run_batch = blocking_run_batch
+        self.query_batcher.window_ms, self.query_batcher.max_batch_size = 10000, 4
+        feature_rows = ["5,1,1,1,2,1,3,1,1", "8,10,10,8,7,10,9,7,1", "1,1,1,1,2,1,2,1,1", "7,4,6,4,6,1,4,3,1",
+                        "1,2,3"]
+        responses = [None] * len(feature_rows)
+        stats = self.query_batcher.get_stats()
+        # Test Instructions
+        threads = [threading.Thread(target=self.post_query, args=(features, responses, index))
+                   for index, features in enumerate(feature_rows)]
+        threads[0].start()
+        batch_started.wait(10)  # the first query runs alone, the others are queued into the next batch meanwhile
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads[1:]:
+            thread.join(10)
+        release_batch.set()
+        threads[0].join(10)
+        batched_stats = self.query_batcher.get_stats()
+        # Assertions
+        self.assertEqual(batched_stats["queries"] - stats["queries"], 5)
+        self.assertEqual(batched_stats["batches"] - stats["batches"], 2)
+        self.assertEqual(batched_stats["max_batch_size"], max(stats["max_batch_size"], 4))
+        for features, response in zip(feature_rows[:4], responses):
+            network_outputs = self.network.query(numpy.asfarray(features.split(",")))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json["identified_class"], int(numpy.argmax(network_outputs)))
+            numpy.testing.assert_allclose(response.json["raw_network_output"], network_outputs.T)
+        self.assertEqual(responses[4].status_code, 400)
+        self.assertEqual(responses[4].json, {"status": APIResponseStatus.VALUE_ERROR.value})
+
+    def test_unknown_network(self):
+        # Test Instructions
+        response = self.perceptron_api.app.test_client().post(
+            '/api/v1/perceptron/query', json={"name": "NotANetwork", "features": SAMPLE_FEATURES})
+        # Assertions
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {"status": APIResponseStatus.NO_RECORD.value})
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestBulkTraining(unittest.TestCase):
+    def setUp(self):
+        self.perceptron_api = load_api()
+        self.client = self.perceptron_api.app.test_client()
+
+    def wait_for_job(self, job_id, timeout=30):
+        deadline = time.time() + timeout
+        while True:
+            response = self.client.get('/api/v1/perceptron/jobs/{0}'.format(job_id))
+            self.assertEqual(response.status_code, 200)
+            if response.json["job"]["state"] in ("completed", "failed") or time.time() > deadline:
+                return response.json["job"]
+            time.sleep(0.05)
+
+    def test_db_records(self):
+        network, saved_data = add_network(self.perceptron_api, "BulkTrained")
+        training_records = self.perceptron_api.records_db.record_count({"training_record": True})
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/train/bulk',
+                                    json={"name": "BulkTrained", "epochs": 3, "batch_size": 16,
+                                          "validation_split": 0.2, "patience": 1})
+        job = self.wait_for_job(response.json["job_id"])
+        trained_network = self.perceptron_api.perceptron_cache.peek("BulkTrained")[0]
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(job["state"], "completed", job["error"])
+        self.assertEqual(job["description"]["source"], "db")
+        self.assertEqual(job["result"]["network"], saved_data)
+        self.assertEqual(job["result"]["records"] + job["result"]["validation_records"], training_records)
+        self.assertLessEqual(job["result"]["epochs"], 3)
+        self.assertFalse(numpy.array_equal(trained_network.parameters, network.parameters))
+        numpy.testing.assert_array_equal(self.perceptron_api.io_helper.load_pretrained_network(saved_data).parameters,
+                                         trained_network.parameters)
+
+    def test_csv_upload(self):
+        network = add_network(self.perceptron_api, "BulkUploaded")[0]
+        csv_rows = "0.5,0.1,0.1,0.1,0.2,0.1,0.3,0.1,0.1,0\n0.8,0.99,0.99,0.8,0.7,0.99,0.9,0.7,0.1,1\n"
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/train/bulk?name=BulkUploaded&epochs=2',
+                                    data={"file": (io.BytesIO(csv_rows.encode("utf-8")), "records.csv")},
+                                    content_type="multipart/form-data")
+        job = self.wait_for_job(response.json["job_id"])
+        trained_network = self.perceptron_api.perceptron_cache.peek("BulkUploaded")[0]
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(job["state"], "completed", job["error"])
+        self.assertEqual(job["description"]["source"], "upload")
+        self.assertEqual(job["result"]["records"], 2)
+        self.assertEqual((job["processed_records"], job["total_records"]), (4, 4))
+        self.assertFalse(numpy.array_equal(trained_network.parameters, network.parameters))
+
+    def test_invalid_requests(self):
+        add_network(self.perceptron_api, "BulkInvalid")
+        # Test Instructions
+        invalid_responses = [self.client.post('/api/v1/perceptron/train/bulk', json={"name": "BulkInvalid",
+                                                                                     "epochs": 0}),
+                             self.client.post('/api/v1/perceptron/train/bulk', json={"name": "BulkInvalid",
+                                                                                     "validation_split": 1}),
+                             self.client.post('/api/v1/perceptron/train/bulk', json={"name": "BulkInvalid",
+                                                                                     "filter": "training"})]
+        unknown_response = self.client.post('/api/v1/perceptron/train/bulk', json={"name": "NotANetwork"})
+        missing_response = self.client.post('/api/v1/perceptron/train/bulk', json={"epochs": 1})
+        job_response = self.client.get('/api/v1/perceptron/jobs/not-a-job')
+        # Assertions
+        for response in invalid_responses:
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json, {"status": APIResponseStatus.VALUE_ERROR.value})
+        self.assertEqual(unknown_response.status_code, 400)
+        self.assertEqual(unknown_response.json, {"status": APIResponseStatus.NO_RECORD.value})
+        self.assertEqual(missing_response.status_code, 400)
+        self.assertEqual(missing_response.json, {"status": APIResponseStatus.MISSING_ARGS.value})
+        self.assertEqual(job_response.status_code, 400)
+        self.assertEqual(job_response.json, {"status": APIResponseStatus.NO_RECORD.value})
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.perceptron_api = load_api()
+        self.client = self.perceptron_api.app.test_client()
+
+    def read_metrics(self):
+        response = self.client.get('/api/v1/perceptron/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/plain")
+        return dict(line.rsplit(" ", 1) for line in response.get_data(as_text=True).splitlines()
+                    if not line.startswith("#"))
+
+    def test_request_metrics(self):
+        add_network(self.perceptron_api, "Measured")
+        requests_total = 'perceptron_requests_total{route="/api/v1/perceptron/query/batch",status="200"}'
+        forward_count = 'perceptron_request_phase_seconds_count{phase="forward",route="/api/v1/perceptron/query/batch"}'
+        metrics = self.read_metrics()
+        # Test Instructions
+        for _ in range(2):
+            self.client.post('/api/v1/perceptron/query/batch', json={"name": "Measured", "features": [SAMPLE_FEATURES]})
+        updated_metrics = self.read_metrics()
+        # Assertions
+        self.assertEqual(float(updated_metrics[requests_total]) - float(metrics.get(requests_total, 0)), 2)
+        self.assertEqual(float(updated_metrics[forward_count]) - float(metrics.get(forward_count, 0)), 2)
+        self.assertIn('perceptron_request_duration_seconds_bucket{route="/api/v1/perceptron/query/batch",le="+Inf"}',
+                      updated_metrics)
+        for gauge in ("perceptron_network_cache_hits", "perceptron_metadata_cache_hits",
+                      "perceptron_write_behind_written", "perceptron_query_batcher_queries"):
+            self.assertIn(gauge, updated_metrics)
+
+    def test_disabled_metrics(self):
+        self.perceptron_api.metrics.enabled = False
+        # Test Instructions
+        try:
+            response = self.client.get('/api/v1/perceptron/metrics')
+        finally:
+            self.perceptron_api.metrics.enabled = True
+        # Assertions
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json, {"status": APIResponseStatus.METRICS_DISABLED.value})
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestOnlineTraining(unittest.TestCase):
+    def setUp(self):
+        self.perceptron_api = load_api()
+        self.client = self.perceptron_api.app.test_client()
+        # enabled for this test only, set up as by the API when "online_training_enabled" is set
+        self.online_trainer = self.perceptron_api.online_training_helper.OnlineTrainer(
+            self.perceptron_api.apply_training_batch, checkpoint=self.perceptron_api.checkpoint_neural_network,
+            batch_size=4, max_delay_ms=10000, checkpoint_samples=4, checkpoint_interval_seconds=0)
+        self.perceptron_api.online_trainer = self.online_trainer
+
+    def tearDown(self):
+        self.perceptron_api.online_trainer = None
+        self.online_trainer.shutdown()
+
+    def train(self, network_name, features, target):
+        return self.client.post('/api/v1/perceptron/train',
+                                json={"name": network_name, "features": features, "target": target})
+
+    def test_samples_are_applied_on_commit(self):
+        network, saved_data = add_network(self.perceptron_api, "OnlineCommitted")
+        feature_rows, targets = [SAMPLE_FEATURES, "8,10,10,8,7,10,9,7,1"], [0, 1]
+        expected_network = network.copy()
+        expected_network.train_batch(numpy.array([numpy.asfarray(features.split(",")) for features in feature_rows]),
+                                     numpy.array(targets), batch_size=2)
+        # Test Instructions
+        responses = [self.train("OnlineCommitted", features, target) for features, target in zip(feature_rows, targets)]
+        query_response = self.client.post('/api/v1/perceptron/query',
+                                          json={"name": "OnlineCommitted", "features": SAMPLE_FEATURES})
+        commit_response = self.client.post('/api/v1/perceptron/commit?name=OnlineCommitted')
+        self.perceptron_api.network_writer.flush()
+        # Assertions
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        self.assertEqual([response.json for response in responses], [{"status": "OK", "pending_samples": 1},
+                                                                     {"status": "OK", "pending_samples": 2}])
+        numpy.testing.assert_allclose(query_response.json["raw_network_output"],
+                                      network.query(numpy.asfarray(SAMPLE_FEATURES.split(","))).T)
+        self.assertEqual(commit_response.status_code, 200)
+        self.assertEqual(commit_response.json, {"status": "OK", "network": saved_data})
+        self.assertEqual(self.online_trainer.pending("OnlineCommitted"), 0)
+        numpy.testing.assert_allclose(self.perceptron_api.io_helper.load_pretrained_network(saved_data).parameters,
+                                      expected_network.parameters)
+
+    def test_full_batches_are_checkpointed(self):
+        saved_data = add_network(self.perceptron_api, "OnlineCheckpointed")[1]
+        # Test Instructions
+        responses = [self.train("OnlineCheckpointed", SAMPLE_FEATURES, 0) for _ in range(4)]
+        deadline = time.time() + 10
+        while not self.online_trainer.get_stats()["checkpoints"] and time.time() < deadline:
+            time.sleep(0.01)
+        cached_network = self.perceptron_api.perceptron_cache.peek("OnlineCheckpointed")
+        # Assertions
+        self.assertEqual([response.json["pending_samples"] for response in responses], [1, 2, 3, 4])
+        self.assertEqual(self.online_trainer.get_stats()["applied"], 4)
+        self.assertEqual(self.online_trainer.get_stats()["checkpoints"], 1)
+        self.assertIsNotNone(cached_network)
+        numpy.testing.assert_array_equal(self.perceptron_api.io_helper.load_pretrained_network(saved_data).parameters,
+                                         cached_network[0].parameters)
+
+    def test_delete_discards_pending_samples(self):
+        add_network(self.perceptron_api, "OnlineDeleted")
+        # Test Instructions
+        train_response = self.train("OnlineDeleted", SAMPLE_FEATURES, 1)
+        delete_response = self.client.post('/api/v1/perceptron/delete?name=OnlineDeleted')
+        # Assertions
+        self.assertEqual(train_response.json, {"status": "OK", "pending_samples": 1})
+        self.assertEqual(delete_response.json, {"status": "OK", "deleted_count": 1})
+        self.assertEqual(self.online_trainer.pending("OnlineDeleted"), 0)
+        self.assertEqual(self.online_trainer.get_stats()["discarded"], 1)
+
+    def test_exit_checkpoint_skips_a_removed_directory(self):
+        directory = tempfile.mkdtemp()
+        saved_data = os.path.join(directory, "OnlineRemoved_perceptron_network.bin")
+        self.perceptron_api.io_helper.save_pretrained_network(NeuralNetwork(9, 4, 2, 0.1, seed=3), saved_data)
+        self.perceptron_api.network_metadata.create("OnlineRemoved", saved_data)
+        self.online_trainer.checkpoint_samples = 0
+        for _ in range(4):
+            self.train("OnlineRemoved", SAMPLE_FEATURES, 1)
+        self.online_trainer.flush("OnlineRemoved")
+        shutil.rmtree(directory)  # i.e. a temporary directory removed before the exit hooks run
+        # Test Instructions
+        self.online_trainer.shutdown()
+        # Assertions
+        self.assertEqual(self.online_trainer.get_stats()["checkpoints"], 1)
+        self.assertEqual(self.online_trainer.get_stats()["checkpoint_failures"], 0)
+        self.assertFalse(os.path.exists(directory))
+        os.makedirs(directory)  # the network is saved to its directory when removed from the cache
+        self.client.post('/api/v1/perceptron/delete?name=OnlineRemoved')
+        self.perceptron_api.network_writer.flush()
+        shutil.rmtree(directory)
+
+    def test_invalid_samples(self):
+        add_network(self.perceptron_api, "OnlineInvalid")
+        # Test Instructions
+        invalid_response = self.train("OnlineInvalid", SAMPLE_FEATURES, 2)
+        unknown_response = self.train("NotANetwork", SAMPLE_FEATURES, 1)
+        # Assertions
+        self.assertEqual(invalid_response.status_code, 400)
+        self.assertEqual(invalid_response.json, {"status": APIResponseStatus.VALUE_ERROR.value})
+        self.assertEqual(unknown_response.status_code, 400)
+        self.assertEqual(unknown_response.json, {"status": APIResponseStatus.NO_RECORD.value})
+        self.assertEqual(self.online_trainer.get_stats()["submitted"], 0)
+
+
+@unittest.skipIf(mongomock is None or TestClient is None, "mongomock or starlette is not installed")
+class TestASGI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.perceptron_api = load_api()
+        import perceptron_asgi
+        # not used as a context manager, as the lifespan shutdown would stop the shared network thread pool
+        cls.client = TestClient(perceptron_asgi.app)
+        cls.network = add_network(cls.perceptron_api, "ServedAsync")[0]
+
+    def test_query(self):
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/query',
+                                    json={"name": "ServedAsync", "features": SAMPLE_FEATURES})
+        invalid_response = self.client.post('/api/v1/perceptron/query', content="not json")
+        network_outputs = self.network.query(numpy.asfarray(SAMPLE_FEATURES.split(",")))
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["identified_class"], int(numpy.argmax(network_outputs)))
+        numpy.testing.assert_allclose(response.json()["raw_network_output"], network_outputs.T)
+        self.assertEqual(invalid_response.status_code, 400)
+        self.assertEqual(invalid_response.json(), {"status": APIResponseStatus.ERROR.value})
+
+    def test_train(self):
+        network = add_network(self.perceptron_api, "TrainedAsync")[0]
+        # Test Instructions
+        response = self.client.post('/api/v1/perceptron/train',
+                                    json={"name": "TrainedAsync", "features": SAMPLE_FEATURES, "target": 1})
+        missing_response = self.client.post('/api/v1/perceptron/train',
+                                            json={"name": "TrainedAsync", "features": SAMPLE_FEATURES})
+        trained_network = self.perceptron_api.perceptron_cache.peek("TrainedAsync")[0]
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "OK"})
+        self.assertFalse(numpy.array_equal(trained_network.parameters, network.parameters))
+        self.assertEqual(missing_response.status_code, 400)
+        self.assertEqual(missing_response.json(), {"status": APIResponseStatus.MISSING_ARGS.value})
+
+    def test_query_batch(self):
+        # Test Instructions
+        json_response = self.client.post('/api/v1/perceptron/query/batch',
+                                         json={"name": "ServedAsync", "features": [SAMPLE_FEATURES] * 2})
+        csv_response = self.client.post('/api/v1/perceptron/query/batch?name=ServedAsync',
+                                        content="\n".join([SAMPLE_FEATURES] * 3), headers={"Content-Type": "text/csv"})
+        network_outputs = self.network.query(numpy.asfarray(SAMPLE_FEATURES.split(",")))
+        # Assertions
+        self.assertEqual(json_response.status_code, 200)
+        self.assertEqual(json_response.json()["count"], 2)
+        self.assertEqual(csv_response.status_code, 200)
+        self.assertEqual(csv_response.json()["count"], 3)
+        for result in json_response.json()["results"] + csv_response.json()["results"]:
+            numpy.testing.assert_allclose(result["raw_network_output"], network_outputs.ravel())
+
+    def test_flask_routes(self):
+        # Test Instructions
+        response = self.client.get('/api/v1/perceptron/metadata?network_id=ServedAsync')
+        records_response = self.client.get('/api/v1/perceptron/records?training_record=false&limit=2')
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([record["network_id"] for record in response.json()["records"]], ["ServedAsync"])
+        self.assertEqual(records_response.status_code, 200)
+        self.assertEqual(len(records_response.json()["records"]), 2)
+        self.assertIn("next_after", records_response.json())
+
+
+if __name__ == '__main__':
+    unittest.main()
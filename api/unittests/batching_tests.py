@@ -0,0 +1,74 @@
+import threading
+import time
+import unittest
+import numpy
+from APIHelpers.batching_helper import QueryMicroBatcher, indices_by_length
+
+
+class FakeBatchNetwork:
+    def __init__(self, delay=0.0):
+        # doubles every feature value, recording the size of each forward pass
+        self.delay = delay
+        self.batch_sizes = list()
+        self.lock = threading.Lock()
+
+    def run_batch(self, key, features):
+        if key != "SampleNet_0":
+            return None
+        if features.shape[1] != 3:
+            raise ValueError("expected 3 features")
+        with self.lock:
+            self.batch_sizes.append(features.shape[0])
+        time.sleep(self.delay)
+        return features * 2
+
+
+class TestQueryMicroBatcher(unittest.TestCase):
+    def test_single_query_is_not_delayed(self):
+        network = FakeBatchNetwork()
+        batcher = QueryMicroBatcher(network.run_batch, window_ms=1000)
+        # Test Instructions
+        start_time = time.perf_counter()
+        outputs = batcher.query("SampleNet_0", [1.0, 2.0, 3.0])
+        elapsed = time.perf_counter() - start_time
+        # Assertions
+        numpy.testing.assert_allclose(outputs, [2.0, 4.0, 6.0])
+        self.assertLess(elapsed, 0.5)
+        self.assertIsNone(batcher.query("SampleNet_1", [1.0, 2.0, 3.0]))
+        with self.assertRaises(ValueError):
+            batcher.query("SampleNet_0", [1.0, 2.0])
+
+    def test_concurrent_queries_share_forward_passes(self):
+        network = FakeBatchNetwork(delay=0.01)
+        batcher = QueryMicroBatcher(network.run_batch, window_ms=20, max_batch_size=16)
+        results = dict()
+
+        def query(index):
+            results[index] = batcher.query("SampleNet_0", [index, index + 1, index + 2])
+        # Test Instructions
+        threads = [threading.Thread(target=query, args=(i,)) for i in range(64)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Assertions
+        for index in range(64):
+            numpy.testing.assert_allclose(results[index], [2 * index, 2 * index + 2, 2 * index + 4])
+        self.assertEqual(sum(network.batch_sizes), 64)
+        self.assertLess(len(network.batch_sizes), 64)
+        self.assertLessEqual(max(network.batch_sizes), 16)
+        self.assertEqual(batcher.get_stats()["queries"], 64)
+
+
+class TestIndicesByLength(unittest.TestCase):
+    def test_rows_are_grouped_in_order(self):
+        rows = [numpy.zeros(3), numpy.zeros(2), numpy.zeros(3), numpy.zeros(3)]
+        # Test Instructions
+        indices = indices_by_length(rows)
+        # Assertions
+        self.assertEqual(indices, {3: [0, 2, 3], 2: [1]})
+        self.assertEqual(indices_by_length(list()), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+from APIHelpers import benchmark_helper
+
+
+class TestBenchmarkHelper(unittest.TestCase):
+    def test_measure(self):
+        calls = list()
+        # Test Instructions
+        timing = benchmark_helper.measure(lambda: calls.append(1), repeat=4, number=3, warmup=2)
+        # Assertions
+        self.assertEqual(len(calls), 2 + 4 * 3)
+        self.assertEqual((timing["repeat"], timing["number"]), (4, 3))
+        self.assertLessEqual(timing["min"], timing["median"])
+        self.assertGreaterEqual(timing["stdev"], 0.0)
+
+    def test_compare_results(self):
+        baseline = {"benchmarks": {"nn.query": {"min": 1.0}, "nn.train": {"min": 2.0}, "io.save": {"min": 1.0}}}
+        results = {"benchmarks": {"nn.query": {"min": 1.2}, "nn.train": {"min": 3.0}, "cache.read": {"min": 1.0}}}
+        # Test Instructions
+        comparisons = benchmark_helper.compare_results(results, baseline, tolerance=0.25)
+        # Assertions
+        self.assertEqual([comparison["name"] for comparison in comparisons], ["nn.query", "nn.train"])
+        self.assertFalse(comparisons[0]["regression"])
+        self.assertTrue(comparisons[1]["regression"])
+        self.assertAlmostEqual(comparisons[1]["ratio"], 1.5)
+
+    def test_results_round_trip(self):
+        results = {"environment": benchmark_helper.environment_info(), "benchmarks": {"nn.query": {"min": 1.0}}}
+        with tempfile.TemporaryDirectory() as directory:
+            results_file = os.path.join(directory, "results.json")
+            # Test Instructions
+            missing_results = benchmark_helper.load_results(results_file)
+            benchmark_helper.save_results(results, results_file)
+            loaded_results = benchmark_helper.load_results(results_file)
+        # Assertions
+        self.assertIsNone(missing_results)
+        self.assertEqual(loaded_results, results)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+import unittest
+from unittest import mock
+from APIHelpers import cache_helper
+from APIHelpers.cache_helper import GlobalCacheHelper
+
+
+class FakeNetwork:
+    def __init__(self, updates=0):
+        # both counters are always updated together, a reader seeing them differ has observed a torn write
+        self.first = updates
+        self.second = updates
+
+    def train(self):
+        self.first += 1
+        time.sleep(0)  # yield mid-update to widen the race window
+        self.second += 1
+
+
+class CacheStressHarness:
+    def __init__(self, max_size, network_count):
+        """
+        Hammers a GlobalCacheHelper from many threads, using an in-memory dict in place of the files written by
+        `save_pretrained_network`, so evictions and reloads round-trip through the fake "disk".
+        """
+        self.cache = GlobalCacheHelper(max_size=max_size)
+        self.network_names = ["StressNet_{0}".format(i) for i in range(network_count)]
+        self.disk = {name: 0 for name in self.network_names}
+        self.disk_lock = threading.Lock()
+        self.expected = {name: 0 for name in self.network_names}
+        self.expected_lock = threading.Lock()
+        self.torn_reads = 0
+
+    def save(self, network, path):
+        with self.disk_lock:
+            self.disk[path] = network.first
+
+    def load(self, name):
+        with self.disk_lock:
+            return FakeNetwork(self.disk[name]), name
+
+    def trainer(self, iterations, seed):
+        rng = random.Random(seed)
+        for _ in range(iterations):
+            name = rng.choice(self.network_names)
+            with self.cache.checkout(name, lambda: self.load(name), write=True) as entry:
+                entry[0].train()
+            with self.expected_lock:
+                self.expected[name] += 1
+
+    def reader(self, iterations, seed):
+        rng = random.Random(seed)
+        for _ in range(iterations):
+            name = rng.choice(self.network_names)
+            with self.cache.checkout(name, lambda: self.load(name)) as entry:
+                if entry[0].first != entry[0].second:
+                    self.torn_reads += 1
+
+    def run(self, trainers, readers, iterations):
+        with mock.patch.object(cache_helper, "save_pretrained_network", self.save):
+            threads = [threading.Thread(target=self.trainer, args=(iterations, i)) for i in range(trainers)]
+            threads += [threading.Thread(target=self.reader, args=(iterations, -i)) for i in range(readers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.cache.flush()
+
+
+class TestCacheConcurrency(unittest.TestCase):
+    def test_no_lost_training_updates_under_eviction(self):
+        harness = CacheStressHarness(max_size=3, network_count=8)
+        # Test Instructions
+        harness.run(trainers=8, readers=8, iterations=400)
+        # Assertions
+        self.assertEqual(harness.disk, harness.expected)
+        self.assertEqual(harness.torn_reads, 0)
+        self.assertEqual(harness.cache.get_stack(), [])
+
+    def test_no_lost_training_updates_single_network(self):
+        harness = CacheStressHarness(max_size=10, network_count=1)
+        # Test Instructions
+        harness.run(trainers=16, readers=4, iterations=250)
+        # Assertions
+        self.assertEqual(harness.disk["StressNet_0"], 16 * 250)
+        self.assertEqual(harness.torn_reads, 0)
+
+    def test_concurrent_misses_load_once(self):
+        test_cache = GlobalCacheHelper(max_size=10)
+        load_calls = list()
+
+        def loader():
+            load_calls.append(1)
+            time.sleep(0.05)
+            return "Network_0", "./bin/samplenet_0.bin"
+        # Test Instructions
+        threads = [threading.Thread(target=test_cache.get_or_load, args=("SampleNet_0", loader)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Assertions
+        self.assertEqual(len(load_calls), 1)
+        self.assertEqual(test_cache.read("SampleNet_0"), ("Network_0", "./bin/samplenet_0.bin"))
+
+    def test_writer_excludes_readers(self):
+        lock = cache_helper.ReadWriteLock()
+        events = list()
+
+        def reader():
+            with lock.read_locked():
+                events.append("read")
+        # Test Instructions
+        with lock.write_locked():
+            thread = threading.Thread(target=reader)
+            thread.start()
+            time.sleep(0.05)
+            events.append("write_done")
+        thread.join()
+        # Assertions
+        self.assertEqual(events, ["write_done", "read"])
+
+
+if __name__ == '__main__':
+    unittest.main()
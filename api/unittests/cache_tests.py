@@ -159,6 +159,36 @@ class TestCacheSystem(unittest.TestCase):
         for k in range(len(calculated_stack)):
             self.assertEqual(calculated_stack[k][0], expected_stack[k])
 
+    def test_cache_stats(self):
+        test_cache = GlobalCacheHelper(max_size=5)
+        # Test Instructions
+        for i in range(8):
+            test_cache.add(i, i)
+        test_cache.read(7)
+        test_cache.read(6)
+        test_cache.read(0)  # evicted entry
+        test_cache.read("missing")
+        test_cache.pop(7)
+        # Assertions
+        stats = test_cache.get_stats()
+        self.assertEqual(stats["size"], 4)
+        self.assertEqual(stats["max_size"], 5)
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["evictions"], 3)
+
+    def test_cache_peek(self):
+        test_cache = GlobalCacheHelper(max_size=5)
+        # Test Instructions
+        for i in range(3):
+            test_cache.add(i, "Network_{0}".format(i))
+        peeked_values = [test_cache.peek(0), test_cache.peek("missing")]
+        # Assertions
+        self.assertEqual(peeked_values, ["Network_0", None])
+        self.assertEqual([key for key, _ in test_cache.get_stack()], [0, 1, 2])  # access order is unchanged
+        self.assertEqual(test_cache.get_stats()["hits"], 0)
+        self.assertEqual(test_cache.get_stats()["misses"], 0)
+
 
 if __name__ == '__main__':
     unittest.main()
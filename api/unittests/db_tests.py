@@ -0,0 +1,97 @@
+import re
+import time
+import unittest
+from unittest import mock
+from APIHelpers import db_helper
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+class SlowCollection:
+    # stands in for a pymongo collection, taking 20ms to count documents
+    def count_documents(self, document):
+        time.sleep(0.02)
+        return 1
+
+
+class TestQueryPlanning(unittest.TestCase):
+    def test_prefix_match_is_anchored(self):
+        # Test Instructions
+        condition = db_helper.prefix_match("BC_Sample.Train_")
+        # Assertions
+        self.assertEqual(condition, {"$regex": "^BC_Sample\\.Train_"})
+        self.assertTrue(re.search(condition["$regex"], "BC_Sample.Train_12"))
+        self.assertFalse(re.search(condition["$regex"], "Old_BC_Sample.Train_12"))
+
+    def test_summarize_plan(self):
+        explain_output = {"queryPlanner": {"winningPlan": {"stage": "FETCH",
+                                                           "inputStage": {"stage": "IXSCAN",
+                                                                          "indexName": "network_id_1"}}},
+                          "executionStats": {"nReturned": 1, "totalKeysExamined": 1, "totalDocsExamined": 1,
+                                             "executionTimeMillis": 0}}
+        # Test Instructions
+        summary = db_helper.summarize_plan(explain_output)
+        # Assertions
+        self.assertEqual(summary, {"stages": ["FETCH", "IXSCAN"], "indexes": ["network_id_1"],
+                                   "collection_scan": False, "returned": 1, "keys_examined": 1,
+                                   "documents_examined": 1, "milliseconds": 0})
+        self.assertTrue(db_helper.summarize_plan({"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}})
+                        ["collection_scan"])
+
+    def test_slow_queries_are_logged_without_values(self):
+        records_db = db_helper.DBConnection("localhost", 27017, "PerceptronAPI", "records", slow_query_ms=10)
+        records_db.collection = SlowCollection()
+        # Test Instructions
+        records_db.record_exists({"training_record": True, "record_id": {"$in": ["BC_1", "BC_2"]}})
+        records_db.slow_query_ms = 1000
+        records_db.record_exists({"training_record": True})
+        # Assertions
+        slow_queries = records_db.get_slow_queries()
+        self.assertEqual(len(slow_queries), 1)
+        self.assertEqual(slow_queries[0]["operation"], "count")
+        self.assertEqual(slow_queries[0]["collection"], "PerceptronAPI.records")
+        self.assertEqual(slow_queries[0]["filter"], {"training_record": "?", "record_id": {"$in": ["?", "?"]}})
+        self.assertGreaterEqual(slow_queries[0]["milliseconds"], 10)
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestWriteListeners(unittest.TestCase):
+    def setUp(self):
+        self.records_db = db_helper.DBConnection("localhost", 27017, "ListenerTests", "records")
+        # the in-memory collection is wrapped to count the db round-trips
+        self.records_db.collection = mock.Mock(wraps=mongomock.MongoClient()["ListenerTests"]["records"])
+        self.records_db.write_documents([{"record_id": "BC_{0}".format(i), "target_class": i % 2} for i in range(4)])
+        self.notifications = list()
+        self.listener = lambda documents, match: self.notifications.append((documents, match))
+        self.records_db.add_write_listener(self.listener)
+
+    def tearDown(self):
+        self.records_db.remove_write_listener(self.listener)
+
+    def test_removals_report_their_filter(self):
+        # Test Instructions
+        deleted_count = self.records_db.remove_documents({"target_class": 1})
+        self.records_db.remove_documents({"target_class": 2})
+        # Assertions
+        self.assertEqual(deleted_count, 2)
+        self.assertEqual(self.notifications, [(None, {"target_class": 1})])
+        self.assertFalse(self.records_db.collection.find.called)
+
+    def test_updates_report_both_documents_in_one_round_trip(self):
+        # Test Instructions
+        modified_count = self.records_db.update_document({"record_id": "BC_1"}, {"target_class": 0})
+        unchanged_count = self.records_db.update_document({"record_id": "BC_1"}, {"target_class": 0})
+        # Assertions
+        self.assertEqual((modified_count, unchanged_count), (1, 0))
+        self.assertEqual(len(self.notifications), 1)
+        previous_document, updated_document = self.notifications[0][0]
+        self.assertEqual((previous_document["target_class"], updated_document["target_class"]), (1, 0))
+        self.assertEqual(updated_document, self.records_db.read_document({"record_id": "BC_1"}))
+        self.assertEqual(self.records_db.collection.find_one_and_update.call_count, 2)
+        self.assertEqual(self.records_db.collection.find_one.call_count, 1)  # only by read_document
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import numpy
+import network_evaluation
+from APIHelpers import io_helper
+from neural_network import NeuralNetwork, NetworkTester
+
+
+def pairwise_auc(scores, labels):
+    # probability that a random positive record scores above a random negative one (ties count half)
+    positive_scores, negative_scores = scores[labels], scores[~labels]
+    wins = (positive_scores[:, None] > negative_scores[None, :]).sum()
+    ties = (positive_scores[:, None] == negative_scores[None, :]).sum()
+    return (wins + 0.5 * ties) / float(len(positive_scores) * len(negative_scores))
+
+
+class TestNetworkEvaluation(unittest.TestCase):
+    def test_metrics_match_per_record_counts(self):
+        rng = numpy.random.RandomState(3)
+        network_outputs = rng.uniform(0, 1, (200, 3))
+        target_classes = rng.randint(0, 3, 200)
+        # Test Instructions
+        results = network_evaluation.evaluate_outputs(network_outputs, target_classes)
+        # Assertions
+        identified_classes = [int(numpy.argmax(outputs)) for outputs in network_outputs]
+        self.assertEqual(results["record_count"], 200)
+        self.assertAlmostEqual(results["accuracy"], numpy.mean(numpy.array(identified_classes) == target_classes))
+        for expected in range(3):
+            for identified in range(3):
+                count = sum(1 for t, i in zip(target_classes, identified_classes) if t == expected and i == identified)
+                self.assertEqual(results["confusion_matrix"][expected][identified], count)
+            self.assertAlmostEqual(results["roc_auc"][expected],
+                                   pairwise_auc(network_outputs[:, expected], target_classes == expected))
+
+    def test_roc_with_tied_scores(self):
+        scores = numpy.array([0.9, 0.9, 0.5, 0.5, 0.1, 0.1])
+        labels = numpy.array([True, False, True, True, False, False])
+        # Test Instructions
+        false_positive_rate, true_positive_rate = network_evaluation.roc_curve(scores, labels)
+        # Assertions
+        numpy.testing.assert_allclose(false_positive_rate, [0.0, 1 / 3.0, 1 / 3.0, 1.0])
+        numpy.testing.assert_allclose(true_positive_rate, [0.0, 1 / 3.0, 1.0, 1.0])
+        results = network_evaluation.evaluate_outputs(numpy.c_[1 - scores, scores], labels.astype(int), True)
+        self.assertAlmostEqual(results["roc_auc"][1], pairwise_auc(scores, labels))
+        self.assertEqual(len(results["roc_curve"]), 2)
+
+    def test_single_class_has_no_auc(self):
+        # Test Instructions
+        results = network_evaluation.evaluate_outputs([[0.9, 0.1], [0.8, 0.2]], [0, 0])
+        # Assertions
+        self.assertEqual(results["roc_auc"], [None, None])
+        self.assertEqual(results["precision"], [1.0, 0.0])
+
+    def test_network_tester(self):
+        training_data = io_helper.read_data_csv("./sample_data/bc_train.csv")
+        testing_data = io_helper.read_data_csv("./sample_data/bc_test.csv")
+        numpy.random.seed(0)
+        # Test Instructions
+        tester = NetworkTester(training_data, testing_data, 9, 4, 2, 0.5)
+        # Assertions
+        expected = numpy.mean([int(record[1]) == numpy.argmax(tester.neural_network.query(numpy.asfarray(record[0])))
+                               for record in testing_data])
+        self.assertAlmostEqual(tester.test(), expected)
+        self.assertIsInstance(tester.neural_network, NeuralNetwork)
+
+
+if __name__ == '__main__':
+    unittest.main()
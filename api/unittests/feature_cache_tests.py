@@ -0,0 +1,150 @@
+import shutil
+import tempfile
+import unittest
+import numpy
+from APIHelpers.feature_cache_helper import FeatureMatrixCache, filter_may_match, filters_may_overlap
+
+
+class FakeRecordsDB:
+    def __init__(self, documents):
+        # stands in for a DBConnection, counting how often the records are read
+        self.namespace = ("localhost", 27017, "PerceptronAPI.records")
+        self.documents = documents
+        self.listeners = list()
+        self.reads = 0
+
+    def add_write_listener(self, listener):
+        self.listeners.append(listener)
+
+    def read_documents(self, match, projection=None):
+        self.reads += 1
+        return [document for document in self.documents if filter_may_match(match, document)]
+
+    def write_document(self, document):
+        self.documents.append(document)
+        for listener in self.listeners:
+            listener([document])
+
+    def remove_documents(self, match):
+        self.documents = [document for document in self.documents if not filter_may_match(match, document)]
+        for listener in self.listeners:
+            listener(None, match)
+
+
+def sample_documents(training_record, record_count=5):
+    return [{"_id": i, "features": [i / 10, i / 20], "target_class": i % 2, "training_record": training_record,
+             "record_id": "BC_Sample_{0}_{1}".format("Train" if training_record else "Test", i)}
+            for i in range(record_count)]
+
+
+class TestFeatureMatrixCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.records_db = FakeRecordsDB(sample_documents(True) + sample_documents(False))
+        self.feature_cache = FeatureMatrixCache(self.directory, max_size=2)
+        self.feature_cache.watch(self.records_db)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_repeated_reads_skip_db(self):
+        # Test Instructions
+        features, target_classes = self.feature_cache.read(self.records_db, {"training_record": True}, 2)
+        cached_features, cached_target_classes = self.feature_cache.read(self.records_db,
+                                                                         {"training_record": True}, 2)
+        # Assertions
+        self.assertEqual(self.records_db.reads, 1)
+        self.assertEqual(features.dtype, numpy.float32)
+        self.assertEqual(features.shape, (5, 2))
+        numpy.testing.assert_allclose(features[:, 0], [0.0, 0.1, 0.2, 0.3, 0.4], rtol=1e-6)
+        self.assertEqual(target_classes.tolist(), [0, 1, 0, 1, 0])
+        self.assertIs(cached_features, features)
+        self.assertIs(cached_target_classes, target_classes)
+        self.assertFalse(cached_features.flags.writeable)
+        self.assertEqual(self.feature_cache.get_stats()["hits"], 1)
+
+    def test_only_matching_writes_invalidate(self):
+        self.feature_cache.read(self.records_db, {"training_record": True}, 2)
+        self.feature_cache.read(self.records_db, {"training_record": False}, 2)
+        # Test Instructions
+        self.records_db.write_document({"_id": 5, "features": [0.9, 0.9], "target_class": 1,
+                                        "training_record": False})
+        training_features, _ = self.feature_cache.read(self.records_db, {"training_record": True}, 2)
+        testing_features, _ = self.feature_cache.read(self.records_db, {"training_record": False}, 2)
+        # Assertions
+        self.assertEqual(self.records_db.reads, 3)
+        self.assertEqual(training_features.shape, (5, 2))
+        self.assertEqual(testing_features.shape, (6, 2))
+        self.assertEqual(self.feature_cache.get_stats()["invalidations"], 1)
+
+    def test_only_overlapping_removals_invalidate(self):
+        self.feature_cache.read(self.records_db, {"training_record": True}, 2)
+        self.feature_cache.read(self.records_db, {"training_record": False}, 2)
+        # Test Instructions
+        self.records_db.remove_documents({"training_record": False, "target_class": 1})
+        training_features, _ = self.feature_cache.read(self.records_db, {"training_record": True}, 2)
+        testing_features, _ = self.feature_cache.read(self.records_db, {"training_record": False}, 2)
+        # Assertions
+        self.assertEqual(self.records_db.reads, 3)
+        self.assertEqual(training_features.shape, (5, 2))
+        self.assertEqual(testing_features.shape, (3, 2))
+        self.assertEqual(self.feature_cache.get_stats()["invalidations"], 1)
+
+    def test_least_recently_read_filter_is_evicted(self):
+        # Test Instructions
+        for match in ({"training_record": True}, {"training_record": False}, {"target_class": 1}):
+            self.feature_cache.read(self.records_db, match, 2)
+        self.feature_cache.read(self.records_db, {"training_record": True}, 2)
+        # Assertions
+        self.assertEqual(self.records_db.reads, 4)
+        self.assertEqual(self.feature_cache.get_stats()["size"], 2)
+
+    def test_writes_of_other_processes_invalidate(self):
+        # a second cache and connection sharing the directory and collection stand in for another worker process
+        other_records_db = FakeRecordsDB(self.records_db.documents)
+        other_feature_cache = FeatureMatrixCache(self.directory, max_size=2)
+        other_feature_cache.watch(other_records_db)
+        self.feature_cache.read(self.records_db, {"training_record": True}, 2)
+        other_feature_cache.read(other_records_db, {"training_record": True}, 2)
+        # Test Instructions
+        other_records_db.write_document({"_id": 5, "features": [0.9, 0.9], "target_class": 1,
+                                         "training_record": True})
+        training_features, _ = self.feature_cache.read(self.records_db, {"training_record": True}, 2)
+        other_training_features, _ = other_feature_cache.read(other_records_db, {"training_record": True}, 2)
+        # Assertions
+        self.assertEqual(self.records_db.reads, 2)
+        self.assertEqual(other_records_db.reads, 2)
+        self.assertEqual(training_features.shape, (6, 2))
+        self.assertEqual(other_training_features.shape, (6, 2))
+        self.assertEqual(self.feature_cache.get_stats()["invalidations"], 1)
+
+
+class TestFilterMatching(unittest.TestCase):
+    def test_filter_may_match(self):
+        document = {"record_id": "BC_Sample_Train_4", "training_record": True, "target_class": 0}
+        # Assertions
+        self.assertTrue(filter_may_match({"training_record": True}, document))
+        self.assertFalse(filter_may_match({"training_record": False}, document))
+        self.assertTrue(filter_may_match({"record_id": {"$regex": "^BC_Sample_Train_"}}, document))
+        self.assertFalse(filter_may_match({"record_id": {"$regex": "^BC_Sample_Test_"}}, document))
+        self.assertFalse(filter_may_match({"$and": [{"target_class": {"$in": [1]}}]}, document))
+        self.assertFalse(filter_may_match({"missing_field": "value"}, document))
+        # conditions which are not evaluated are assumed to match
+        self.assertTrue(filter_may_match({"$or": [{"target_class": 1}]}, document))
+        self.assertTrue(filter_may_match({"target_class": {"$gt": 1}}, document))
+
+    def test_filters_may_overlap(self):
+        # Assertions
+        self.assertTrue(filters_may_overlap({"training_record": True}, {"training_record": True, "target_class": 1}))
+        self.assertFalse(filters_may_overlap({"training_record": True}, {"training_record": False}))
+        self.assertFalse(filters_may_overlap({"target_class": {"$in": [0]}}, {"target_class": 1}))
+        self.assertFalse(filters_may_overlap({"record_id": "BC_Sample_Test_1"},
+                                             {"record_id": {"$regex": "^BC_Sample_Train_"}}))
+        # filters on different fields, and pairs of conditions which are not evaluated, are assumed to overlap
+        self.assertTrue(filters_may_overlap({"training_record": True}, {"target_class": 1}))
+        self.assertTrue(filters_may_overlap({"target_class": {"$in": [0]}}, {"target_class": {"$in": [1]}}))
+        self.assertTrue(filters_may_overlap({"training_record": True}, {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+import dill
+import numpy
+from APIHelpers import io_helper
+from neural_network import NeuralNetwork
+
+
+class TestNetworkSerialization(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.network = NeuralNetwork(9, 4, 2, 0.5)
+        self.features = numpy.random.uniform(0.01, 0.99, 9)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSameNetwork(self, loaded, network):
+        self.assertEqual((loaded.inodes, loaded.hnodes, loaded.onodes, loaded.lr),
+                         (network.inodes, network.hnodes, network.onodes, network.lr))
+        numpy.testing.assert_array_equal(loaded.wih, network.wih)
+        numpy.testing.assert_array_equal(loaded.who, network.who)
+
+    def test_save_load_round_trip(self):
+        file_path = os.path.join(self.directory, "network.bin")
+        # Test Instructions
+        self.assertTrue(io_helper.save_pretrained_network(self.network, file_path))
+        loaded = io_helper.load_pretrained_network(file_path)
+        # Assertions
+        self.assertSameNetwork(loaded, self.network)
+        numpy.testing.assert_array_equal(loaded.query(self.features), self.network.query(self.features))
+        self.assertEqual(os.listdir(self.directory), ["network.bin"])  # no temporary files are left behind
+
+    def test_float32_round_trip(self):
+        network = NeuralNetwork(9, 4, 2, 0.5, dtype="float32")
+        file_path = os.path.join(self.directory, "network_32.bin")
+        # Test Instructions
+        io_helper.save_pretrained_network(network, file_path)
+        loaded = io_helper.load_pretrained_network(file_path)
+        # Assertions
+        self.assertSameNetwork(loaded, network)
+        self.assertEqual(loaded.dtype, numpy.float32)
+        numpy.testing.assert_array_equal(loaded.query(self.features), network.query(self.features))
+
+    def test_activation_round_trip(self):
+        network = NeuralNetwork(9, 4, 2, 0.5, activation="fast_sigmoid")
+        file_path = os.path.join(self.directory, "network_fast.bin")
+        # Test Instructions
+        network_data = io_helper.serialize_network(network, metadata={"network_id": "FastNet"})
+        io_helper.write_network_file(network_data, file_path)
+        loaded = io_helper.load_pretrained_network(file_path)
+        # Assertions
+        self.assertEqual(loaded.activation, "fast_sigmoid")
+        numpy.testing.assert_array_equal(loaded.query(self.features), network.query(self.features))
+        with open(file_path, "rb") as network_file:
+            metadata = io_helper.read_network_metadata(network_file.read())
+        self.assertEqual((metadata["network_id"], metadata["activation"]), ("FastNet", "fast_sigmoid"))
+
+    def test_output_activation_round_trip(self):
+        network = NeuralNetwork(9, 4, 2, 0.5, activation="relu", output_activation="fast_sigmoid")
+        # Test Instructions
+        loaded = io_helper.deserialize_network(io_helper.serialize_network(network))
+        # Assertions
+        self.assertEqual((loaded.activation, loaded.output_activation), ("relu", "fast_sigmoid"))
+        numpy.testing.assert_array_equal(loaded.query(self.features), network.query(self.features))
+
+    def test_deep_network_round_trip(self):
+        network = NeuralNetwork(9, [6, 5, 4], 2, 0.5)
+        file_path = os.path.join(self.directory, "network_deep.bin")
+        two_layer_file_path = os.path.join(self.directory, "network.bin")
+        # Test Instructions
+        io_helper.save_pretrained_network(network, file_path)
+        io_helper.save_pretrained_network(self.network, two_layer_file_path)
+        loaded = io_helper.load_pretrained_network(file_path, mmap_mode="r")
+        # Assertions
+        self.assertEqual(loaded.layers, (9, 6, 5, 4, 2))
+        numpy.testing.assert_array_equal(loaded.parameters, network.parameters)
+        numpy.testing.assert_array_equal(loaded.query(self.features), network.query(self.features))
+        self.assertTrue(loaded.read_only)
+        for path, version in ((file_path, 2), (two_layer_file_path, 1)):  # two-layer files keep the version 1 format
+            with open(path, "rb") as network_file:
+                self.assertEqual(io_helper.NETWORK_FILE_HEADER.unpack(
+                    network_file.read(io_helper.NETWORK_FILE_HEADER.size))[1], version)
+
+    def test_bias_round_trip(self):
+        network = NeuralNetwork(9, 4, 2, 0.02, seed=1, bias=True, optimizer="adam")
+        network.train_batch(numpy.random.uniform(0.01, 0.99, (20, 9)), numpy.arange(20) % 2, batch_size=5)
+        file_path = os.path.join(self.directory, "network_bias.bin")
+        # Test Instructions
+        io_helper.save_pretrained_network(network, file_path)
+        loaded = io_helper.load_pretrained_network(file_path, mmap_mode="r")
+        # Assertions
+        self.assertTrue(loaded.bias)
+        numpy.testing.assert_array_equal(loaded.parameters, network.parameters)
+        numpy.testing.assert_array_equal(loaded.biases[-1], network.biases[-1])
+        numpy.testing.assert_array_equal(loaded.optimizer.state["second_moment"],
+                                         network.optimizer.state["second_moment"])
+        numpy.testing.assert_array_equal(loaded.query(self.features), network.query(self.features))
+        self.assertTrue(loaded.read_only)
+        with open(file_path, "rb") as network_file:  # older versions refuse the file rather than ignore its biases
+            self.assertEqual(io_helper.NETWORK_FILE_HEADER.unpack(
+                network_file.read(io_helper.NETWORK_FILE_HEADER.size))[1], 3)
+
+    def test_optimizer_state_round_trip(self):
+        network = NeuralNetwork(9, [6, 4], 2, 0.01, optimizer="adam")
+        features = numpy.random.uniform(0.01, 0.99, (20, 9))
+        network.train_batch(features, numpy.arange(20) % 2, batch_size=5)
+        file_path = os.path.join(self.directory, "network_adam.bin")
+        # Test Instructions
+        io_helper.save_pretrained_network(network, file_path)
+        loaded = io_helper.load_pretrained_network(file_path, mmap_mode="c")
+        for trained_network in (network, loaded):
+            trained_network.train(self.features, 1)
+        # Assertions
+        self.assertEqual((loaded.optimizer.name, loaded.optimizer.steps), ("adam", 5))
+        numpy.testing.assert_array_equal(loaded.parameters, network.parameters)
+        for name in ("first_moment", "second_moment"):
+            numpy.testing.assert_array_equal(loaded.optimizer.state[name], network.optimizer.state[name])
+
+    def test_copy_on_write_load(self):
+        file_path = os.path.join(self.directory, "network.bin")
+        io_helper.save_pretrained_network(self.network, file_path)
+        # Test Instructions
+        loaded = io_helper.load_pretrained_network(file_path)
+        loaded.train(self.features, 1)
+        # Assertions: training changes the loaded copy only, until it is saved again
+        self.assertFalse(numpy.array_equal(loaded.wih, self.network.wih))
+        self.assertSameNetwork(io_helper.load_pretrained_network(file_path), self.network)
+
+    def test_read_only_load(self):
+        file_path = os.path.join(self.directory, "network.bin")
+        io_helper.save_pretrained_network(self.network, file_path)
+        # Test Instructions
+        loaded = io_helper.load_pretrained_network(file_path, mmap_mode="r")
+        # Assertions
+        self.assertSameNetwork(loaded, self.network)
+        with self.assertRaises(ValueError):
+            loaded.train(self.features, 1)
+
+    def test_deserialize_from_buffer(self):
+        # Test Instructions
+        loaded = io_helper.deserialize_network(io_helper.serialize_network(self.network))
+        # Assertions
+        self.assertSameNetwork(loaded, self.network)
+        with self.assertRaises(ValueError):
+            io_helper.deserialize_network(io_helper.serialize_network(self.network)[:-8])
+
+    def test_migrate_legacy_networks(self):
+        legacy_path = os.path.join(self.directory, "legacy.bin")
+        with open(legacy_path, "wb") as fh:
+            dill.dump(self.network, fh)
+        io_helper.save_pretrained_network(self.network, os.path.join(self.directory, "current.bin"))
+        # Test Instructions
+        converted, skipped = io_helper.migrate_pretrained_networks(self.directory)
+        # Assertions
+        self.assertEqual((converted, skipped), (1, 1))
+        with open(legacy_path, "rb") as fh:
+            self.assertEqual(fh.read(4), io_helper.NETWORK_FILE_MAGIC)
+        self.assertSameNetwork(io_helper.load_pretrained_network(legacy_path), self.network)
+
+
+    def test_legacy_networks_are_not_unpickled(self):
+        legacy_path = os.path.join(self.directory, "legacy.bin")
+        with open(legacy_path, "wb") as fh:
+            dill.dump(UnpicklingProbe(), fh)
+        UnpicklingProbe.unpickled = False
+        # Test Instructions
+        with self.assertLogs("APIHelpers.io_helper", level="WARNING") as logs:
+            loaded = io_helper.load_pretrained_network(legacy_path)
+        # Assertions
+        self.assertIsNone(loaded)
+        self.assertFalse(UnpicklingProbe.unpickled)
+        self.assertIn(legacy_path, logs.output[0])
+
+
+class UnpicklingProbe:
+    unpickled = False
+
+    def __init__(self):
+        self.state = "probe"
+
+    def __setstate__(self, state):
+        # runs when the pickle is loaded
+        UnpicklingProbe.unpickled = True
+
+
+class TestCSVStreaming(unittest.TestCase):
+    def test_iter_data_csv_chunks(self):
+        expected = io_helper.read_data_csv("./sample_data/bc_test.csv")
+        # Test Instructions
+        chunks = list(io_helper.iter_data_csv("./sample_data/bc_test.csv", chunk_size=5))
+        # Assertions
+        self.assertEqual([len(chunk) for chunk in chunks], [5, 5, 5, len(expected) - 15])
+        self.assertEqual([row for chunk in chunks for row in chunk], expected)
+
+    def test_iter_data_csv_gzip(self):
+        directory = tempfile.mkdtemp()
+        gzip_path = os.path.join(directory, "bc_test.csv.gz")
+        with open("./sample_data/bc_test.csv", "rb") as csvfh, gzip.open(gzip_path, "wb") as gzfh:
+            shutil.copyfileobj(csvfh, gzfh)
+        # Test Instructions
+        rows = [row for chunk in io_helper.iter_data_csv(gzip_path) for row in chunk]
+        shutil.rmtree(directory)
+        # Assertions
+        self.assertEqual(rows, io_helper.read_data_csv("./sample_data/bc_test.csv"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import threading
+import time
+import unittest
+from APIHelpers.jobs_helper import TrainingJob, TrainingJobManager
+
+
+class TestTrainingJobManager(unittest.TestCase):
+    def setUp(self):
+        self.training_jobs = TrainingJobManager(workers=1, max_finished_jobs=2)
+
+    def tearDown(self):
+        self.training_jobs.shutdown()
+
+    def test_job_progress_and_result(self):
+        release = threading.Event()
+
+        def training_function(job):
+            job.set_total(10)
+            job.update(4, loss=0.25)
+            release.wait(5)
+            job.update(10, loss=0.125)
+            return {"records": 10}
+        # Test Instructions
+        job_id = self.training_jobs.submit(training_function, {"name": "SampleNet_0"})
+        while self.training_jobs.get(job_id)["processed_records"] != 4:
+            time.sleep(0.001)
+        running_status = self.training_jobs.get(job_id)
+        release.set()
+        self.training_jobs.shutdown()
+        finished_status = self.training_jobs.get(job_id)
+        # Assertions
+        self.assertEqual(running_status["state"], TrainingJob.RUNNING)
+        self.assertEqual(running_status["progress"], 0.4)
+        self.assertEqual(running_status["loss"], 0.25)
+        self.assertEqual(finished_status["state"], TrainingJob.COMPLETED)
+        self.assertEqual(finished_status["progress"], 1.0)
+        self.assertEqual(finished_status["result"], {"records": 10})
+        self.assertEqual(finished_status["description"], {"name": "SampleNet_0"})
+        self.assertGreater(finished_status["records_per_second"], 0)
+
+    def test_failed_job(self):
+        def training_function(job):
+            raise ValueError("no training records")
+        # Test Instructions
+        job_id = self.training_jobs.submit(training_function)
+        self.training_jobs.shutdown()
+        # Assertions
+        self.assertEqual(self.training_jobs.get(job_id)["state"], TrainingJob.FAILED)
+        self.assertEqual(self.training_jobs.get(job_id)["error"], "ValueError: no training records")
+        self.assertIsNone(self.training_jobs.get("unknown_job"))
+
+    def test_oldest_finished_jobs_are_dropped(self):
+        # Test Instructions
+        job_ids = [self.training_jobs.submit(lambda job: None) for _ in range(4)]
+        self.training_jobs.shutdown()
+        # Assertions
+        self.assertEqual([self.training_jobs.get(job_id) is not None for job_id in job_ids],
+                         [False, False, True, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import time
+import unittest
+from pymongo.errors import DuplicateKeyError
+from APIHelpers.metadata_helper import NetworkMetadataRepository
+
+
+class FakeMetadataDB:
+    def __init__(self):
+        # stands in for a DBConnection to the metadata collection, counting db round-trips
+        self.documents = dict()
+        self.listeners = list()
+        self.round_trips = 0
+
+    def add_write_listener(self, listener):
+        self.listeners.append(listener)
+
+    def read_document(self, match):
+        self.round_trips += 1
+        document = self.documents.get(match["network_id"])
+        return dict(document) if document is not None else None
+
+    def write_document(self, document):
+        self.round_trips += 1
+        if document["network_id"] in self.documents:
+            raise DuplicateKeyError("network_id")
+        self.documents[document["network_id"]] = dict(document)
+        self._notify([document])
+        return len(self.documents)
+
+    def read_and_update_document(self, match, update):
+        self.round_trips += 1
+        previous_document = self.documents.get(match["network_id"])
+        if previous_document is not None:
+            self.documents[match["network_id"]] = dict(previous_document, **update)
+            self._notify([previous_document])
+        return previous_document
+
+    def read_and_remove_document(self, match):
+        self.round_trips += 1
+        removed_document = self.documents.pop(match["network_id"], None)
+        if removed_document is not None:
+            self._notify([removed_document])
+        return removed_document
+
+    def remove_documents(self, match):
+        self.round_trips += 1
+        removed_document = self.documents.pop(match["network_id"], None)
+        if removed_document is not None:
+            self._notify(None, match)
+        return int(removed_document is not None)
+
+    def _notify(self, documents, match=None):
+        for listener in self.listeners:
+            listener(documents, match)
+
+
+class TestNetworkMetadataRepository(unittest.TestCase):
+    def setUp(self):
+        self.metadata_db = FakeMetadataDB()
+        self.network_metadata = NetworkMetadataRepository(self.metadata_db, ttl_seconds=30)
+
+    def test_repeated_reads_are_served_from_memory(self):
+        self.network_metadata.create("SampleNet_0", "./bin/samplenet_0.bin")
+        self.metadata_db.round_trips = 0
+        # Test Instructions
+        first_read = self.network_metadata.get("SampleNet_0")
+        second_read = self.network_metadata.get("SampleNet_0")
+        missing_network = [self.network_metadata.get("SampleNet_1") for _ in range(3)]
+        # Assertions
+        self.assertEqual(first_read["saved_data"], "./bin/samplenet_0.bin")
+        self.assertEqual(second_read, first_read)
+        self.assertEqual(missing_network, [None, None, None])
+        self.assertEqual(self.metadata_db.round_trips, 1)
+
+    def test_writes_invalidate_cached_entries(self):
+        self.assertFalse(self.network_metadata.exists("SampleNet_0"))
+        # Test Instructions
+        self.network_metadata.create("SampleNet_0", "./bin/samplenet_0.bin")
+        previous_document = self.network_metadata.update("SampleNet_0", "./bin/samplenet_0_v2.bin")
+        updated_saved_data = self.network_metadata.get("SampleNet_0")["saved_data"]
+        removed_document = self.network_metadata.delete("SampleNet_0")
+        # Assertions
+        self.assertEqual(previous_document["saved_data"], "./bin/samplenet_0.bin")
+        self.assertEqual(updated_saved_data, "./bin/samplenet_0_v2.bin")
+        self.assertEqual(removed_document["saved_data"], "./bin/samplenet_0_v2.bin")
+        self.assertFalse(self.network_metadata.exists("SampleNet_0"))
+        self.assertIsNone(self.network_metadata.delete("SampleNet_0"))
+
+    def test_bulk_removals_invalidate_the_filtered_entry(self):
+        for network_id in ("SampleNet_0", "SampleNet_1"):
+            self.network_metadata.create(network_id, "./bin/{0}.bin".format(network_id.lower()))
+        self.metadata_db.round_trips = 0
+        # Test Instructions
+        self.metadata_db.remove_documents({"network_id": "SampleNet_0"})
+        removed_read = self.network_metadata.get("SampleNet_0")
+        cached_read = self.network_metadata.get("SampleNet_1")
+        # Assertions
+        self.assertIsNone(removed_read)
+        self.assertEqual(cached_read["saved_data"], "./bin/samplenet_1.bin")
+        self.assertEqual(self.metadata_db.round_trips, 2)
+
+    def test_duplicate_create(self):
+        # Test Instructions
+        first_id = self.network_metadata.create("SampleNet_0", "./bin/samplenet_0.bin")
+        second_id = self.network_metadata.create("SampleNet_0", "./bin/samplenet_0_copy.bin")
+        # Assertions
+        self.assertIsNotNone(first_id)
+        self.assertIsNone(second_id)
+        self.assertEqual(self.network_metadata.get("SampleNet_0")["saved_data"], "./bin/samplenet_0.bin")
+
+    def test_entries_expire(self):
+        network_metadata = NetworkMetadataRepository(self.metadata_db, ttl_seconds=0.05)
+        network_metadata.get("SampleNet_0")
+        # Test Instructions
+        self.metadata_db.documents["SampleNet_0"] = {"network_id": "SampleNet_0", "saved_data": "./bin/external.bin"}
+        cached_read = network_metadata.get("SampleNet_0")
+        time.sleep(0.06)
+        expired_read = network_metadata.get("SampleNet_0")
+        # Assertions
+        self.assertIsNone(cached_read)
+        self.assertEqual(expired_read["saved_data"], "./bin/external.bin")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import time
+import unittest
+from APIHelpers import db_helper
+from APIHelpers.cache_helper import GlobalCacheHelper
+from APIHelpers.metrics_helper import MetricsRegistry
+
+
+class FakeCollection:
+    # stands in for a pymongo collection, taking 20ms to find a document
+    def find_one(self, match):
+        time.sleep(0.02)
+        return {"network_id": match["network_id"]}
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_phases_record_exclusive_time(self):
+        metrics = MetricsRegistry(buckets=(0.01, 0.1))
+        # Test Instructions
+        metrics.start_request("/api/v1/perceptron/query")
+        with metrics.phase("cache"):
+            with metrics.phase("db"):
+                time.sleep(0.02)
+        metrics.end_request(200)
+        # Assertions
+        cache_time = metrics.histograms["request_phase_seconds"][(("phase", "cache"),
+                                                                  ("route", "/api/v1/perceptron/query"))]
+        db_time = metrics.histograms["request_phase_seconds"][(("phase", "db"), ("route", "/api/v1/perceptron/query"))]
+        self.assertLess(cache_time[-2], 0.01)
+        self.assertGreaterEqual(db_time[-2], 0.02)
+        self.assertEqual(db_time[:3], [0, 1, 0])
+        self.assertEqual(metrics.counters["requests_total"][(("route", "/api/v1/perceptron/query"),
+                                                             ("status", "200"))], 1)
+
+    def test_render(self):
+        metrics = MetricsRegistry(buckets=(0.01, 0.1))
+        metrics.register_collector("network_cache", lambda: {"hits": 3, "name": "skipped"})
+        # Test Instructions
+        metrics.observe("request_duration_seconds", 0.05, route="/api/v1/perceptron/query")
+        metrics.increment("db_operations_total", collection="PerceptronAPI.records", operation="find_one")
+        rendered_metrics = metrics.render().splitlines()
+        # Assertions
+        self.assertIn('perceptron_db_operations_total{collection="PerceptronAPI.records",operation="find_one"} 1',
+                      rendered_metrics)
+        self.assertIn('perceptron_request_duration_seconds_bucket{route="/api/v1/perceptron/query",le="0.01"} 0',
+                      rendered_metrics)
+        self.assertIn('perceptron_request_duration_seconds_bucket{route="/api/v1/perceptron/query",le="+Inf"} 1',
+                      rendered_metrics)
+        self.assertIn('# TYPE perceptron_request_duration_seconds histogram', rendered_metrics)
+        self.assertIn('perceptron_network_cache_hits 3.0', rendered_metrics)
+        self.assertFalse([line for line in rendered_metrics if "network_cache_name" in line])
+
+    def test_disabled_registry_records_nothing(self):
+        metrics = MetricsRegistry(enabled=False)
+        # Test Instructions
+        metrics.start_request("/api/v1/perceptron/query")
+        with metrics.phase("forward"):
+            pass
+        metrics.end_request(200)
+        # Assertions
+        self.assertFalse(metrics.counters)
+        self.assertFalse(metrics.histograms)
+
+    def test_components_report_to_the_registry(self):
+        metrics = MetricsRegistry()
+        metadata_db = db_helper.DBConnection("localhost", 27017, "PerceptronAPI", "metadata", metrics=metrics)
+        metadata_db.collection = FakeCollection()
+        global_cache = GlobalCacheHelper(max_size=2, metrics=metrics)
+        # Test Instructions
+        metrics.start_request("/api/v1/perceptron/query")
+        with global_cache.checkout("SampleNet_0", lambda: metadata_db.read_document({"network_id": "SampleNet_0"})):
+            pass
+        metrics.end_request(200)
+        # Assertions
+        route_key = ("route", "/api/v1/perceptron/query")
+        self.assertEqual(metrics.counters["db_operations_total"][(("collection", "PerceptronAPI.metadata"),
+                                                                  ("operation", "find_one"))], 1)
+        self.assertGreaterEqual(metrics.histograms["request_phase_seconds"][(("phase", "db"), route_key)][-2], 0.02)
+        self.assertLess(metrics.histograms["request_phase_seconds"][(("phase", "cache"), route_key)][-2], 0.02)
+
+
+if __name__ == '__main__':
+    unittest.main()
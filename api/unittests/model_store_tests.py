@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from APIHelpers import io_helper
+from APIHelpers.model_store_helper import SharedModelStore
+from neural_network import NeuralNetwork
+
+
+class TestSharedModelStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, "network.bin")
+        self.network = NeuralNetwork(9, 4, 2, 0.5)
+        io_helper.save_pretrained_network(self.network, self.file_path)
+        self.features = numpy.random.uniform(0.01, 0.99, 9)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_open_is_shared_and_read_only(self):
+        store = SharedModelStore(max_size=10)
+        # Test Instructions
+        first = store.open(self.file_path)
+        second = store.open(self.file_path)
+        # Assertions
+        self.assertIs(first, second)
+        self.assertTrue(first.read_only)
+        numpy.testing.assert_array_equal(first.query(self.features), self.network.query(self.features))
+
+    def test_checkout_is_private(self):
+        store = SharedModelStore(max_size=10)
+        shared = store.open(self.file_path)
+        # Test Instructions
+        private = store.checkout(self.file_path)
+        private.train(self.features, 1)
+        # Assertions
+        self.assertFalse(private.read_only)
+        numpy.testing.assert_array_equal(shared.wih, self.network.wih)
+        self.assertFalse(numpy.array_equal(private.wih, self.network.wih))
+
+    def test_saved_file_is_remapped(self):
+        store = SharedModelStore(max_size=10)
+        shared = store.open(self.file_path)
+        trained = store.checkout(self.file_path)
+        trained.train(self.features, 1)
+        # Test Instructions
+        io_helper.save_pretrained_network(trained, self.file_path)
+        reopened = store.open(self.file_path)
+        # Assertions
+        self.assertIsNot(reopened, shared)
+        numpy.testing.assert_array_equal(reopened.wih, trained.wih)
+        numpy.testing.assert_array_equal(shared.wih, self.network.wih)  # existing readers keep the old weights
+
+    def test_store_trimming(self):
+        store = SharedModelStore(max_size=2)
+        paths = [os.path.join(self.directory, "network_{0}.bin".format(i)) for i in range(4)]
+        # Test Instructions
+        for path in paths:
+            io_helper.save_pretrained_network(self.network, path)
+            store.open(path)
+        # Assertions
+        self.assertEqual(store.keys(), paths[2:])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,379 @@
+import pickle
+import threading
+import unittest
+import numpy
+from neural_network import NeuralNetwork
+
+
+def sample_records(record_count=50, input_nodes=9, output_nodes=2, seed=7):
+    rng = numpy.random.RandomState(seed)
+    features = rng.uniform(0.01, 0.99, (record_count, input_nodes))
+    targets = rng.randint(0, output_nodes, record_count)
+    return features, targets
+
+
+def twin_networks(input_nodes=9, hidden_nodes=4, output_nodes=2, learning_rate=0.5):
+    network_a = NeuralNetwork(input_nodes, hidden_nodes, output_nodes, learning_rate)
+    network_b = NeuralNetwork(input_nodes, hidden_nodes, output_nodes, learning_rate)
+    network_b.wih = network_a.wih.copy()
+    network_b.who = network_a.who.copy()
+    return network_a, network_b
+
+
+class TestBatchTraining(unittest.TestCase):
+    def test_batch_size_one_matches_per_record_training(self):
+        features, targets = sample_records()
+        per_record, batched = twin_networks()
+        # Test Instructions
+        for _ in range(3):
+            for row, target in zip(features, targets):
+                per_record.train(row, target)
+        processed = batched.train_batch(features, targets, batch_size=1, epochs=3)
+        # Assertions
+        self.assertEqual(processed, 3 * len(features))
+        numpy.testing.assert_allclose(batched.wih, per_record.wih, rtol=1e-12, atol=1e-12)
+        numpy.testing.assert_allclose(batched.who, per_record.who, rtol=1e-12, atol=1e-12)
+
+    def test_mini_batch_updates_weights(self):
+        features, targets = sample_records()
+        network, untouched = twin_networks()
+        # Test Instructions
+        network.train_batch(features, targets, batch_size=16, epochs=2, shuffle=True)
+        # Assertions
+        self.assertEqual(network.wih.shape, untouched.wih.shape)
+        self.assertEqual(network.who.shape, untouched.who.shape)
+        self.assertFalse(numpy.allclose(network.wih, untouched.wih))
+        self.assertFalse(numpy.allclose(network.who, untouched.who))
+
+    def test_progress_callback(self):
+        features, targets = sample_records()
+        network = NeuralNetwork(9, 4, 2, 0.5)
+        progress = list()
+        # Test Instructions
+        processed = network.train_batch(features, targets, batch_size=16, epochs=2,
+                                         callback=lambda records, loss: progress.append((records, loss)))
+        # Assertions
+        self.assertEqual(processed, 100)
+        self.assertEqual([records for records, _ in progress], [16, 32, 48, 50, 66, 82, 98, 100])
+        self.assertTrue(all(0.0 <= loss <= 1.0 for _, loss in progress))
+
+    def test_copy_is_independent(self):
+        features, targets = sample_records()
+        network = NeuralNetwork(9, 4, 2, 0.5)
+        # Test Instructions
+        network_copy = network.copy()
+        network_copy.train_batch(features, targets)
+        # Assertions
+        self.assertEqual((network_copy.inodes, network_copy.hnodes, network_copy.onodes, network_copy.lr),
+                         (9, 4, 2, 0.5))
+        self.assertFalse(numpy.allclose(network_copy.wih, network.wih))
+
+    def test_mismatched_record_counts(self):
+        features, targets = sample_records()
+        network = NeuralNetwork(9, 4, 2, 0.5)
+        with self.assertRaises(ValueError):
+            network.train_batch(features, targets[:-1])
+
+
+class TestBatchQuery(unittest.TestCase):
+    def test_query_batch_matches_single_queries(self):
+        features, _ = sample_records()
+        network = NeuralNetwork(9, 4, 2, 0.5)
+        # Test Instructions
+        batch_outputs = network.query_batch(features)
+        # Assertions
+        self.assertEqual(batch_outputs.shape, (len(features), 2))
+        for row, outputs in zip(features, batch_outputs):
+            numpy.testing.assert_allclose(outputs, network.query(row).ravel(), rtol=1e-12)
+
+    def test_query_results_are_not_reused(self):
+        features, _ = sample_records()
+        network = NeuralNetwork(9, 4, 2, 0.5)
+        # Test Instructions
+        first_outputs = network.query(features[0])
+        first_copy = first_outputs.copy()
+        network.query(features[1])
+        # Assertions
+        self.assertEqual(first_outputs.shape, (2, 1))
+        numpy.testing.assert_array_equal(first_outputs, first_copy)
+
+    def test_concurrent_queries(self):
+        features, _ = sample_records()
+        network = NeuralNetwork(9, 4, 2, 0.5)
+        expected_outputs = network.query_batch(features)
+        mismatches = list()
+
+        def query_rows():
+            for _ in range(20):
+                for row, outputs in zip(features, expected_outputs):
+                    if not numpy.allclose(network.query(row).ravel(), outputs, rtol=1e-12):
+                        mismatches.append(row)
+        # Test Instructions
+        threads = [threading.Thread(target=query_rows) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Assertions
+        self.assertFalse(mismatches)
+
+    def test_mismatched_feature_count(self):
+        network = NeuralNetwork(9, 4, 2, 0.5)
+        with self.assertRaises(ValueError):
+            network.query([0.5, 0.5])
+
+
+class TestPrecision(unittest.TestCase):
+    def test_float32_network(self):
+        features, targets = sample_records()
+        network_64 = NeuralNetwork(9, 4, 2, 0.5, seed=3)
+        network_32 = NeuralNetwork(9, 4, 2, 0.5, seed=3, dtype="float32")
+        # Test Instructions
+        network_64.train_batch(features, targets, batch_size=4)
+        network_32.train_batch(features, targets, batch_size=4)
+        for row, target in zip(features[:10], targets[:10]):
+            network_64.train(row, target)
+            network_32.train(row, target)
+        # Assertions
+        self.assertEqual((network_32.wih.dtype, network_32.who.dtype), (numpy.float32, numpy.float32))
+        self.assertEqual(network_32.query_batch(features).dtype, numpy.float32)
+        self.assertEqual(network_32.copy().dtype, numpy.float32)
+        numpy.testing.assert_allclose(network_32.query_batch(features), network_64.query_batch(features), atol=1e-4)
+        numpy.testing.assert_allclose(network_32.query(features[0]), network_64.query(features[0]), atol=1e-4)
+
+    def test_weights_are_converted(self):
+        network = NeuralNetwork(9, 4, 2, 0.5)
+        # Test Instructions
+        converted = NeuralNetwork(9, 4, 2, 0.5, weights=(network.wih, network.who), dtype=numpy.float32)
+        # Assertions
+        self.assertEqual(converted.dtype, numpy.float32)
+        numpy.testing.assert_allclose(converted.wih, network.wih, rtol=1e-6)
+        with self.assertRaises(ValueError):
+            NeuralNetwork(9, 4, 2, 0.5, dtype="float16")
+        with self.assertRaises(ValueError):
+            NeuralNetwork(9, 4, 2, 0.5, dtype="not_a_dtype")
+
+
+class TestDeepNetworks(unittest.TestCase):
+    def test_layer_weights_share_the_parameter_buffer(self):
+        network = NeuralNetwork(9, [6, 5], 2, 0.5)
+        # Test Instructions
+        network.wih = numpy.ones((6, 9))
+        network.who = numpy.zeros((2, 5))
+        # Assertions
+        self.assertEqual(network.layers, (9, 6, 5, 2))
+        self.assertEqual([weights.shape for weights in network.weights], [(6, 9), (5, 6), (2, 5)])
+        self.assertEqual(network.parameters.shape, (9 * 6 + 6 * 5 + 5 * 2,))
+        self.assertTrue(all(numpy.shares_memory(weights, network.parameters) for weights in network.weights))
+        self.assertEqual(network.parameters[:54].tolist(), [1.0] * 54)
+        self.assertEqual(network.parameters[-10:].tolist(), [0.0] * 10)
+        with self.assertRaises(ValueError):
+            NeuralNetwork(9, [], 2, 0.5)
+        with self.assertRaises(ValueError):
+            NeuralNetwork(9, [4, 0], 2, 0.5)
+
+    def test_two_layer_update_is_unchanged(self):
+        network = NeuralNetwork(9, 4, 2, 0.1, seed=3)
+        inputs = numpy.random.RandomState(3).uniform(0.01, 0.99, (9, 1))
+        targets = numpy.array([[0.01], [0.99]])
+        wih, who = network.wih.copy(), network.who.copy()
+        # Test Instructions
+        network.train(inputs.ravel(), 1)
+        # Assertions
+        # the update of the original two-layer implementation, using column vectors
+        hidden_outputs = 1.0 / (1.0 + numpy.exp(-numpy.dot(wih, inputs)))
+        final_outputs = 1.0 / (1.0 + numpy.exp(-numpy.dot(who, hidden_outputs)))
+        output_errors = targets - final_outputs
+        hidden_errors = numpy.dot(who.T, output_errors)
+        who += 0.1 * numpy.dot(output_errors * final_outputs * (1.0 - final_outputs), hidden_outputs.T)
+        wih += 0.1 * numpy.dot(hidden_errors * hidden_outputs * (1.0 - hidden_outputs), inputs.T)
+        numpy.testing.assert_allclose(network.who, who, rtol=1e-12)
+        numpy.testing.assert_allclose(network.wih, wih, rtol=1e-12)
+
+    def test_deep_batch_training(self):
+        features, targets = sample_records(record_count=200)
+        features[:, 0] = targets  # makes the records separable
+        per_record, batched = NeuralNetwork(9, [8, 6], 2, 0.3, seed=1), NeuralNetwork(9, [8, 6], 2, 0.3, seed=1)
+        # Test Instructions
+        for row, target in zip(features, targets):
+            per_record.train(row, target)
+        batched.train_batch(features, targets, batch_size=1)
+        batched.train_batch(features, targets, epochs=20, batch_size=8)
+        # Assertions
+        numpy.testing.assert_allclose(batched.query_batch(features[:10]),
+                                      numpy.hstack([batched.query(row) for row in features[:10]]).T, rtol=1e-12)
+        self.assertGreater(numpy.mean(numpy.argmax(batched.query_batch(features), axis=1) == targets), 0.9)
+        batched_once = NeuralNetwork(9, [8, 6], 2, 0.3, seed=1)
+        batched_once.train_batch(features, targets, batch_size=1)
+        numpy.testing.assert_allclose(batched_once.parameters, per_record.parameters, rtol=1e-12, atol=1e-12)
+
+    def test_legacy_pickled_state(self):
+        network = NeuralNetwork(9, 4, 2, 0.5)
+        legacy_state = {"inodes": 9, "hnodes": 4, "onodes": 2, "lr": 0.5, "wih": network.wih.copy(),
+                        "who": network.who.copy()}
+        legacy_network = NeuralNetwork.__new__(NeuralNetwork)
+        # Test Instructions
+        legacy_network.__setstate__(legacy_state)
+        # Assertions
+        self.assertEqual(legacy_network.layers, (9, 4, 2))
+        numpy.testing.assert_array_equal(legacy_network.parameters, network.parameters)
+        numpy.testing.assert_array_equal(legacy_network.query([0.5] * 9), network.query([0.5] * 9))
+
+
+class TestBiases(unittest.TestCase):
+    def test_bias_update(self):
+        network = NeuralNetwork(9, 4, 2, 0.1, seed=3, bias=True)
+        network.biases[0][...] = [0.1, -0.2, 0.3, -0.4]
+        network.biases[1][...] = [0.5, -0.5]
+        inputs = numpy.random.RandomState(3).uniform(0.01, 0.99, (9, 1))
+        targets = numpy.array([[0.01], [0.99]])
+        wih, who = network.wih.copy(), network.who.copy()
+        hidden_bias, output_bias = network.biases[0].reshape(-1, 1).copy(), network.biases[1].reshape(-1, 1).copy()
+        # Test Instructions
+        network.train(inputs.ravel(), 1)
+        # Assertions
+        # the two-layer update using column vectors, with the biases trained like weights of a constant input of 1
+        hidden_outputs = 1.0 / (1.0 + numpy.exp(-(numpy.dot(wih, inputs) + hidden_bias)))
+        final_outputs = 1.0 / (1.0 + numpy.exp(-(numpy.dot(who, hidden_outputs) + output_bias)))
+        output_errors = targets - final_outputs
+        hidden_errors = numpy.dot(who.T, output_errors)
+        output_deltas = output_errors * final_outputs * (1.0 - final_outputs)
+        hidden_deltas = hidden_errors * hidden_outputs * (1.0 - hidden_outputs)
+        numpy.testing.assert_allclose(network.who, who + 0.1 * numpy.dot(output_deltas, hidden_outputs.T), rtol=1e-12)
+        numpy.testing.assert_allclose(network.wih, wih + 0.1 * numpy.dot(hidden_deltas, inputs.T), rtol=1e-12)
+        numpy.testing.assert_allclose(network.biases[1], (output_bias + 0.1 * output_deltas).ravel(), rtol=1e-12)
+        numpy.testing.assert_allclose(network.biases[0], (hidden_bias + 0.1 * hidden_deltas).ravel(), rtol=1e-12)
+
+    def test_biases_share_the_parameter_buffer(self):
+        features, targets = sample_records()
+        network = NeuralNetwork(9, [6, 5], 2, 0.3, seed=1, bias=True, optimizer="adam")
+        per_record = NeuralNetwork(9, [6, 5], 2, 0.3, seed=1, bias=True)
+        batched = NeuralNetwork(9, [6, 5], 2, 0.3, seed=1, bias=True)
+        # Test Instructions
+        network.train_batch(features, targets, batch_size=8, epochs=3)
+        for row, target in zip(features, targets):
+            per_record.train(row, target)
+        batched.train_batch(features, targets, batch_size=1)
+        copied, unpickled = network.copy(), pickle.loads(pickle.dumps(network))
+        # Assertions
+        self.assertEqual(network.parameters.shape, (9 * 6 + 6 * 5 + 5 * 2 + 6 + 5 + 2,))
+        self.assertEqual([layer_bias.shape for layer_bias in network.biases], [(6,), (5,), (2,)])
+        self.assertTrue(all(numpy.shares_memory(layer_bias, network.parameters) for layer_bias in network.biases))
+        self.assertTrue(numpy.any(network.biases[-1] != 0.0))
+        self.assertEqual(network.optimizer.state["first_moment"].shape, network.parameters.shape)
+        numpy.testing.assert_allclose(batched.parameters, per_record.parameters, rtol=1e-12, atol=1e-12)
+        numpy.testing.assert_allclose(network.query_batch(features[:10]),
+                                      numpy.hstack([network.query(row) for row in features[:10]]).T, rtol=1e-12)
+        for kept_network in (copied, unpickled):
+            self.assertTrue(kept_network.bias)
+            numpy.testing.assert_array_equal(kept_network.query_batch(features), network.query_batch(features))
+        self.assertEqual(NeuralNetwork(9, 4, 2, 0.1).biases, [None, None])
+
+    def test_biases_start_at_zero(self):
+        network = NeuralNetwork(9, 4, 2, 0.1, weights=[numpy.zeros((4, 9)), numpy.zeros((2, 4))], bias=True)
+        # Test Instructions
+        outputs = network.query_batch(numpy.ones((3, 9)))
+        # Assertions
+        self.assertEqual(network.parameters[-6:].tolist(), [0.0] * 6)
+        numpy.testing.assert_allclose(outputs, 0.5)
+
+
+class TestOptimization(unittest.TestCase):
+    def test_adam_converges_in_fewer_epochs(self):
+        features, targets = sample_records(record_count=200)
+        features[:, 0] = targets  # makes the records separable
+        sgd_network = NeuralNetwork(9, 4, 2, 0.02, seed=2)
+        adam_network = NeuralNetwork(9, 4, 2, 0.02, seed=2, optimizer="adam")
+        # Test Instructions
+        for network in (sgd_network, adam_network):
+            network.train_batch(features, targets, batch_size=16, epochs=5, shuffle=True, seed=2)
+        # Assertions
+        self.assertEqual(adam_network.optimizer.steps, 5 * 13)
+        self.assertLess(adam_network._loss(features, adam_network._targets_matrix(targets)),
+                        sgd_network._loss(features, sgd_network._targets_matrix(targets)))
+        self.assertGreater(numpy.mean(numpy.argmax(adam_network.query_batch(features), axis=1) == targets), 0.9)
+
+    def test_early_stopping_keeps_the_best_epoch(self):
+        features, targets = sample_records(record_count=200)
+        validation_features, validation_targets = sample_records(record_count=50, seed=8)  # unrelated to training
+        network = NeuralNetwork(9, 6, 2, 0.05, seed=1, optimizer="adam")
+        validation_losses, optimizers_by_epoch = list(), list()
+
+        def validation_callback(epoch, loss):
+            validation_losses.append(loss)
+            optimizers_by_epoch.append(network.optimizer.copy())
+        # Test Instructions
+        network.train_batch(features, targets, batch_size=8, epochs=200, shuffle=True,
+                            validation_data=(validation_features, validation_targets), patience=3,
+                            validation_callback=validation_callback)
+        best_optimizer = optimizers_by_epoch[int(numpy.argmin(validation_losses))]
+        # Assertions
+        self.assertLess(len(validation_losses), 200)
+        self.assertEqual(numpy.argmin(validation_losses), len(validation_losses) - 4)
+        self.assertAlmostEqual(network._loss(validation_features, network._targets_matrix(validation_targets)),
+                               min(validation_losses))
+        # the Adam moments and update count are rolled back with the weights
+        self.assertEqual(network.optimizer.steps, best_optimizer.steps)
+        for name in ("first_moment", "second_moment"):
+            numpy.testing.assert_array_equal(network.optimizer.state[name], best_optimizer.state[name])
+
+    def test_optimizer_state_is_kept(self):
+        features, targets = sample_records()
+        network = NeuralNetwork(9, 4, 2, 0.01, optimizer="momentum")
+        network.train_batch(features, targets, batch_size=10)
+        # Test Instructions
+        copied, unpickled = network.copy(), pickle.loads(pickle.dumps(network))
+        for trained_network in (network, copied, unpickled):
+            trained_network.train_batch(features, targets, batch_size=10)
+        # Assertions
+        self.assertEqual((copied.optimizer.steps, unpickled.optimizer.steps), (10, 10))
+        numpy.testing.assert_array_equal(copied.parameters, network.parameters)
+        numpy.testing.assert_array_equal(unpickled.parameters, network.parameters)
+        self.assertFalse(numpy.shares_memory(copied.optimizer.state["velocity"], network.optimizer.state["velocity"]))
+
+
+class TestActivations(unittest.TestCase):
+    def test_every_activation_trains(self):
+        features, targets = sample_records(record_count=200)
+        features[:, 0] = targets  # makes the records separable
+        for activation in ("sigmoid", "tanh", "relu", "fast_sigmoid", "lut_sigmoid"):
+            network = NeuralNetwork(9, 6, 2, 0.1, seed=5, activation=activation)
+            errors = list()
+            # Test Instructions
+            network.train_batch(features, targets, epochs=20, batch_size=8,
+                                callback=lambda processed_records, loss: errors.append(loss))
+            predictions = numpy.argmax(network.query_batch(features), axis=1)
+            # Assertions
+            self.assertLess(numpy.mean(errors[-25:]), numpy.mean(errors[:25]), msg=activation)  # last vs first epoch
+            self.assertGreater(numpy.mean(predictions == targets), 0.9, msg=activation)
+
+    def test_activation_is_kept(self):
+        network = NeuralNetwork(9, 4, 2, 0.5, activation="tanh")
+        # Test Instructions
+        copied = network.copy()
+        unpickled = pickle.loads(pickle.dumps(network))
+        # Assertions
+        self.assertEqual((copied.activation, unpickled.activation), ("tanh", "tanh"))
+        numpy.testing.assert_array_equal(unpickled.query([0.5] * 9), network.query([0.5] * 9))
+        with self.assertRaises(ValueError):
+            NeuralNetwork(9, 4, 2, 0.5, activation="softsign")
+
+    def test_unbounded_activations_keep_a_sigmoid_output_layer(self):
+        features, _ = sample_records(record_count=50)
+        # Test Instructions
+        relu_network = NeuralNetwork(9, [6, 4], 2, 0.1, seed=5, activation="relu")
+        tanh_network = NeuralNetwork(9, 6, 2, 0.1, seed=5, activation="tanh", output_activation="lut_sigmoid")
+        outputs = relu_network.query_batch(features * 100.0)
+        # Assertions
+        self.assertEqual((relu_network.activation, relu_network.output_activation), ("relu", "sigmoid"))
+        self.assertEqual(relu_network.copy().output_activation, "sigmoid")
+        self.assertEqual(pickle.loads(pickle.dumps(tanh_network)).output_activation, "lut_sigmoid")
+        self.assertEqual(NeuralNetwork(9, 6, 2, 0.1, activation="fast_sigmoid").output_activation, "fast_sigmoid")
+        self.assertTrue(numpy.all((outputs >= 0.0) & (outputs <= 1.0)))
+        numpy.testing.assert_allclose(relu_network.query(features[0] * 100.0).ravel(), outputs[0])
+        with self.assertRaises(ValueError):
+            NeuralNetwork(9, 6, 2, 0.1, activation="sigmoid", output_activation="relu")
+
+
+if __name__ == '__main__':
+    unittest.main()
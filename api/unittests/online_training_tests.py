@@ -0,0 +1,197 @@
+import threading
+import time
+import unittest
+import numpy
+from APIHelpers.online_training_helper import OnlineTrainer
+
+
+class FakeTrainedNetwork:
+    def __init__(self, fail_checkpoints=0):
+        # records the samples of every applied batch and every checkpoint
+        self.batches = list()
+        self.checkpoints = list()
+        self.fail_checkpoints = fail_checkpoints
+        self.lock = threading.Lock()
+
+    def apply_batch(self, key, features, target_classes):
+        if key != "SampleNet_0":
+            return False
+        if features.shape[1] != 3:
+            raise ValueError("expected 3 features")
+        with self.lock:
+            self.batches.append((features.copy(), target_classes.tolist()))
+        return True
+
+    def checkpoint(self, key):
+        with self.lock:
+            if self.fail_checkpoints:
+                self.fail_checkpoints -= 1
+                raise OSError("disk full")
+            self.checkpoints.append(key)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return condition()
+
+
+class TestOnlineTrainer(unittest.TestCase):
+    def test_full_batches_are_applied(self):
+        network = FakeTrainedNetwork()
+        trainer = OnlineTrainer(network.apply_batch, batch_size=4, max_delay_ms=60000)
+        # Test Instructions
+        pending_counts = [trainer.submit("SampleNet_0", [i, i, i], i % 2) for i in range(8)]
+        applied = wait_for(lambda: trainer.get_stats()["applied"] == 8)
+        trainer.shutdown()
+        # Assertions
+        self.assertTrue(applied)
+        self.assertEqual(pending_counts[0], 1)
+        self.assertEqual([features.shape for features, _ in network.batches], [(4, 3), (4, 3)])
+        numpy.testing.assert_allclose(numpy.vstack([features for features, _ in network.batches])[:, 0], range(8))
+        self.assertEqual(network.batches[0][1], [0, 1, 0, 1])
+        self.assertEqual(trainer.get_stats()["average_batch_size"], 4.0)
+
+    def test_partial_batch_is_applied_after_max_delay(self):
+        network = FakeTrainedNetwork()
+        trainer = OnlineTrainer(network.apply_batch, batch_size=100, max_delay_ms=20)
+        # Test Instructions
+        for i in range(3):
+            trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 1)
+        applied = wait_for(lambda: trainer.get_stats()["applied"] == 3)
+        trainer.shutdown()
+        # Assertions
+        self.assertTrue(applied)
+        self.assertEqual([features.shape[0] for features, _ in network.batches], [3])
+
+    def test_flush_applies_pending_samples(self):
+        network = FakeTrainedNetwork()
+        trainer = OnlineTrainer(network.apply_batch, batch_size=100, max_delay_ms=60000)
+        # Test Instructions
+        trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)
+        trainer.submit("SampleNet_0", [4.0, 5.0, 6.0], 1)
+        pending_before = trainer.pending("SampleNet_0")
+        flushed = trainer.flush("SampleNet_0", timeout=5)
+        # Assertions
+        self.assertTrue(flushed)
+        self.assertEqual(pending_before, 2)
+        self.assertEqual(trainer.pending("SampleNet_0"), 0)
+        self.assertEqual(len(network.batches), 1)
+        self.assertEqual(network.batches[0][1], [0, 1])
+        trainer.shutdown()
+
+    def test_checkpoint_after_sample_count(self):
+        network = FakeTrainedNetwork()
+        trainer = OnlineTrainer(network.apply_batch, checkpoint=network.checkpoint, batch_size=2, max_delay_ms=60000,
+                                checkpoint_samples=4, checkpoint_interval_seconds=0)
+        # Test Instructions
+        for i in range(2):
+            trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)
+        trainer.flush()
+        checkpoints_before = list(network.checkpoints)
+        for i in range(2):
+            trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)
+        checkpointed = wait_for(lambda: trainer.get_stats()["checkpoints"] == 1)
+        # Assertions
+        self.assertEqual(checkpoints_before, [])
+        self.assertTrue(checkpointed)
+        self.assertEqual(network.checkpoints, ["SampleNet_0"])
+        self.assertEqual(trainer.get_stats()["unsaved"], 0)
+        trainer.shutdown()
+
+    def test_checkpoint_after_interval(self):
+        network = FakeTrainedNetwork()
+        trainer = OnlineTrainer(network.apply_batch, checkpoint=network.checkpoint, batch_size=1,
+                                checkpoint_samples=0, checkpoint_interval_seconds=0.02)
+        # Test Instructions
+        trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)
+        checkpointed = wait_for(lambda: network.checkpoints == ["SampleNet_0"])
+        # Assertions
+        self.assertTrue(checkpointed)
+        trainer.shutdown()
+        self.assertEqual(network.checkpoints, ["SampleNet_0"])  # nothing was applied since the checkpoint
+
+    def test_failed_checkpoint_is_retried(self):
+        network = FakeTrainedNetwork(fail_checkpoints=1)
+        trainer = OnlineTrainer(network.apply_batch, checkpoint=network.checkpoint, batch_size=1,
+                                checkpoint_samples=1, checkpoint_retry_seconds=0.01)
+        # Test Instructions
+        with self.assertLogs("APIHelpers.online_training_helper", level="ERROR") as logs:
+            trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)
+            checkpointed = wait_for(lambda: network.checkpoints == ["SampleNet_0"])
+        trainer.shutdown()
+        # Assertions
+        self.assertTrue(checkpointed)
+        self.assertIn("Failed to checkpoint SampleNet_0", logs.output[0])
+        self.assertEqual(trainer.get_stats()["checkpoint_failures"], 1)
+        self.assertEqual(trainer.get_stats()["checkpoints"], 1)
+
+    def test_shutdown_applies_and_checkpoints(self):
+        network = FakeTrainedNetwork()
+        trainer = OnlineTrainer(network.apply_batch, checkpoint=network.checkpoint, batch_size=100,
+                                max_delay_ms=60000, checkpoint_samples=0, checkpoint_interval_seconds=0)
+        # Test Instructions
+        for i in range(3):
+            trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)
+        trainer.shutdown()
+        # Assertions
+        self.assertEqual([features.shape[0] for features, _ in network.batches], [3])
+        self.assertEqual(network.checkpoints, ["SampleNet_0"])
+        with self.assertRaises(RuntimeError):
+            trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)
+
+    def test_failed_samples(self):
+        network = FakeTrainedNetwork()
+        trainer = OnlineTrainer(network.apply_batch, batch_size=100, max_delay_ms=60000)
+        # Test Instructions
+        trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)
+        trainer.submit("SampleNet_0", [1.0, 2.0], 0)  # mismatched samples fail on their own
+        trainer.submit("SampleNet_1", [1.0, 2.0, 3.0], 0)  # unknown network
+        trainer.flush()
+        trainer.shutdown()
+        # Assertions
+        self.assertEqual(len(network.batches), 1)
+        self.assertEqual(trainer.get_stats()["applied"], 1)
+        self.assertEqual(trainer.get_stats()["failed"], 2)
+
+    def test_discard(self):
+        network = FakeTrainedNetwork()
+        trainer = OnlineTrainer(network.apply_batch, batch_size=100, max_delay_ms=60000)
+        # Test Instructions
+        for i in range(3):
+            trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)
+        discarded_count = trainer.discard("SampleNet_0")
+        trainer.shutdown()
+        # Assertions
+        self.assertEqual(discarded_count, 3)
+        self.assertEqual(network.batches, [])
+        self.assertEqual(trainer.get_stats()["discarded"], 3)
+
+    def test_submit_blocks_while_full(self):
+        network = FakeTrainedNetwork()
+        release = threading.Event()
+
+        def slow_apply_batch(key, features, target_classes):
+            release.wait(5)
+            return network.apply_batch(key, features, target_classes)
+        trainer = OnlineTrainer(slow_apply_batch, batch_size=2, max_delay_ms=0, max_pending=2)
+        # Test Instructions
+        trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)  # taken by the worker, which waits for `release`
+        wait_for(lambda: trainer.pending("SampleNet_0") == 0)
+        trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)
+        trainer.submit("SampleNet_0", [1.0, 2.0, 3.0], 0)
+        blocked_submit = threading.Thread(target=trainer.submit, args=("SampleNet_0", [1.0, 2.0, 3.0], 0))
+        blocked_submit.start()
+        blocked_submit.join(0.05)
+        was_blocked = blocked_submit.is_alive()
+        release.set()
+        blocked_submit.join(5)
+        trainer.shutdown()
+        # Assertions
+        self.assertTrue(was_blocked)
+        self.assertEqual(trainer.get_stats()["applied"], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
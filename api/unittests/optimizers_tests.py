@@ -0,0 +1,110 @@
+import math
+import unittest
+import numpy
+import optimizers
+
+
+class TestSchedules(unittest.TestCase):
+    def test_step_schedule(self):
+        optimizer = optimizers.create_optimizer("sgd", schedule="step", decay_steps=10, decay_rate=0.5)
+        learning_rates = list()
+        # Test Instructions
+        for steps in (0, 9, 10, 25):
+            optimizer.steps = steps
+            learning_rates.append(optimizer.learning_rate(0.8))
+        # Assertions
+        self.assertEqual(learning_rates, [0.8, 0.8, 0.4, 0.2])
+
+    def test_cosine_schedule(self):
+        optimizer = optimizers.create_optimizer("sgd", schedule="cosine", decay_steps=100, min_learning_rate=0.1)
+        learning_rates = list()
+        # Test Instructions
+        for steps in (0, 50, 100, 150):
+            optimizer.steps = steps
+            learning_rates.append(optimizer.learning_rate(1.0))
+        # Assertions
+        numpy.testing.assert_allclose(learning_rates, [1.0, 0.55, 0.1, 0.1])
+
+
+class TestOptimizers(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        self.parameters = rng.normal(size=20)
+        self.directions = [rng.normal(size=20) for _ in range(3)]
+
+    def apply_all(self, optimizer):
+        parameters = self.parameters.copy()
+        for direction in self.directions:
+            optimizer.apply(parameters, direction.copy(), 0.1)
+        return parameters
+
+    def test_sgd(self):
+        # Test Instructions
+        parameters = self.apply_all(optimizers.create_optimizer("sgd"))
+        # Assertions
+        numpy.testing.assert_allclose(parameters, self.parameters + 0.1 * sum(self.directions))
+
+    def test_momentum(self):
+        velocity, expected_parameters = numpy.zeros(20), self.parameters.copy()
+        for direction in self.directions:
+            velocity = 0.5 * velocity + 0.1 * direction
+            expected_parameters += velocity
+        # Test Instructions
+        parameters = self.apply_all(optimizers.create_optimizer("momentum", momentum=0.5))
+        # Assertions
+        numpy.testing.assert_allclose(parameters, expected_parameters)
+
+    def test_adam(self):
+        first_moment, second_moment, expected_parameters = numpy.zeros(20), numpy.zeros(20), self.parameters.copy()
+        for step, direction in enumerate(self.directions, 1):
+            first_moment = 0.9 * first_moment + 0.1 * direction
+            second_moment = 0.999 * second_moment + 0.001 * direction ** 2
+            expected_parameters += 0.1 * (first_moment / (1 - 0.9 ** step)) / (
+                numpy.sqrt(second_moment / (1 - 0.999 ** step)) + 1e-8 / math.sqrt(1 - 0.999 ** step))
+        optimizer = optimizers.create_optimizer("adam")
+        # Test Instructions
+        parameters = self.apply_all(optimizer)
+        # Assertions
+        numpy.testing.assert_allclose(parameters, expected_parameters)
+        self.assertEqual(optimizer.steps, 3)
+        self.assertEqual(sorted(optimizer.state), ["first_moment", "second_moment"])
+
+    def test_copy_and_config(self):
+        optimizer = optimizers.create_optimizer("adam", schedule="cosine", beta1=0.8, decay_steps=50)
+        self.apply_all(optimizer)
+        # Test Instructions
+        optimizer_copy = optimizer.copy()
+        restored = optimizers.create_optimizer(**optimizer.config())
+        # Assertions
+        self.assertEqual(optimizer_copy.config(), optimizer.config())
+        self.assertEqual((restored.name, restored.schedule, restored.steps, restored.settings["beta1"]),
+                         ("adam", "cosine", 3, 0.8))
+        for name, state in optimizer.state.items():
+            numpy.testing.assert_array_equal(optimizer_copy.state[name], state)
+            self.assertFalse(numpy.shares_memory(optimizer_copy.state[name], state))
+
+    def test_restore(self):
+        optimizer = optimizers.create_optimizer("adam")
+        self.apply_all(optimizer)
+        snapshot = optimizer.copy()
+        first_moment = optimizer.state["first_moment"]
+        # Test Instructions
+        self.apply_all(optimizer)
+        optimizer.restore(snapshot)
+        # Assertions
+        self.assertEqual(optimizer.steps, 3)
+        self.assertIs(optimizer.state["first_moment"], first_moment)  # restored in place
+        for name, state in snapshot.state.items():
+            numpy.testing.assert_array_equal(optimizer.state[name], state)
+
+    def test_invalid_optimizers(self):
+        with self.assertRaises(ValueError):
+            optimizers.create_optimizer("rmsprop")
+        with self.assertRaises(ValueError):
+            optimizers.create_optimizer("sgd", schedule="linear")
+        with self.assertRaises(ValueError):
+            optimizers.create_optimizer("adam", momentum=0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import numpy
+from APIHelpers import io_helper, persistence_helper
+from APIHelpers.persistence_helper import WriteBehindQueue
+from neural_network import NeuralNetwork
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, "network.bin")
+        self.network = NeuralNetwork(9, 4, 2, 0.5)
+        self.writer = WriteBehindQueue(max_pending=10, workers=2)
+
+    def tearDown(self):
+        self.writer.shutdown()
+        shutil.rmtree(self.directory)
+
+    def test_submit_and_flush(self):
+        # Test Instructions
+        self.assertTrue(self.writer.submit(self.network, self.file_path))
+        self.assertTrue(self.writer.flush(timeout=5))
+        # Assertions
+        loaded = io_helper.load_pretrained_network(self.file_path)
+        numpy.testing.assert_array_equal(loaded.wih, self.network.wih)
+        self.assertIsNone(self.writer.latest(self.file_path))
+        self.assertEqual(self.writer.get_stats()["written"], 1)
+        self.assertFalse(self.writer.submit("not a network", self.file_path))
+
+    def test_coalesced_writes_keep_latest_snapshot(self):
+        release_write = threading.Event()
+        original_write = persistence_helper.write_network_file
+
+        def blocked_write(*args, **kwargs):
+            release_write.wait(5)
+            original_write(*args, **kwargs)
+        with mock.patch.object(persistence_helper, "write_network_file", blocked_write):
+            # Test Instructions
+            for i in range(5):
+                self.network.lr = float(i)
+                self.writer.submit(self.network, self.file_path)
+            pending = io_helper.deserialize_network(self.writer.latest(self.file_path))
+            release_write.set()
+            self.writer.flush(timeout=5)
+        # Assertions
+        self.assertEqual(pending.lr, 4.0)
+        self.assertEqual(io_helper.load_pretrained_network(self.file_path).lr, 4.0)
+        stats = self.writer.get_stats()
+        self.assertEqual(stats["submitted"], 5)
+        self.assertLessEqual(stats["written"], 2)  # the first snapshot may already have been picked up
+        self.assertEqual(stats["queue_depth"], 0)
+
+    def test_discard(self):
+        release_write = threading.Event()
+        original_write = persistence_helper.write_network_file
+
+        def blocked_write(*args, **kwargs):
+            release_write.wait(5)
+            original_write(*args, **kwargs)
+        other_path = os.path.join(self.directory, "other.bin")
+        with mock.patch.object(persistence_helper, "write_network_file", blocked_write):
+            # Test Instructions: occupy both writers, so the third file is still pending when discarded
+            self.writer.submit(self.network, self.file_path)
+            self.writer.submit(self.network, other_path)
+            discarded_path = os.path.join(self.directory, "discarded.bin")
+            self.writer.submit(self.network, discarded_path)
+            threading.Timer(0.1, release_write.set).start()
+            self.writer.discard(discarded_path)
+            self.writer.flush(timeout=5)
+        # Assertions
+        self.assertFalse(os.path.exists(discarded_path))
+        self.assertTrue(os.path.exists(self.file_path))
+
+    def test_failed_writes_release_the_file(self):
+        def failed_write(*args, **kwargs):
+            raise ValueError("cannot serialize")
+        with mock.patch.object(persistence_helper, "write_network_file", failed_write):
+            # Test Instructions
+            self.writer.submit(self.network, self.file_path)
+            flushed = self.writer.flush(timeout=5)
+            self.writer.discard(self.file_path)
+        self.writer.submit(self.network, self.file_path)
+        # Assertions
+        self.assertTrue(flushed)
+        self.assertTrue(self.writer.flush(timeout=5))
+        self.assertTrue(os.path.exists(self.file_path))  # the writer thread keeps running
+        self.assertEqual((self.writer.get_stats()["failed"], self.writer.get_stats()["written"]), (1, 1))
+
+    def test_shutdown_flushes(self):
+        # Test Instructions
+        self.writer.submit(self.network, self.file_path)
+        self.writer.shutdown()
+        # Assertions
+        self.assertTrue(os.path.exists(self.file_path))
+        with self.assertRaises(RuntimeError):
+            self.writer.submit(self.network, self.file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
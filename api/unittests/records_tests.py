@@ -0,0 +1,35 @@
+import unittest
+from bson import ObjectId
+from APIHelpers import records_helper
+
+
+class TestRecordQueries(unittest.TestCase):
+    def test_split_record_query(self):
+        # Test Instructions
+        record_filter, options = records_helper.split_record_query({"training_record": "True", "max": "5",
+                                                                    "fields": "record_id", "format": "ndjson"})
+        # Assertions
+        self.assertEqual(record_filter, {"training_record": "True"})
+        self.assertEqual(options, {"max": "5", "fields": "record_id", "format": "ndjson"})
+
+    def test_build_projection(self):
+        self.assertIsNone(records_helper.build_projection(None))
+        self.assertIsNone(records_helper.build_projection(""))
+        self.assertEqual(records_helper.build_projection("record_id, target_class"),
+                         {"record_id": 1, "target_class": 1, "_id": 1})
+        # any single feature value is stored in the features array
+        self.assertEqual(records_helper.build_projection(["0", "1"]), {"features": 1, "_id": 1})
+
+    def test_page_filter(self):
+        after = ObjectId()
+        # Assertions
+        self.assertEqual(records_helper.page_filter({"training_record": "True"}, None), {"training_record": "True"})
+        self.assertEqual(records_helper.page_filter({}, str(after)), {"_id": {"$gt": after}})
+        self.assertEqual(records_helper.page_filter({"training_record": "True"}, str(after)),
+                         {"$and": [{"training_record": "True"}, {"_id": {"$gt": after}}]})
+        with self.assertRaises(ValueError):
+            records_helper.page_filter({}, "not_an_id")
+
+
+if __name__ == '__main__':
+    unittest.main()
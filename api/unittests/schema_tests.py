@@ -0,0 +1,74 @@
+import unittest
+from APIHelpers import schema_helper
+
+
+class FakeMigrationDB:
+    def __init__(self, documents=()):
+        # stands in for a DBConnection, counting scans of the records and holding the recorded schema version
+        self.namespace = ("localhost", 27017, "PerceptronAPI.records")
+        self.documents = list(documents)
+        self.scans = 0
+        self.updates = list()
+        self.schema_version = None
+
+    def read_documents(self, match, projection=None):
+        self.scans += 1
+        return [document for document in self.documents if "0" in document]
+
+    def bulk_update(self, operations):
+        self.updates.extend(operations)
+        self.schema_version = schema_helper.SCHEMA_VERSION
+        return len(operations)
+
+    def record_exists(self, document):
+        return self.schema_version is not None and self.schema_version >= document["schema_version"]["$gte"]
+
+
+class TestRecordSchema(unittest.TestCase):
+    def test_normalize_legacy_document(self):
+        legacy_document = {"record_id": "BC_Sample_Train_0", "1": "0.2", "0": "0.5", "10": "0.7",
+                           "target_class": "1", "training_record": "False"}
+        # Test Instructions
+        document = schema_helper.normalize_document(legacy_document)
+        # Assertions
+        self.assertEqual(document, {"record_id": "BC_Sample_Train_0", "features": [0.5, 0.2, 0.7],
+                                    "target_class": 1, "training_record": False})
+        self.assertEqual(schema_helper.normalize_document(document), document)
+
+    def test_record_document_round_trip(self):
+        # Test Instructions
+        document = schema_helper.record_document(["0.1", "0.2"], "0", True, record_id="BC_Sample_Test_3")
+        api_record = schema_helper.to_api_record(document)
+        # Assertions
+        self.assertEqual(document, {"record_id": "BC_Sample_Test_3", "features": [0.1, 0.2], "target_class": 0,
+                                    "training_record": True})
+        self.assertEqual(api_record, {"record_id": "BC_Sample_Test_3", "0": 0.1, "1": 0.2, "target_class": 0,
+                                      "training_record": True})
+
+    def test_coerce_filter(self):
+        # Test Instructions
+        record_filter = schema_helper.coerce_filter({"training_record": "False",
+                                                     "target_class": {"$in": ["0", 1]},
+                                                     "3": {"$gte": "0.5"},
+                                                     "$or": [{"record_id": {"$regex": "^BC_"}},
+                                                             {"training_record": 1}]})
+        # Assertions
+        self.assertEqual(record_filter, {"training_record": False, "target_class": {"$in": [0, 1]},
+                                         "features.3": {"$gte": 0.5},
+                                         "$or": [{"record_id": {"$regex": "^BC_"}}, {"training_record": True}]})
+        with self.assertRaises(ValueError):
+            schema_helper.coerce_filter({"training_record": "maybe"})
+
+    def test_migration_is_recorded(self):
+        records_db = FakeMigrationDB([{"_id": 1, "0": "0.5", "target_class": "1", "training_record": "True"}])
+        schema_db = FakeMigrationDB()
+        # Test Instructions
+        converted_counts = [schema_helper.migrate_records(records_db, schema_db=schema_db) for _ in range(3)]
+        # Assertions
+        self.assertEqual(converted_counts, [1, 0, 0])
+        self.assertEqual(records_db.scans, 1)
+        self.assertEqual(len(schema_db.updates), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
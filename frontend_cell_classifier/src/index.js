@@ -136,7 +136,7 @@ class Sample extends React.Component {
 
         sampleClass[0] = 'sample';
         // sampleClass[1] = this.props.sample[configData.FEATURES.length] === "1" ? "malignant" : (this.props.sample[configData.FEATURES.length] === "0" ? "benign" : "loading");
-        let sampleTarget = this.props.sample[configData.FEATURES.length] === "1" ? "malignant" : (this.props.sample[configData.FEATURES.length] === "0" ? "benign" : "loading");
+        let sampleTarget = String(this.props.sample[configData.FEATURES.length]) === "1" ? "malignant" : (String(this.props.sample[configData.FEATURES.length]) === "0" ? "benign" : "loading");
         let sampleHeadingClass;
         let sampleCorrect;
         let sampleCorrectClass;